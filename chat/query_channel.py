@@ -0,0 +1,462 @@
+"""
+Local pub/sub channel between the chat UI and the camera processes.
+
+A QueryBroker listens on a Unix socket and keeps the set of active queries. Clients
+speak newline-delimited JSON:
+
+    {"op": "subscribe", "topics": ["queries", "alerts"]}
+    {"op": "set_query", "query": {"id": ..., "color": ..., "plate": ..., "action": ...}}
+    {"op": "cancel_query", "id": ...}
+    {"op": "alert", "alert": {...}}
+
+"queries" subscribers (camera processes) get the full list of active queries on
+subscribing and after every change; "alerts" subscribers (UI sessions) get every alert a
+camera process publishes. Camera processes match each stored plate against their copy of
+the queries in-process (QueryMatcher), so an alert goes out on the frame the plate is
+read, with no database round trip.
+
+The broker runs in whichever process calls `start_query_broker` first (the camera
+runners, or the UI if no runner is up); clients reconnect on their own if it restarts.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+
+from chat.query_state import get_current_query
+from storage.plate_index import plate_distance
+
+QUERY_CHANNEL_ENABLED = True  # Camera processes receive live queries and publish match alerts
+QUERY_CHANNEL_SOCKET = os.environ.get(
+    "QUERY_CHANNEL_SOCKET",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "chat_cache", "query_channel.sock"))
+)
+RECONNECT_MIN_DELAY = 0.5   # Seconds before a client's first reconnect attempt
+RECONNECT_MAX_DELAY = 10.0  # Reconnect back-off cap
+SEND_TIMEOUT = 0.5          # A peer that can't take a message within this is dropped
+ALERT_HISTORY = 200         # Alerts kept by a client for readers that poll (the UI)
+ALERT_MAX_PLATE_DISTANCE = 1.0  # OCR-confusion-weighted distance (see storage.plate_index) a read may be off by
+
+QUERIES = "queries"
+ALERTS = "alerts"
+
+log = logging.getLogger(__name__)
+
+
+def channel_supported():
+    return hasattr(socket, "AF_UNIX")
+
+
+class QueryBroker:
+    """
+    Unix-socket hub: holds the active queries and fans messages out to subscribers.
+    Every client connection is served by its own daemon thread.
+    """
+
+    def __init__(self, path=QUERY_CHANNEL_SOCKET):
+        self.path = path
+        self._queries = {}       # query id -> query dict
+        self._subscribers = {QUERIES: set(), ALERTS: set()}
+        self._send_locks = {}    # connection -> lock, so fan-outs from several threads don't interleave
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        """
+        Binds the socket and starts serving.
+
+        Returns:
+            self, or None if another broker is already serving on `path`
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            if _is_listening(self.path):
+                return None
+            os.unlink(self.path)  # Left behind by a broker that died
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.path)
+        except OSError:
+            server.close()
+            return None  # Lost the race against another process starting a broker
+        server.listen()
+        self._server = server
+
+        # Queries set before this broker started (see chat.query_state) stay active
+        query = get_current_query()
+        if query:
+            query.setdefault("id", "saved")
+            self._queries[query["id"]] = query
+
+        threading.Thread(target=self._accept_loop, name="QueryBroker", daemon=True).start()
+        log.info("query broker started", extra={"socket": self.path})
+        return self
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        with self._lock:
+            connections = list(self._send_locks)
+        for conn in connections:
+            self._drop(conn)
+
+    def active_queries(self):
+        with self._lock:
+            return list(self._queries.values())
+
+    def _accept_loop(self):
+        while self._server is not None:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.settimeout(SEND_TIMEOUT)
+            with self._lock:
+                self._send_locks[conn] = threading.Lock()
+            threading.Thread(target=self._serve, args=(conn,), name="QueryBrokerClient", daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            for message in _read_messages(conn):
+                try:
+                    self._handle(conn, message)
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    log.warning("malformed query channel message dropped", extra={"op": message.get("op")})
+        except OSError:
+            pass
+        finally:
+            self._drop(conn)
+
+    def _handle(self, conn, message):
+        op = message.get("op")
+        if op == "subscribe":
+            with self._lock:
+                for topic in message.get("topics", ()):
+                    self._subscribers.setdefault(topic, set()).add(conn)
+                queries = list(self._queries.values())
+            if QUERIES in message.get("topics", ()):
+                self._send(conn, {"op": QUERIES, QUERIES: queries})
+        elif op in ("set_query", "cancel_query"):
+            if op == "set_query":
+                # Validated here: a stored query is pushed to every camera process
+                query = message.get("query")
+                if not isinstance(query, dict) or not isinstance(query.get("id"), str):
+                    raise ValueError("set_query needs a query with a string id")
+                query = normalize_query(query)
+            with self._lock:
+                if op == "set_query":
+                    self._queries[query["id"]] = query
+                else:
+                    self._queries.pop(message.get("id"), None)
+                queries = list(self._queries.values())
+            self._publish(QUERIES, {"op": QUERIES, QUERIES: queries})
+        elif op == "alert":
+            self._publish(ALERTS, message)
+        else:
+            log.warning("unknown query channel message", extra={"op": op})
+
+    def _publish(self, topic, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for conn in subscribers:
+            self._send(conn, message)
+
+    def _send(self, conn, message):
+        send_lock = self._send_locks.get(conn)
+        if send_lock is None:
+            return
+        try:
+            with send_lock:
+                conn.sendall(_encode(message))
+        except OSError:
+            # A stuck or closed subscriber must not hold up everyone else
+            self._drop(conn)
+
+    def _drop(self, conn):
+        with self._lock:
+            for subscribers in self._subscribers.values():
+                subscribers.discard(conn)
+            self._send_locks.pop(conn, None)
+        try:
+            conn.shutdown(socket.SHUT_RDWR)  # Also wakes the thread blocked reading it
+        except OSError:
+            pass
+        conn.close()
+
+
+def start_query_broker(path=QUERY_CHANNEL_SOCKET):
+    """
+    Starts a broker in this process unless one is already serving `path`.
+
+    Returns:
+        The QueryBroker, or None (already running elsewhere, or no Unix sockets here)
+    """
+    if not channel_supported():
+        log.warning("query channel needs Unix domain sockets; live alerts are disabled")
+        return None
+    return QueryBroker(path).start()
+
+
+class ChannelClient:
+    """
+    Connection to the broker that survives broker restarts: a background thread
+    (re)connects with back-off, re-subscribes to `topics` and passes every incoming
+    message to `on_message(message)`. `send` never blocks for long and silently drops
+    the message while disconnected.
+    """
+
+    def __init__(self, topics=(), on_message=None, path=QUERY_CHANNEL_SOCKET):
+        self.path = path
+        self.topics = list(topics)
+        self.on_message = on_message
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._connected = threading.Event()
+        if channel_supported():
+            threading.Thread(target=self._run, name="QueryChannelClient", daemon=True).start()
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    def wait_connected(self, timeout=None):
+        return self._connected.wait(timeout)
+
+    def send(self, message):
+        """
+        Returns:
+            True if the message was handed to the broker
+        """
+        with self._send_lock:
+            sock = self._sock
+            if sock is None:
+                return False
+            try:
+                sock.sendall(_encode(message))
+                return True
+            except OSError:
+                sock.close()
+                return False
+
+    def close(self):
+        self._stop.set()
+        with self._send_lock:
+            if self._sock is not None:
+                self._sock.close()
+
+    def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop.is_set():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+
+            sock.settimeout(SEND_TIMEOUT)
+            with self._send_lock:
+                self._sock = sock
+            if self.topics:
+                self.send({"op": "subscribe", "topics": self.topics})
+            self._connected.set()
+            delay = RECONNECT_MIN_DELAY
+            try:
+                for message in _read_messages(sock):
+                    if self.on_message is None:
+                        continue
+                    try:
+                        self.on_message(message)
+                    except (KeyError, TypeError, ValueError, AttributeError):
+                        log.warning("malformed query channel message dropped", extra={"op": message.get("op")})
+            except OSError:
+                pass
+            finally:
+                self._connected.clear()
+                with self._send_lock:
+                    self._sock = None
+                sock.close()
+
+
+def normalize_query(query):
+    """
+    Returns `query` (a parse_chat_command result) with an id and normalized fields.
+    """
+    query = dict(query)
+    query.setdefault("id", uuid.uuid4().hex)
+    query["plate"] = query["plate"].strip().upper() if query.get("plate") else None
+    query["color"] = query["color"].strip().lower() if query.get("color") else None
+    return query
+
+
+def match_distance(query, plate, color, max_distance=ALERT_MAX_PLATE_DISTANCE):
+    """
+    Every field the query sets must match; the plate may be misread by up to
+    `max_distance` (two OCR confusions, or one other wrong character, by default).
+
+    Returns:
+        The plate distance (0.0 if the query has no plate), or None if it doesn't match
+    """
+    if not query.get("plate") and not query.get("color"):
+        return None
+    if query.get("color") and query["color"] != color:
+        return None
+    if not query.get("plate"):
+        return 0.0
+    distance = plate_distance(query["plate"], plate)
+    return distance if distance <= max_distance else None
+
+
+class QueryMatcher:
+    """
+    Camera-process side: keeps the active queries pushed by the broker and publishes an
+    alert whenever a stored plate matches one.
+
+    `check` runs on the frame loop, so it only compares against the local copy of the
+    queries (swapped atomically when the broker pushes a change) and hands the alert to
+    the socket. Callers that check the same sighting again on every frame pass a
+    `checked` set, so each query is matched against it once, including queries set
+    while the plate is already in view.
+    """
+
+    def __init__(self, path=QUERY_CHANNEL_SOCKET):
+        self.queries = ()
+        self.alerts_sent = 0
+        self._client = ChannelClient([QUERIES], self._on_message, path)
+
+    def check(self, plate, color, camera, timestamp, image_path=None, checked=None):
+        """
+        Parameters:
+            checked (set): optional ids of the queries already checked for this sighting;
+                those are skipped and the ones checked now are added
+
+        Returns:
+            The ids of the queries `plate`/`color` matched
+        """
+        matched = []
+        for query in self.queries:
+            if checked is not None:
+                if query["id"] in checked:
+                    continue
+                checked.add(query["id"])
+            distance = match_distance(query, plate, color)
+            if distance is None:
+                continue
+            matched.append(query["id"])
+            alert = {"query_id": query["id"], "plate": plate, "color": color, "camera": camera,
+                     "timestamp": timestamp, "image_path": image_path, "distance": distance,
+                     "sent_at": time.time()}
+            if self._client.send({"op": "alert", "alert": alert}):
+                self.alerts_sent += 1
+            log.info("query matched", extra={"query": query["id"], "plate": plate, "camera": camera,
+                                             "distance": distance})
+        return matched
+
+    def close(self):
+        self._client.close()
+
+    def _on_message(self, message):
+        if message.get("op") == QUERIES:
+            self.queries = tuple(normalize_query(query) for query in message.get(QUERIES, ()))
+            log.info("active queries updated", extra={"queries": len(self.queries)})
+
+
+class QueryPublisher:
+    """
+    UI side: publishes queries and collects alerts for every query into a bounded
+    history, which polling readers page through with `alerts_since`.
+    """
+
+    def __init__(self, path=QUERY_CHANNEL_SOCKET, history=ALERT_HISTORY):
+        self._alerts = deque(maxlen=history)  # (sequence number, alert)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._client = ChannelClient([ALERTS], self._on_message, path)
+
+    @property
+    def connected(self):
+        return self._client.connected
+
+    def set_query(self, query):
+        """
+        Makes `query` active in every camera process. Returns the normalized query (with
+        its id), whether or not the broker could be reached.
+        """
+        query = normalize_query(query)
+        self._client.send({"op": "set_query", "query": query})
+        return query
+
+    def cancel_query(self, query_id):
+        self._client.send({"op": "cancel_query", "id": query_id})
+
+    def alerts_since(self, seq, query_id=None):
+        """
+        Returns:
+            (alerts, last_seq): alerts received after sequence number `seq` (for
+            `query_id` only, if given), oldest first, and the sequence number to pass next
+        """
+        with self._lock:
+            alerts = [(s, alert) for s, alert in self._alerts if s > seq]
+            last_seq = self._seq
+        return [alert for _, alert in alerts if query_id is None or alert.get("query_id") == query_id], last_seq
+
+    def close(self):
+        self._client.close()
+
+    def _on_message(self, message):
+        if message.get("op") == "alert":
+            with self._lock:
+                self._seq += 1
+                self._alerts.append((self._seq, message["alert"]))
+
+
+def _encode(message):
+    return (json.dumps(message, default=str) + "\n").encode()
+
+
+def _read_messages(sock):
+    buffer = b""
+    while True:
+        try:
+            chunk = sock.recv(65536)
+        except socket.timeout:
+            continue  # The timeout is there for sends; an idle peer is fine
+        if not chunk:
+            return
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            if line.strip():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if isinstance(message, dict):
+                    yield message
+                else:
+                    log.warning("malformed query channel message dropped")
+
+
+def _is_listening(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
@@ -21,39 +21,128 @@ HSV_COLOR_RANGES = {
 }
 
 
+DOMINANCE_THRESHOLD = 0.15  # Min fraction of pixels for a color to be reported
+CLASSIFY_SIZE = (100, 100)  # Images are resized to this before classification
+COLOR_BATCH_CHUNK = 16      # Images classified per vectorized pass in get_dominant_colors
+
+# Combined grayscale + color ranges, in priority order (earlier names win ties)
+COLOR_NAMES = list(GRAYSCALE_RANGES) + list(HSV_COLOR_RANGES)
+
+
+def _all_ranges():
+    """
+    Yields (color_index, lower, upper) for every HSV range of every color.
+    """
+    for color_idx, color_name in enumerate(COLOR_NAMES):
+        if color_name in GRAYSCALE_RANGES:
+            yield color_idx, GRAYSCALE_RANGES[color_name][0], GRAYSCALE_RANGES[color_name][1]
+        else:
+            for lower, upper in HSV_COLOR_RANGES[color_name]:
+                yield color_idx, lower, upper
+
+
+def _build_lookup_tables():
+    """
+    Splits each HSV channel at every range boundary, so every (H, S, V) cell of the
+    resulting grid is either entirely inside or entirely outside each color range.
+
+    Returns:
+        bin_lut: (1, 256, 3) uint8 table for cv2.LUT mapping each channel value to its bin
+        strides: (1, 3) cv2.transform matrix turning per-channel bins into a flat cell index
+        membership: (n_cells, n_colors) int array, 1 where a cell belongs to a color
+    """
+    ranges = list(_all_ranges())
+
+    channel_edges = []
+    for channel in range(3):
+        edges = {0, 256}
+        for _, lower, upper in ranges:
+            edges.add(lower[channel])
+            edges.add(upper[channel] + 1)
+        channel_edges.append(np.array(sorted(e for e in edges if 0 <= e <= 256)))
+
+    bins = [len(edges) - 1 for edges in channel_edges]
+    strides = np.array([[bins[1] * bins[2], bins[2], 1]], dtype=np.float32)  # cv2.transform matrix
+    values = np.arange(256)
+    bin_lut = np.stack(
+        [np.searchsorted(edges, values, side="right") - 1 for edges in channel_edges], axis=-1
+    ).astype(np.uint8).reshape(1, 256, 3)
+
+    # Representative (lowest) value of every cell along each channel
+    reps = np.meshgrid(*[edges[:-1] for edges in channel_edges], indexing="ij")
+    reps = [r.ravel() for r in reps]
+    membership = np.zeros((len(reps[0]), len(COLOR_NAMES)), dtype=np.int64)
+    for color_idx, lower, upper in ranges:
+        inside = np.ones(len(reps[0]), dtype=bool)
+        for channel in range(3):
+            inside &= (reps[channel] >= lower[channel]) & (reps[channel] <= upper[channel])
+        membership[inside, color_idx] = 1
+
+    return bin_lut, strides, membership
+
+
+# Built once at import: classification is then a table lookup plus one bincount
+_BIN_LUT, _BIN_STRIDES, _MEMBERSHIP = _build_lookup_tables()
+_N_CELLS = _MEMBERSHIP.shape[0]
+
+
+def _color_counts(hsv_pixels):
+    """
+    Parameters:
+        hsv_pixels: (N, P, 3) uint8 HSV pixels for N images
+
+    Returns:
+        (N, n_colors) pixel count per color per image
+    """
+    n_images = hsv_pixels.shape[0]
+    binned = cv2.LUT(hsv_pixels, _BIN_LUT).astype(np.uint16)
+    cells = cv2.transform(binned, _BIN_STRIDES).astype(np.int32)
+    cells += (np.arange(n_images, dtype=np.int32) * _N_CELLS)[:, None]
+    cell_counts = np.bincount(cells.ravel(), minlength=n_images * _N_CELLS)
+    return cell_counts.reshape(n_images, _N_CELLS) @ _MEMBERSHIP
+
+
+def _pick_dominant(counts, total_pixels):
+    best = int(np.argmax(counts))
+    if counts[best] / total_pixels > DOMINANCE_THRESHOLD:  # only return if confidently dominant
+        return COLOR_NAMES[best]
+    return "unknown"
+
+
 def get_dominant_color(image):
     if image is None or image.size == 0:
         return "unknown"
 
     # Resize image for performance
-    img_resized = cv2.resize(image, (100, 100), interpolation=cv2.INTER_AREA)
+    img_resized = cv2.resize(image, CLASSIFY_SIZE, interpolation=cv2.INTER_AREA)
     hsv_image = cv2.cvtColor(img_resized, cv2.COLOR_BGR2HSV)
-    total_pixels = hsv_image.shape[0] * hsv_image.shape[1]
 
-    # Combine grayscale + color ranges
-    all_color_ranges = {}
-    all_color_ranges.update(GRAYSCALE_RANGES)
-    all_color_ranges.update(HSV_COLOR_RANGES)
+    counts = _color_counts(hsv_image.reshape(1, -1, 3))[0]
+    return _pick_dominant(counts, CLASSIFY_SIZE[0] * CLASSIFY_SIZE[1])
 
-    color_pixel_counts = {}
 
-    for color_name, ranges in all_color_ranges.items():
-        if isinstance(ranges[0][0], int):  # grayscale is a single [lower, upper]
-            ranges = [ranges]  # wrap in a list
+def get_dominant_colors(images):
+    """
+    Classifies many images (e.g. every new vehicle crop in a batch) in one vectorized pass.
 
-        mask_total = np.zeros(hsv_image.shape[:2], dtype=np.uint8)
-        for lower, upper in ranges:
-            mask = cv2.inRange(hsv_image, np.array(lower), np.array(upper))
-            mask_total = cv2.bitwise_or(mask_total, mask)
+    Returns:
+        List of color names (or "unknown"), one per image, same as get_dominant_color
+    """
+    width, height = CLASSIFY_SIZE
+    valid = [i for i, image in enumerate(images) if image is not None and image.size > 0]
+    colors = ["unknown"] * len(images)
+    if not valid:
+        return colors
 
-        pixel_count = np.sum(mask_total > 0)
-        color_pixel_counts[color_name] = pixel_count
+    stacked = np.empty((len(valid), height, width, 3), dtype=np.uint8)
+    for row, i in enumerate(valid):
+        cv2.resize(images[i], CLASSIFY_SIZE, dst=stacked[row], interpolation=cv2.INTER_AREA)
 
-    # Determine dominant color
-    dominant_color = max(color_pixel_counts, key=color_pixel_counts.get)
-    percentage = color_pixel_counts[dominant_color] / total_pixels
+    hsv = cv2.cvtColor(stacked.reshape(-1, width, 3), cv2.COLOR_BGR2HSV).reshape(len(valid), -1, 3)
 
-    if percentage > 0.15:  # only return if confidently dominant
-        return dominant_color
-    else:
-        return "unknown"
+    # Chunked so the per-pixel index arrays stay cache-sized for large batches
+    for start in range(0, len(valid), COLOR_BATCH_CHUNK):
+        counts = _color_counts(hsv[start:start + COLOR_BATCH_CHUNK])
+        for row, i in enumerate(valid[start:start + COLOR_BATCH_CHUNK]):
+            colors[i] = _pick_dominant(counts[row], width * height)
+    return colors
@@ -0,0 +1,154 @@
+import os
+import time
+import cv2
+
+from detection.detect_vehicles import detect_vehicles_batch, get_vehicle_model, letterbox
+from detection.onnx_backend import TORCH, resolve_backend
+from detection.plate_detector import get_plate_detector, select_device
+from pipeline.model_registry import models
+from pipeline.tracker import box_iou
+
+# Runtime configuration: DETECTION_CASCADE=1 makes the camera runners use the cascade
+CASCADE_ENABLED = os.environ.get("DETECTION_CASCADE", "0") == "1"
+CASCADE_VEHICLE_MODEL_PATH = 'yolov8n.pt'  # Small model: the first stage only needs coarse vehicle boxes
+CASCADE_VEHICLE_IMGSZ = 320                # Vehicle pass inference resolution (longest side)
+CASCADE_ROI_SIZES = ((160, 160), (320, 320), (480, 480))  # (width, height) ROI canvases plate detection runs at
+CASCADE_ROI_LETTERBOX = True               # Keep the ROI's aspect ratio on its canvas (False: stretch to fill it)
+CASCADE_ROI_PADDING = 0.05                 # ROI margin around each vehicle box, as a fraction of its size
+CASCADE_DUPLICATE_IOU = 0.5                # Plates found in overlapping ROIs are merged above this IoU
+
+
+class CascadeDetector:
+    """
+    Two-stage detector: a small, low-resolution YOLOv8 pass finds vehicles, then the
+    YOLOS plate detector only looks inside the vehicle ROIs.
+
+    Each ROI is placed onto the smallest of a few fixed canvases (`roi_sizes`) that holds
+    it at full resolution, centered and unscaled, or letterboxed onto the largest one if
+    none does, so small vehicles aren't blown up and large ones aren't squeezed more than
+    needed, and plates keep their shape. The ROIs of a batch (across frames and cameras) then go through one
+    plate-detector forward pass per canvas size at a small input size, instead of one
+    full-resolution pass per frame. Plate boxes are mapped back to full-frame
+    coordinates. pipeline/compare_backends.py --detector cascade reports the cascade's
+    recall against full-frame plate detection.
+
+    `detect` has PlateDetector's interface, except that each detection also carries its
+    vehicle box: (score, plate_box, vehicle_box), so colors can be classified on the
+    vehicle rather than on the plate.
+    """
+
+    def __init__(self, plate_detector, backend=None, vehicle_model_path=CASCADE_VEHICLE_MODEL_PATH,
+                 vehicle_imgsz=CASCADE_VEHICLE_IMGSZ, roi_sizes=CASCADE_ROI_SIZES, roi_padding=CASCADE_ROI_PADDING,
+                 roi_letterbox=CASCADE_ROI_LETTERBOX):
+        self.plate_detector = plate_detector
+        self.backend = resolve_backend(backend)
+        self.vehicle_model_path = vehicle_model_path
+        self.vehicle_imgsz = vehicle_imgsz
+        self.roi_sizes = sorted(roi_sizes, key=lambda size: size[0] * size[1])
+        self.roi_padding = roi_padding
+        self.roi_letterbox = roi_letterbox
+
+    def detect(self, frames, timer=None, input_size=None):
+        """
+        `input_size` (shortest_edge, longest_edge) only caps the vehicle pass resolution;
+        plate detection always runs on `roi_sizes` canvases.
+
+        Returns:
+            List with one entry per frame: [(score, (x1, y1, x2, y2), vehicle_box), ...]
+        """
+        start = time.perf_counter()
+        imgsz = min(self.vehicle_imgsz, input_size[1]) if input_size else self.vehicle_imgsz
+        vehicles = detect_vehicles_batch(frames, imgsz=imgsz, backend=self.backend,
+                                         path=self.vehicle_model_path)
+        if timer is not None:
+            timer.record("vehicle_detection", time.perf_counter() - start)
+
+        # Per canvas size: ROIs and their owners (frame index, vehicle box, origin, scale, padding)
+        canvases = {}
+        for frame_idx, (frame, frame_vehicles) in enumerate(zip(frames, vehicles)):
+            h, w = frame.shape[:2]
+            for _, (x1, y1, x2, y2) in frame_vehicles:
+                pad_x, pad_y = int((x2 - x1) * self.roi_padding), int((y2 - y1) * self.roi_padding)
+                rx1, ry1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+                rx2, ry2 = min(w, x2 + pad_x), min(h, y2 + pad_y)
+                if rx2 - rx1 < 2 or ry2 - ry1 < 2:
+                    continue
+                size = self._roi_size(rx2 - rx1, ry2 - ry1)
+                roi, scale, padding = self._fit(frame[ry1:ry2, rx1:rx2], size)
+                rois, owners = canvases.setdefault(size, ([], []))
+                rois.append(roi)
+                owners.append((frame_idx, (x1, y1, x2, y2), (rx1, ry1), scale, padding))
+
+        detections = [[] for _ in frames]
+        if not canvases:
+            return detections
+
+        start = time.perf_counter()
+        for size, (rois, owners) in canvases.items():
+            plates = self.plate_detector.detect(rois, timer=timer, input_size=(min(size), max(size)))
+            for (frame_idx, vehicle_box, (ox, oy), (sx, sy), (dx, dy)), roi_plates in zip(owners, plates):
+                for score, (px1, py1, px2, py2) in roi_plates:
+                    plate_box = (ox + int((px1 - dx) / sx), oy + int((py1 - dy) / sy),
+                                 ox + int((px2 - dx) / sx), oy + int((py2 - dy) / sy))
+                    detections[frame_idx].append((score, plate_box, vehicle_box))
+        if timer is not None:
+            timer.record("plate_detection", time.perf_counter() - start)
+
+        return [self._merge_duplicates(frame_detections) for frame_detections in detections]
+
+    def _roi_size(self, width, height):
+        """
+        The smallest canvas that holds a `width` x `height` ROI unscaled, else the largest.
+        """
+        for size in self.roi_sizes:
+            if width <= size[0] and height <= size[1]:
+                return size
+        return self.roi_sizes[-1]
+
+    def _fit(self, roi, size):
+        """
+        Returns:
+            (canvas image, (scale_x, scale_y), (pad_x, pad_y)) mapping ROI to canvas pixels
+        """
+        if self.roi_letterbox:
+            image, scale, padding = letterbox(roi, size, max_scale=1.0)  # Centered unscaled if it fits
+            return image, (scale, scale), padding
+        h, w = roi.shape[:2]
+        image = cv2.resize(roi, size, interpolation=cv2.INTER_AREA)
+        return image, (size[0] / float(w), size[1] / float(h)), (0, 0)
+
+    @staticmethod
+    def _merge_duplicates(detections):
+        # The same plate can be found in two overlapping vehicle ROIs; keep the best-scoring one
+        kept = []
+        for detection in sorted(detections, key=lambda d: d[0], reverse=True):
+            if all(box_iou(detection[1], other[1]) < CASCADE_DUPLICATE_IOU for other in kept):
+                kept.append(detection)
+        return kept
+
+
+def get_cascade_detector(device=None, backend=None):
+    """
+    Returns this process's CascadeDetector, loading both stages' models on first call.
+    """
+    backend = resolve_backend(backend)
+    device = (device or select_device()) if backend == TORCH else "cpu"
+    return models.get("cascade_detector", device=device, backend=backend)
+
+
+def get_frame_detector(device=None, backend=None, cascade=None):
+    """
+    The detector the camera runners use: the cascade if `cascade` (default:
+    CASCADE_ENABLED), otherwise full-frame plate detection.
+    """
+    if CASCADE_ENABLED if cascade is None else cascade:
+        return get_cascade_detector(device, backend)
+    return get_plate_detector(device, backend)
+
+
+def _load_cascade_detector(device, backend):
+    get_vehicle_model(backend, CASCADE_VEHICLE_MODEL_PATH)
+    return CascadeDetector(get_plate_detector(device, backend), backend=backend)
+
+
+models.register("cascade_detector", _load_cascade_detector)
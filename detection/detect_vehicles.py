@@ -1,67 +1,223 @@
 # vehicle_monitoring/detection/detect_vehicles.py
 
-import torch
-from ultralytics import YOLO
+import os
+import ast
+import shutil
 import cv2
+import numpy as np
 
+from detection.onnx_backend import TORCH, ONNX_INT8, resolve_backend, ensure_onnx_model, create_session, ONNX_OPSET
+from pipeline.model_registry import models
 
+VEHICLE_MODEL_PATH = 'yolov8x.pt'  # 'n' = nano (smallest and fastest version)
 
-# Import custom modules from ultralytics' core model architecture
-from ultralytics.nn.tasks import DetectionModel, BaseModel
-from ultralytics.nn.modules.conv import Conv, Concat
-from ultralytics.nn.modules.block import C2f, Bottleneck, SPPF, DFL 
-from ultralytics.nn.modules.head import Detect
-
-# Import standard PyTorch modules that are commonly part of the YOLOv8 model's pickle
-from torch.nn.modules.conv import Conv2d
-from torch.nn.modules.batchnorm import BatchNorm2d
-from torch.nn.modules.activation import SiLU, LeakyReLU
-from torch.nn.modules.container import Sequential, ModuleList
-from torch.nn.modules.pooling import MaxPool2d
-from torch.nn.modules.upsampling import Upsample
-from torch.nn.modules.dropout import Dropout # Dropout might be in some models
-
-# Registering all these classes as safe for unpickling 
-torch.serialization.add_safe_globals([
-    DetectionModel,
-    BaseModel,
-    Conv,
-    Concat,
-    C2f,
-    Bottleneck,
-    SPPF,
-    DFL, 
-    Detect,
-    Conv2d,
-    BatchNorm2d,
-    SiLU,
-    LeakyReLU,
-    Sequential,
-    ModuleList,
-    MaxPool2d,
-    Upsample,
-    Dropout
-])
-
-# 2. Load the YOLOv8 model
-# This line should now work after the safe global registrations
-model = YOLO('yolov8x.pt')  # 'n' = nano (smallest and fastest version)
-
-# 3. Define which object classes are vehicles
+# ultralytics' predict defaults, so the ONNX backends detect what the torch backend does
+YOLO_INPUT_SIZE = 640
+YOLO_STRIDE = 32
+YOLO_CONF_THRESHOLD = 0.25
+YOLO_NMS_IOU = 0.7
+LETTERBOX_COLOR = (114, 114, 114)
+
+
+def letterbox(image, size, color=LETTERBOX_COLOR, max_scale=None):
+    """
+    Resizes `image` to fit (width, height) `size` keeping its aspect ratio, centered on
+    a `color` background. With `max_scale` (e.g. 1.0), an image that fits is enlarged
+    by at most that much.
+
+    Returns:
+        (padded image, scale, (pad_x, pad_y)): a point (x, y) of the input maps to
+        (x * scale + pad_x, y * scale + pad_y)
+    """
+    width, height = size
+    h, w = image.shape[:2]
+    scale = min(width / w, height / h)
+    if max_scale is not None:
+        scale = min(scale, max_scale)
+    new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+    pad_x, pad_y = (width - new_w) // 2, (height - new_h) // 2
+    padded = np.full((height, width, image.shape[2]), color, dtype=image.dtype)
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    padded[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h), interpolation=interpolation)
+    return padded, scale, (pad_x, pad_y)
+
+
+class OnnxVehicleModel:
+    """
+    YOLOv8 exported to ONNX, run in a session from create_session so the configured
+    ONNX Runtime thread pools apply (ultralytics' own ONNX runner ignores them). Pre- and
+    postprocessing follow ultralytics: letterbox to a square input, confidence threshold
+    and per-class NMS.
+    """
+
+    def __init__(self, path, conf_threshold=YOLO_CONF_THRESHOLD, nms_iou=YOLO_NMS_IOU):
+        self.session = create_session(path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = ast.literal_eval(self.session.get_modelmeta().custom_metadata_map["names"])
+        self.conf_threshold = conf_threshold
+        self.nms_iou = nms_iou
+
+    def detect(self, frames, imgsz=None):
+        """
+        Returns:
+            One list per frame of (label, (x1, y1, x2, y2)) for every class
+        """
+        size = -(-(imgsz or YOLO_INPUT_SIZE) // YOLO_STRIDE) * YOLO_STRIDE
+        batch = np.empty((len(frames), 3, size, size), dtype=np.float32)
+        transforms = []
+        for i, frame in enumerate(frames):
+            padded, scale, pad = letterbox(frame, (size, size))
+            batch[i] = padded[:, :, ::-1].transpose(2, 0, 1) / 255.0
+            transforms.append((scale, pad, frame.shape[:2]))
+
+        outputs = self.session.run(None, {self.input_name: batch})[0]  # (N, 4 + classes, anchors)
+        return [self._boxes(output.T, *transform) for output, transform in zip(outputs, transforms)]
+
+    def _boxes(self, predictions, scale, pad, frame_hw):
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences >= self.conf_threshold
+        if not keep.any():
+            return []
+        predictions, class_ids, confidences = predictions[keep], class_ids[keep], confidences[keep]
+
+        # Center/size in letterboxed pixels -> top-left/size in frame pixels
+        xywh = predictions[:, :4].copy()
+        xywh[:, 0] = (xywh[:, 0] - xywh[:, 2] / 2 - pad[0]) / scale
+        xywh[:, 1] = (xywh[:, 1] - xywh[:, 3] / 2 - pad[1]) / scale
+        xywh[:, 2:] /= scale
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          self.conf_threshold, self.nms_iou)
+
+        h, w = frame_hw
+        detections = []
+        for i in np.array(indices).reshape(-1):
+            x, y, bw, bh = xywh[i]
+            x1, y1 = max(0, int(x)), max(0, int(y))
+            x2, y2 = min(w, int(x + bw)), min(h, int(y + bh))
+            detections.append((self.names[int(class_ids[i])], (x1, y1, x2, y2)))
+        return detections
+
+
+def _load_vehicle_model(backend=TORCH, path=VEHICLE_MODEL_PATH):
+    """
+    Loads the YOLOv8 model for `backend` (see detection.onnx_backend). torch and
+    ultralytics are only imported when the torch model is needed, so importing this
+    module stays cheap until a vehicle is actually detected.
+
+    For the ONNX backends the model is exported (with a dynamic input size) and, for
+    onnx-int8, quantized on first use, then run as an OnnxVehicleModel; once exported,
+    only onnxruntime is needed.
+    """
+    if backend == TORCH:
+        return _load_yolo(path)
+
+    def export(out):
+        exported = _load_yolo(path).export(format="onnx", dynamic=True, opset=ONNX_OPSET)
+        shutil.move(exported, out)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    onnx_path = ensure_onnx_model(name, export, quantized=backend == ONNX_INT8)
+    return OnnxVehicleModel(onnx_path)
+
+
+def _load_yolo(path):
+    import torch
+    from ultralytics import YOLO
+
+    # Import custom modules from ultralytics' core model architecture
+    from ultralytics.nn.tasks import DetectionModel, BaseModel
+    from ultralytics.nn.modules.conv import Conv, Concat
+    from ultralytics.nn.modules.block import C2f, Bottleneck, SPPF, DFL
+    from ultralytics.nn.modules.head import Detect
+
+    # Import standard PyTorch modules that are commonly part of the YOLOv8 model's pickle
+    from torch.nn.modules.conv import Conv2d
+    from torch.nn.modules.batchnorm import BatchNorm2d
+    from torch.nn.modules.activation import SiLU, LeakyReLU
+    from torch.nn.modules.container import Sequential, ModuleList
+    from torch.nn.modules.pooling import MaxPool2d
+    from torch.nn.modules.upsampling import Upsample
+    from torch.nn.modules.dropout import Dropout # Dropout might be in some models
+
+    # Registering all these classes as safe for unpickling
+    torch.serialization.add_safe_globals([
+        DetectionModel,
+        BaseModel,
+        Conv,
+        Concat,
+        C2f,
+        Bottleneck,
+        SPPF,
+        DFL,
+        Detect,
+        Conv2d,
+        BatchNorm2d,
+        SiLU,
+        LeakyReLU,
+        Sequential,
+        ModuleList,
+        MaxPool2d,
+        Upsample,
+        Dropout
+    ])
+
+    # This line should now work after the safe global registrations
+    return YOLO(path)
+
+
+models.register("vehicle_detector", _load_vehicle_model)
+
+# Define which object classes are vehicles
 vehicle_classes = ['car', 'bus', 'truck', 'motorcycle']
 
-def detect_vehicles(frame):
+def get_vehicle_model(backend=None, path=VEHICLE_MODEL_PATH):
+    """
+    Returns this process's YOLOv8 model (weights at `path`) for `backend` (default:
+    INFERENCE_BACKEND), loading it on first call.
+    """
+    return models.get("vehicle_detector", backend=resolve_backend(backend), path=path)
+
+def detect_vehicles(frame, backend=None):
     """
     Detect vehicles in the input video frame using YOLOv8.
 
     Parameters:
         frame (numpy array): input video frame (from OpenCV)
+        backend (str): inference backend (default: INFERENCE_BACKEND)
 
     Returns:
         List of tuples: [(label, (x1, y1, x2, y2)), ...]
     """
+    model = get_vehicle_model(backend)
+    if isinstance(model, OnnxVehicleModel):
+        return _vehicle_labels(model.detect([frame])[0])
     # model(frame) performs inference. [0] gets the first (and usually only) result object.
-    results = model(frame)[0]
+    return _vehicle_boxes(model, model(frame)[0])
+
+def detect_vehicles_batch(frames, imgsz=None, backend=None, path=VEHICLE_MODEL_PATH):
+    """
+    Batch version of detect_vehicles: one forward pass over `frames`, optionally at a
+    reduced inference resolution `imgsz` (longest side, in pixels).
+
+    Returns:
+        One list per frame, as detect_vehicles returns
+    """
+    if len(frames) == 0:
+        return []
+    model = get_vehicle_model(backend, path)
+    if isinstance(model, OnnxVehicleModel):
+        return [_vehicle_labels(detections) for detections in model.detect(frames, imgsz)]
+    options = {"verbose": False}
+    if imgsz:
+        options["imgsz"] = imgsz
+    return [_vehicle_boxes(model, result) for result in model(list(frames), **options)]
+
+def _vehicle_labels(detections):
+    return [(label, box) for label, box in detections if label in vehicle_classes]
+
+def _vehicle_boxes(model, results):
     detections = []
 
     for r in results.boxes:
@@ -71,4 +227,4 @@ def detect_vehicles(frame):
             x1, y1, x2, y2 = map(int, r.xyxy[0])  # Get bounding box coordinates as integers
             detections.append((label, (x1, y1, x2, y2)))
 
-    return detections
\ No newline at end of file
+    return detections
@@ -0,0 +1,92 @@
+import os
+import logging
+
+TORCH = "torch"            # Eager PyTorch, fp32 (default)
+ONNX = "onnx"              # ONNX Runtime on CPU, fp32
+ONNX_INT8 = "onnx-int8"    # ONNX Runtime on CPU, dynamically quantized int8 weights
+BACKENDS = (TORCH, ONNX, ONNX_INT8)
+
+# Runtime configuration (environment variables), so a deployment can switch backends
+# without a code change.
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", TORCH)
+ORT_INTRA_OP_THREADS = int(os.environ.get("ORT_INTRA_OP_THREADS", "0"))  # 0 = ORT default (one per physical core)
+ORT_INTER_OP_THREADS = int(os.environ.get("ORT_INTER_OP_THREADS", "1"))  # >1 runs independent graph branches in parallel
+ONNX_DIR = os.environ.get(
+    "ONNX_MODEL_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "onnx_models"))
+)
+ONNX_OPSET = 17
+
+log = logging.getLogger(__name__)
+
+
+def resolve_backend(backend=None):
+    """
+    Returns `backend` (default: INFERENCE_BACKEND), validated.
+    """
+    backend = backend or INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {BACKENDS}")
+    return backend
+
+
+def onnx_model_path(name, quantized=False):
+    return os.path.join(ONNX_DIR, name + (".int8" if quantized else "") + ".onnx")
+
+
+def ensure_onnx_model(name, export, quantized=False):
+    """
+    Returns the path of ONNX model `name`, creating it on first use:
+    `export(path)` must write the fp32 model to `path`; the int8 variant is then derived
+    from it with dynamic quantization. Files are written under a temporary name and
+    renamed, so processes starting at the same time never load a half-written model.
+    """
+    fp32_path = onnx_model_path(name)
+    if not os.path.exists(fp32_path):
+        os.makedirs(ONNX_DIR, exist_ok=True)
+        tmp_path = f"{fp32_path}.{os.getpid()}.tmp"
+        log.info("exporting ONNX model", extra={"model": name, "path": fp32_path})
+        export(tmp_path)
+        os.replace(tmp_path, fp32_path)
+
+    if not quantized:
+        return fp32_path
+
+    int8_path = onnx_model_path(name, quantized=True)
+    if not os.path.exists(int8_path):
+        tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+        log.info("quantizing ONNX model to int8", extra={"model": name, "path": int8_path})
+        quantize_dynamic_int8(fp32_path, tmp_path)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+def quantize_dynamic_int8(source_path, target_path):
+    """
+    Dynamic quantization: weights are stored as int8, activations are quantized on the fly,
+    so no calibration data is needed.
+    """
+    try:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+    except ImportError as e:
+        raise ImportError("The onnx-int8 backend needs onnxruntime: pip install onnx onnxruntime") from e
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QInt8)
+
+
+def create_session(path, intra_op_threads=ORT_INTRA_OP_THREADS, inter_op_threads=ORT_INTER_OP_THREADS):
+    """
+    Opens an ONNX Runtime CPU session with full graph optimization and the configured
+    thread pools.
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("The onnx backends need onnxruntime: pip install onnx onnxruntime") from e
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    options.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL if inter_op_threads > 1 else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
@@ -0,0 +1,269 @@
+# vehicle_monitoring/detection/plate_detector.py
+
+import time
+import cv2
+import numpy as np
+
+from detection.onnx_backend import TORCH, ONNX_INT8, resolve_backend, ensure_onnx_model, create_session, ONNX_OPSET
+from pipeline.model_registry import models
+
+PLATE_MODEL_NAME = "nickmuchi/yolos-small-finetuned-license-plate-detection"
+PLATE_THRESHOLD = 0.4
+
+# YolosImageProcessor defaults, used when the processor config doesn't override them
+YOLOS_INPUT_SIZE = (800, 1333)               # (shortest_edge, longest_edge)
+YOLOS_SIZE_MULTIPLE = 16                     # Resized sides are rounded down to a multiple of the patch size
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# torch and transformers are imported where they are first needed, so importing this
+# module stays cheap; the model itself is loaded through the registry.
+
+
+def yolos_resize_size(height, width, shortest_edge, longest_edge, multiple=YOLOS_SIZE_MULTIPLE):
+    """
+    The (height, width) YolosImageProcessor resizes an image to: shortest side to
+    `shortest_edge` unless that pushes the longest side past `longest_edge`, then both
+    sides rounded down to a multiple of `multiple`.
+    """
+    size, raw_size = shortest_edge, None
+    short_side, long_side = float(min(height, width)), float(max(height, width))
+    if long_side / short_side * size > longest_edge:
+        raw_size = longest_edge * short_side / long_side
+        size = int(round(raw_size))
+
+    if width < height:
+        out_w, out_h = size, int((raw_size or size) * height / width)
+    elif min(height, width) == size:
+        out_h, out_w = height, width
+    else:
+        out_h, out_w = size, int((raw_size or size) * width / height)
+    return max(multiple, out_h - out_h % multiple), max(multiple, out_w - out_w % multiple)
+
+
+class FramePreprocessor:
+    """
+    NumPy replacement for YolosImageProcessor's preprocessing of OpenCV frames.
+
+    Each BGR frame is resized straight into a reused uint8 buffer, then written into a
+    reused float32 NCHW batch buffer with the BGR -> RGB swap, 1/255 rescale and mean/std
+    normalization fused into one pass per channel. There is no PIL round trip and no
+    per-frame allocation once the buffers for a given input size exist.
+
+    The returned array is a view of the batch buffer and is overwritten by the next call,
+    so it must be consumed (copied to the device or run through the model) first. One
+    instance must not be shared between threads.
+    """
+
+    def __init__(self, input_size=YOLOS_INPUT_SIZE, mean=IMAGENET_MEAN, std=IMAGENET_STD,
+                 rescale_factor=1 / 255.0):
+        self.input_size = tuple(input_size)
+        std = np.asarray(std, dtype=np.float32)
+        # (x * rescale - mean) / std == x * scale - offset, per RGB channel
+        self._scale = (rescale_factor / std).astype(np.float32)
+        self._offset = (np.asarray(mean, dtype=np.float32) / std).astype(np.float32)
+        self._batch_buffers = {}   # (height, width) -> float32 array (capacity, 3, height, width)
+        self._resize_buffers = {}  # (height, width) -> uint8 array (height, width, 3)
+
+    def __call__(self, frames, input_size=None):
+        """
+        Parameters:
+            frames (list of numpy arrays): BGR frames, all of the same shape
+            input_size (tuple): optional (shortest_edge, longest_edge) instead of the default
+
+        Returns:
+            float32 array (len(frames), 3, height, width), normalized RGB
+        """
+        h, w = frames[0].shape[:2]
+        out_h, out_w = yolos_resize_size(h, w, *(input_size or self.input_size))
+        batch = self._batch_buffer(len(frames), out_h, out_w)
+
+        for i, frame in enumerate(frames):
+            if (h, w) == (out_h, out_w):
+                resized = frame
+            else:
+                resized = self._resize_buffers.get((out_h, out_w))
+                if resized is None:
+                    resized = self._resize_buffers[(out_h, out_w)] = np.empty((out_h, out_w, 3), dtype=np.uint8)
+                cv2.resize(frame, (out_w, out_h), dst=resized, interpolation=cv2.INTER_LINEAR)
+            for channel in range(3):
+                # RGB channel `channel` is BGR channel 2 - channel
+                out = batch[i, channel]
+                np.multiply(resized[:, :, 2 - channel], self._scale[channel], out=out)
+                np.subtract(out, self._offset[channel], out=out)
+        return batch
+
+    def _batch_buffer(self, count, height, width):
+        buffer = self._batch_buffers.get((height, width))
+        if buffer is None or len(buffer) < count:
+            buffer = self._batch_buffers[(height, width)] = np.empty((count, 3, height, width), dtype=np.float32)
+        return buffer[:count]
+
+
+def select_device():
+    """
+    Returns the best available torch device: 'mps', 'cuda' or 'cpu'.
+    """
+    import torch
+
+    if torch.backends.mps.is_available():
+        return 'mps'
+    if torch.cuda.is_available():
+        return 'cuda'
+    return 'cpu'
+
+
+class PlateDetector:
+    """
+    YOLOS license plate detector that runs several frames through a single forward pass.
+
+    Frames are grouped by resolution before batching, since YOLOS post-processing
+    scales boxes relative to the (unpadded) input size of each image.
+    Preprocessing is done by FramePreprocessor on the raw BGR arrays, into buffers
+    reused across calls, rather than by YolosImageProcessor through PIL images.
+
+    `backend` (see detection.onnx_backend) selects eager PyTorch or ONNX Runtime on CPU,
+    fp32 or int8. The ONNX graph is exported (and quantized) on first use for each input
+    resolution the processor produces, since YOLOS interpolates its position embeddings
+    to the input size; only the batch dimension is dynamic.
+
+    Prefer `get_plate_detector()`, which loads the model once per process.
+    """
+
+    def __init__(self, device="cpu", threshold=PLATE_THRESHOLD, model_name=PLATE_MODEL_NAME, backend=TORCH):
+        from transformers import YolosImageProcessor
+
+        self.backend = resolve_backend(backend)
+        self.device = device if self.backend == TORCH else "cpu"
+        self.threshold = threshold
+        self.model_name = model_name
+        self.processor = YolosImageProcessor.from_pretrained(model_name)
+        self.preprocess = FramePreprocessor(
+            input_size=self._processor_input_size(), mean=self.processor.image_mean, std=self.processor.image_std,
+            rescale_factor=self.processor.rescale_factor,
+        )
+        self.model = self._load_torch_model() if self.backend == TORCH else None
+        self._sessions = {}  # ONNX Runtime session per (height, width) of the model input
+
+    def detect(self, frames, timer=None, input_size=None):
+        """
+        Detect number plates in a batch of BGR frames.
+
+        Parameters:
+            frames (list of numpy arrays): input frames (from OpenCV)
+            timer (pipeline.timing.StageTimer): optional; records "preprocess"
+            input_size (tuple): optional (shortest_edge, longest_edge) the processor resizes
+                to, instead of its default; smaller inputs (e.g. vehicle ROIs) run faster
+
+        Returns:
+            List with one entry per frame: [(score, (x1, y1, x2, y2)), ...]
+            Boxes are integers clipped to the frame bounds; empty boxes are dropped.
+        """
+        import torch
+
+        detections = [[] for _ in frames]
+
+        shape_groups = {}
+        for idx, frame in enumerate(frames):
+            shape_groups.setdefault(frame.shape[:2], []).append(idx)
+
+        for (h, w), indices in shape_groups.items():
+            start = time.perf_counter()
+            # Shares memory with the preprocessor's buffer; only a non-CPU device copies
+            pixel_values = torch.from_numpy(self.preprocess([frames[i] for i in indices], input_size))
+            pixel_values = pixel_values.to(self.device)
+            if timer is not None:
+                timer.record("preprocess", time.perf_counter() - start)
+
+            with torch.no_grad():
+                outputs = self._forward(pixel_values)
+
+            target_sizes = torch.tensor([[h, w]] * len(indices)).to(self.device)
+            results = self.processor.post_process_object_detection(
+                outputs, threshold=self.threshold, target_sizes=target_sizes
+            )
+
+            for idx, result in zip(indices, results):
+                detections[idx] = self._to_boxes(result, w, h)
+
+        return detections
+
+    def _forward(self, pixel_values):
+        if self.backend == TORCH:
+            return self.model(pixel_values=pixel_values)
+
+        import torch
+        from transformers.models.yolos.modeling_yolos import YolosObjectDetectionOutput
+
+        session = self._session(tuple(pixel_values.shape[2:]))
+        logits, pred_boxes = session.run(None, {"pixel_values": pixel_values.numpy()})
+        return YolosObjectDetectionOutput(logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes))
+
+    def _session(self, input_hw):
+        session = self._sessions.get(input_hw)
+        if session is None:
+            height, width = input_hw
+            name = f"{self.model_name.replace('/', '--')}_{height}x{width}"
+            path = ensure_onnx_model(name, lambda out: self._export_onnx(out, height, width),
+                                     quantized=self.backend == ONNX_INT8)
+            session = self._sessions[input_hw] = create_session(path)
+        return session
+
+    def _export_onnx(self, path, height, width):
+        import torch
+
+        model = self.model if self.model is not None else self._load_torch_model()
+
+        class OnnxWrapper(torch.nn.Module):
+            def __init__(self, detector):
+                super().__init__()
+                self.detector = detector
+
+            def forward(self, pixel_values):
+                outputs = self.detector(pixel_values=pixel_values)
+                return outputs.logits, outputs.pred_boxes
+
+        dynamic_batch = {0: "batch"}
+        torch.onnx.export(
+            OnnxWrapper(model.to("cpu")), (torch.zeros(1, 3, height, width),), path,
+            input_names=["pixel_values"], output_names=["logits", "pred_boxes"],
+            dynamic_axes={"pixel_values": dynamic_batch, "logits": dynamic_batch, "pred_boxes": dynamic_batch},
+            opset_version=ONNX_OPSET,
+        )
+
+    def _processor_input_size(self):
+        size = self.processor.size or {}
+        return (size.get("shortest_edge", YOLOS_INPUT_SIZE[0]), size.get("longest_edge", YOLOS_INPUT_SIZE[1]))
+
+    def _load_torch_model(self):
+        from transformers import YolosForObjectDetection
+
+        model = YolosForObjectDetection.from_pretrained(self.model_name)
+        model.to(self.device)
+        model.eval()
+        return model
+
+    @staticmethod
+    def _to_boxes(result, width, height):
+        boxes = []
+        for score, box in zip(result["scores"], result["boxes"]):
+            x1, y1, x2, y2 = map(int, box.tolist())
+            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+            if x1 >= x2 or y1 >= y2:
+                continue
+            boxes.append((float(score), (x1, y1, x2, y2)))
+        return boxes
+
+
+def get_plate_detector(device=None, backend=None):
+    """
+    Returns this process's PlateDetector for `device` (default: select_device()) and
+    `backend` (default: INFERENCE_BACKEND), loading it on first call. ONNX backends
+    always run on the CPU.
+    """
+    backend = resolve_backend(backend)
+    device = (device or select_device()) if backend == TORCH else "cpu"
+    return models.get("plate_detector", device=device, backend=backend)
+
+
+models.register("plate_detector", lambda device, backend: PlateDetector(device=device, backend=backend))
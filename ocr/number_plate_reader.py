@@ -1,10 +1,34 @@
 import os
 import re
+import logging
 import cv2
 import numpy as np
-import easyocr
 
-easy_ocr = easyocr.Reader(['en'], gpu=False)
+from ocr.plate_cache import PlateTextCache, dhash
+from pipeline.model_registry import models
+
+log = logging.getLogger(__name__)
+
+
+def _load_easyocr():
+    import easyocr
+
+    return easyocr.Reader(['en'], gpu=False)
+
+
+models.register("easyocr", _load_easyocr)
+
+
+def get_ocr_reader():
+    """
+    Returns this process's EasyOCR reader, loading it on first call.
+    """
+    return models.get("easyocr")
+
+
+# Reads of near-identical preprocessed crops (e.g. a car waiting at a barrier) are reused,
+# per camera; failed reads ("N/A") are never cached
+ocr_cache = PlateTextCache()
 
 TO_NUMBER = {
     'O': '0', 'D': '0', 'Q': '0',
@@ -27,12 +51,35 @@ TO_ALPHA = {
     '4': 'A' 
 }
 
+PLATE_SIZE = (300, 80)  # (width, height) every crop is normalised to before OCR
+
 def preprocess_plate(image):
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     filtered = cv2.bilateralFilter(gray, 11, 17, 17)
-    resized = cv2.resize(filtered, (300, 80))
+    resized = cv2.resize(filtered, PLATE_SIZE)
     return cv2.cvtColor(resized, cv2.COLOR_GRAY2BGR)
 
+def preprocess_plates(images):
+    """
+    Batch version of preprocess_plate.
+
+    Returns:
+        numpy array of shape (N, 80, 300, 3): every crop filtered and resized straight
+        into one preallocated stack, then converted back to 3 channels in a single call.
+    """
+    width, height = PLATE_SIZE
+    if len(images) == 0:
+        return np.empty((0, height, width, 3), dtype=np.uint8)
+
+    stacked = np.empty((len(images), height, width), dtype=np.uint8)
+    for i, image in enumerate(images):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        filtered = cv2.bilateralFilter(gray, 11, 17, 17)
+        cv2.resize(filtered, PLATE_SIZE, dst=stacked[i])
+
+    bgr = cv2.cvtColor(stacked.reshape(-1, width), cv2.COLOR_GRAY2BGR)
+    return bgr.reshape(len(images), height, width, 3)
+
 def clean_plate_text(text):
     return re.sub(r'[^A-Z0-9]', '', text.upper().strip())
 
@@ -70,7 +117,19 @@ def plate_valid(text):
         text[6:].isdigit()
     )
 
-def read_plate_text(plate_img, debug=False, debug_dir=None, frame_info=None, enable_correction=True):
+def read_plate_text(plate_img, debug=False, debug_dir=None, frame_info=None, enable_correction=True,
+                    return_confidence=False, use_cache=True, cache_scope=None):
+    """
+    Reads a number plate from a cropped plate image.
+
+    With `use_cache` (and correction enabled, which is what the cache stores), the
+    preprocessed crop is looked up in `ocr_cache` by perceptual hash first, among the
+    reads of `cache_scope` (e.g. the crop's camera), and EasyOCR only runs on a miss.
+
+    Returns:
+        The validated plate text, or "N/A". With `return_confidence`, a tuple
+        (text, confidence) where confidence is EasyOCR's mean line confidence (0.0 for "N/A").
+    """
     preprocessed = preprocess_plate(plate_img)
 
     if debug and debug_dir and frame_info:
@@ -78,19 +137,92 @@ def read_plate_text(plate_img, debug=False, debug_dir=None, frame_info=None, ena
         debug_path = os.path.join(debug_dir, f"{frame_info}_preprocessed.jpg")
         cv2.imwrite(debug_path, preprocessed)
 
+    cache_key = None
+    if use_cache and enable_correction:
+        cache_key = dhash(preprocessed)
+        cached = ocr_cache.get(cache_key, cache_scope)
+        if cached is not None:
+            return cached if return_confidence else cached[0]
+
     try:
-        result = easy_ocr.readtext(preprocessed)
-        if result:
-            raw_text = ''.join([line[1] for line in result])
-            cleaned = clean_plate_text(raw_text)
+        text, confidence = _parse_ocr_result(get_ocr_reader().readtext(preprocessed), enable_correction)
+    except Exception:
+        log.exception("EasyOCR failed")
+        text, confidence = "N/A", 0.0
+
+    if cache_key is not None and text != "N/A":
+        ocr_cache.put(cache_key, (text, confidence), cache_scope)
+
+    return (text, confidence) if return_confidence else text
 
-            if enable_correction:
-                cleaned = post_process_indian_plate(cleaned)
+def read_plate_texts(plate_imgs, debug=False, debug_dir=None, frame_infos=None, enable_correction=True,
+                     return_confidence=False, use_cache=True, cache_scopes=None):
+    """
+    Batch version of read_plate_text for many crops (e.g. every plate in a frame or a
+    batch window across cameras).
 
-            if plate_valid(cleaned):
-                return cleaned
+    All crops are preprocessed into one stacked array, cache hits are answered directly,
+    and the remaining crops go through EasyOCR's batched path in a single call.
+    `frame_infos`, if given, is one debug file prefix per crop (None to skip that crop).
+    `cache_scopes`, if given, is one cache scope per crop (see read_plate_text), where
+    None skips the cache for that crop (e.g. a re-read that must be independent).
 
-    except Exception as e:
-        print(f"❌ EasyOCR Error: {e}")
+    Returns:
+        List with one entry per crop, in order, with the same values read_plate_text returns
+    """
+    if len(plate_imgs) == 0:
+        return []
 
-    return "N/A"
+    preprocessed = preprocess_plates(plate_imgs)
+
+    if debug and debug_dir and frame_infos:
+        os.makedirs(debug_dir, exist_ok=True)
+        for image, frame_info in zip(preprocessed, frame_infos):
+            if frame_info is None:
+                continue
+            cv2.imwrite(os.path.join(debug_dir, f"{frame_info}_preprocessed.jpg"), image)
+
+    results = [None] * len(plate_imgs)
+    cache_keys = [None] * len(plate_imgs)
+    scopes = cache_scopes if cache_scopes is not None else [None] * len(plate_imgs)
+    if use_cache and enable_correction:
+        for i, image in enumerate(preprocessed):
+            if cache_scopes is not None and scopes[i] is None:
+                continue
+            cache_keys[i] = dhash(image)
+            results[i] = ocr_cache.get(cache_keys[i], scopes[i])
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        try:
+            width, height = PLATE_SIZE
+            batch = get_ocr_reader().readtext_batched(
+                preprocessed[pending], n_width=width, n_height=height, batch_size=len(pending)
+            )
+            read = [_parse_ocr_result(lines, enable_correction) for lines in batch]
+        except Exception:
+            log.exception("EasyOCR failed", extra={"crops": len(pending)})
+            read = [("N/A", 0.0)] * len(pending)
+
+        for i, result in zip(pending, read):
+            results[i] = result
+            if cache_keys[i] is not None and result[0] != "N/A":
+                ocr_cache.put(cache_keys[i], result, scopes[i])
+
+    return results if return_confidence else [text for text, _ in results]
+
+def _parse_ocr_result(result, enable_correction):
+    """
+    Turns EasyOCR output lines into (text, confidence) — ("N/A", 0.0) if nothing valid was read.
+    """
+    if result:
+        raw_text = ''.join([line[1] for line in result])
+        cleaned = clean_plate_text(raw_text)
+
+        if enable_correction:
+            cleaned = post_process_indian_plate(cleaned)
+
+        if plate_valid(cleaned):
+            return cleaned, float(sum(line[2] for line in result) / len(result))
+
+    return "N/A", 0.0
@@ -0,0 +1,106 @@
+import time
+import cv2
+import numpy as np
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL_SECONDS = 30.0
+CACHE_HASH_SIZE = (32, 16)     # dHash grid (width, height) -> 512-bit hash
+CACHE_MAX_DISTANCE = 20        # Max differing hash bits for two crops to count as the same plate
+
+
+def dhash(image, hash_size=CACHE_HASH_SIZE):
+    """
+    Difference hash of an image: each bit says whether a pixel is brighter than its
+    right-hand neighbour on a small grayscale grid. Returned as a Python int.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    width, height = hash_size
+    small = cv2.resize(image, (width + 1, height), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class PlateTextCache:
+    """
+    Bounded cache of OCR results keyed by perceptual hash, within a scope (e.g. the
+    camera the crop came from).
+
+    A lookup hits when a stored hash of the same scope is within `max_distance` bits
+    (Hamming distance) of the query, so near-identical crops of a stationary plate reuse
+    the previous read, while similar-looking plates on other cameras never do. Entries
+    expire `ttl_seconds` after they were stored, however often they are hit, so a
+    misread can't be served for longer than that; beyond `max_entries` the least
+    recently used go first. Lookups scan every entry (for expiry, and for the closest
+    hash without an exact match), so they are O(`max_entries`).
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS,
+                 max_distance=CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (scope, hash) -> (value, stored_at), least recently used first
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, scope=None):
+        """
+        Returns:
+            The cached value for the closest hash within tolerance in `scope`, or None
+        """
+        self._expire(time.monotonic())
+
+        match = (scope, key) if (scope, key) in self._entries else None
+        if match is None and self.max_distance > 0:
+            best = self.max_distance + 1
+            for stored in self._entries:
+                if stored[0] != scope:
+                    continue
+                distance = (stored[1] ^ key).bit_count()
+                if distance < best:
+                    match, best = stored, distance
+
+        if match is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(match)
+        return self._entries[match][0]
+
+    def put(self, key, value, scope=None):
+        self._entries[(scope, key)] = (value, time.monotonic())
+        self._entries.move_to_end((scope, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _expire(self, now):
+        # Hits reorder entries, so stale ones aren't necessarily at the front
+        cutoff = now - self.ttl_seconds
+        stale = [stored for stored, (_, stored_at) in self._entries.items() if stored_at < cutoff]
+        for stored in stale:
+            del self._entries[stored]
+        self.expirations += len(stale)
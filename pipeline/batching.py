@@ -0,0 +1,46 @@
+import time
+
+BATCH_SIZE = 4              # Max frames per detector forward pass
+BATCH_MAX_LATENCY_MS = 100  # Max time the oldest frame may wait for a batch to fill
+
+
+class FrameBatcher:
+    """
+    Accumulates frames (from one or several cameras) until either the batch is full
+    or the oldest queued frame has waited longer than the latency budget.
+
+    Each frame is queued with a key (e.g. (cam_name, frame_count)) so the batch
+    results can be fanned back out to the right camera.
+    """
+
+    def __init__(self, max_batch_size=BATCH_SIZE, max_latency_ms=BATCH_MAX_LATENCY_MS):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_latency = max_latency_ms / 1000.0
+        self._keys = []
+        self._frames = []
+        self._oldest = None
+
+    def __len__(self):
+        return len(self._frames)
+
+    def add(self, key, frame):
+        if not self._frames:
+            self._oldest = time.monotonic()
+        self._keys.append(key)
+        self._frames.append(frame)
+
+    def is_ready(self):
+        if not self._frames:
+            return False
+        if len(self._frames) >= self.max_batch_size:
+            return True
+        return (time.monotonic() - self._oldest) >= self.max_latency
+
+    def flush(self):
+        """
+        Returns:
+            (keys, frames) for everything queued so far, and empties the batcher.
+        """
+        keys, frames = self._keys, self._frames
+        self._keys, self._frames, self._oldest = [], [], None
+        return keys, frames
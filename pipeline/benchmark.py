@@ -0,0 +1,308 @@
+"""
+Offline benchmark: replays recorded videos through the detection pipeline and reports
+per-stage latency percentiles, end-to-end FPS and peak RSS as JSON, so runs can be
+diffed between releases.
+
+The detector and OCR are pluggable. The default stubs need no model downloads, so the
+benchmark measures everything around the models (decode, tracking, color, storage);
+use --detector yolos / --ocr easyocr to include the real models.
+
+Run with:  python pipeline/benchmark.py --output benchmark_report.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+
+# Add root to path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from detection.onnx_backend import BACKENDS
+from detection.plate_detector import FramePreprocessor
+from pipeline.batching import FrameBatcher, BATCH_SIZE, BATCH_MAX_LATENCY_MS
+from pipeline.frame_processor import FrameProcessor, process_batch
+from pipeline.motion_gate import MotionGate, MOTION_GATE_ENABLED
+from pipeline.regions import load_camera_regions, detect_in_regions
+from pipeline.telemetry import configure_logging
+from pipeline.timing import StageTimer
+from storage.database import init_db, DetectionWriter
+from storage.evidence import EvidenceWriter, EvidenceStore
+
+SAMPLE_VIDEO_DIR = os.path.join(os.path.dirname(__file__), "..", "sample_videos")
+BENCHMARK_VIDEOS = {
+    "cam1": os.path.join(SAMPLE_VIDEO_DIR, "cam1.mp4"),
+    "cam2": os.path.join(SAMPLE_VIDEO_DIR, "cam2.mp4"),
+}
+STUB_PLATES = ["RJ14AB1234", "MH12CD5678", "DL03EF9012", "KA05GH3456", "TN09JK7890"]
+STUB_TRACK_LENGTH = 60   # Frames a stub plate drifts across before jumping back (a new track)
+
+
+class StubPlateDetector:
+    """
+    Model-free stand-in for PlateDetector: returns `plates_per_frame` plate-sized boxes
+    that drift across the lower part of each frame and periodically jump back, so the
+    tracker sees tracks start, continue and expire. Deterministic for a given frame order.
+
+    Frames still go through the same FramePreprocessor as PlateDetector (at the default
+    YOLOS input size), so "preprocess" is measured without the model.
+    """
+
+    def __init__(self, plates_per_frame=2, delay_ms=0.0):
+        self.plates_per_frame = plates_per_frame
+        self.delay_ms = delay_ms
+        self._frames_seen = 0
+        self.preprocess = FramePreprocessor()
+
+    def detect(self, frames, timer=None, input_size=None):
+        start = time.perf_counter()
+        shape_groups = {}
+        for frame in frames:
+            shape_groups.setdefault(frame.shape[:2], []).append(frame)
+        for group in shape_groups.values():
+            self.preprocess(group, input_size)
+        if timer is not None:
+            timer.record("preprocess", time.perf_counter() - start)
+
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000.0)
+
+        detections = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            plate_w, plate_h = max(8, w // 8), max(4, w // 32)
+            drift = (self._frames_seen % STUB_TRACK_LENGTH) * w // (4 * STUB_TRACK_LENGTH)
+            boxes = []
+            for i in range(self.plates_per_frame):
+                x1 = min(w - plate_w, (i + 1) * w // (self.plates_per_frame + 2) + drift)
+                y1 = min(h - plate_h, 3 * h // 4)
+                boxes.append((0.9, (x1, y1, x1 + plate_w, y1 + plate_h)))
+            detections.append(boxes)
+            self._frames_seen += 1
+        return detections
+
+
+class StubPlateReader:
+    """
+    Model-free stand-in for read_plate_texts (same signature): picks a valid plate from
+    STUB_PLATES based on the crop's content, after an optional per-crop delay.
+    """
+
+    def __init__(self, delay_ms=0.0):
+        self.delay_ms = delay_ms
+
+    def __call__(self, plate_imgs, debug=False, debug_dir=None, frame_infos=None, enable_correction=True,
+                 return_confidence=False, use_cache=True, cache_scopes=None):
+        if self.delay_ms:
+            time.sleep(len(plate_imgs) * self.delay_ms / 1000.0)
+        results = [(STUB_PLATES[int(img.mean()) % len(STUB_PLATES)], 0.9) for img in plate_imgs]
+        return results if return_confidence else [text for text, _ in results]
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB, or None where unsupported (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1024.0 ** 2 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def run_benchmark(videos, detector, read_texts, max_frames=None, batch_size=BATCH_SIZE,
+                  max_latency_ms=BATCH_MAX_LATENCY_MS, motion_gate=MOTION_GATE_ENABLED, work_dir=None,
+                  regions=None):
+    """
+    Replays `videos` ({cam_name: path}) round-robin through batching, detection and the
+    per-camera FrameProcessors (headless), with detections and evidence written to a
+    scratch database and evidence store under `work_dir`.
+
+    Frames are decoded synchronously (not on FrameGrabber threads) so decode latency can
+    be measured and every frame is processed. `regions` ({cam_name: CameraRegion})
+    restrict detection as in the live pipeline.
+
+    Returns:
+        The report dict (see README); stage latencies are in milliseconds
+    """
+    timer = StageTimer()
+    work_dir = work_dir or tempfile.mkdtemp(prefix="vehicle_benchmark_")
+    db_path = os.path.join(work_dir, "benchmark.db")
+    init_db(db_path)
+
+    captures = {}
+    for cam_name, path in videos.items():
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"Could not open video: {path}")
+        captures[cam_name] = cap
+
+    writer = DetectionWriter(db_path=db_path, timer=timer)
+    evidence_writer = EvidenceWriter(timer=timer)
+    evidence_store = EvidenceStore(root=os.path.join(work_dir, "evidence"), writer=evidence_writer)
+    processors = {
+        cam_name: FrameProcessor(cam_name, os.path.join(work_dir, "debug"), writer=writer,
+                                 evidence_store=evidence_store, headless=True)
+        for cam_name in captures
+    }
+    gates = {cam_name: MotionGate() for cam_name in captures} if motion_gate else {}
+    batcher = FrameBatcher(max_batch_size=batch_size, max_latency_ms=max_latency_ms)
+    frame_counts = {cam_name: 0 for cam_name in captures}
+    frames_processed = 0
+    boxes_detected = 0
+
+    def run_batch():
+        keys, frames = batcher.flush()
+        with timer.time("detection"):
+            detections = detect_in_regions(detector, keys, frames, regions, timer=timer)
+        process_batch(processors, keys, frames, detections, read_texts=read_texts, timer=timer)
+        return len(frames), sum(len(boxes) for boxes in detections)
+
+    start = time.perf_counter()
+    active = list(captures)
+    try:
+        while active:
+            for cam_name in list(active):
+                decode_start = time.perf_counter()
+                ret, frame = captures[cam_name].read()
+                if not ret:
+                    active.remove(cam_name)
+                    continue
+                timer.record("decode", time.perf_counter() - decode_start)
+
+                gate = gates.get(cam_name)
+                if gate is not None:
+                    with timer.time("motion_gate"):
+                        moving = gate.should_process(frame)
+                if gate is None or moving:
+                    batcher.add((cam_name, frame_counts[cam_name]), frame)
+                frame_counts[cam_name] += 1
+                if max_frames is not None and frame_counts[cam_name] >= max_frames:
+                    active.remove(cam_name)
+
+                if batcher.is_ready():
+                    with timer.time("batch_total"):
+                        processed, boxes = run_batch()
+                    frames_processed += processed
+                    boxes_detected += boxes
+
+        if len(batcher):
+            with timer.time("batch_total"):
+                processed, boxes = run_batch()
+            frames_processed += processed
+            boxes_detected += boxes
+    finally:
+        for processor in processors.values():
+            processor.close()  # Final state of sessions still open
+        evidence_writer.close()
+        writer.close()
+        for cap in captures.values():
+            cap.release()
+    wall_seconds = time.perf_counter() - start
+
+    frames_decoded = sum(frame_counts.values())
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": {
+            "videos": {cam_name: os.path.basename(path) for cam_name, path in videos.items()},
+            "detector": type(detector).__name__,
+            "backend": getattr(detector, "backend", None),
+            "ocr": getattr(read_texts, "__name__", type(read_texts).__name__),
+            "max_frames": max_frames,
+            "batch_size": batch_size,
+            "max_latency_ms": max_latency_ms,
+            "motion_gate": motion_gate,
+            "regions": sorted(regions or ()),
+        },
+        "frames": {
+            "decoded": frames_decoded,
+            "processed": frames_processed,
+            "skipped_by_motion_gate": frames_decoded - frames_processed,
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "fps": round(frames_decoded / wall_seconds, 2) if wall_seconds else 0.0,
+        "processed_fps": round(frames_processed / wall_seconds, 2) if wall_seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": timer.summary(),
+        "counters": {
+            "boxes_detected": boxes_detected,
+            "ocr_reads": sum(processor.ocr_calls for processor in processors.values()),
+            "db_rows_written": writer.rows_written,
+            "db_batches_written": writer.batches_written,
+            "db_errors": writer.errors,
+            "images_written": evidence_writer.written,
+            "images_deduplicated": evidence_store.deduplicated,
+            "images_dropped": evidence_writer.dropped,
+        },
+    }
+
+
+def _load_detector(name, stub_delay_ms, backend=None):
+    if name == "stub":
+        return StubPlateDetector(delay_ms=stub_delay_ms)
+    from detection.plate_detector import get_plate_detector
+    return get_plate_detector(backend=backend)
+
+
+def _load_reader(name, stub_delay_ms):
+    if name == "stub":
+        return StubPlateReader(delay_ms=stub_delay_ms)
+    from ocr.number_plate_reader import read_plate_texts
+    from pipeline.model_registry import models
+    models.warm_up("easyocr")
+    return read_plate_texts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline over recorded videos.")
+    parser.add_argument("videos", nargs="*", metavar="CAM=PATH",
+                        help="Videos to replay (default: sample_videos/cam1.mp4 and cam2.mp4)")
+    parser.add_argument("--detector", choices=["stub", "yolos"], default="stub")
+    parser.add_argument("--ocr", choices=["stub", "easyocr"], default="stub")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Inference backend for --detector yolos (default: INFERENCE_BACKEND)")
+    parser.add_argument("--stub-detector-ms", type=float, default=0.0,
+                        help="Simulated detector latency per batch")
+    parser.add_argument("--stub-ocr-ms", type=float, default=0.0, help="Simulated OCR latency per crop")
+    parser.add_argument("--max-frames", type=int, default=None, help="Frames per camera (default: all)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-latency-ms", type=float, default=BATCH_MAX_LATENCY_MS)
+    parser.add_argument("--motion-gate", action=argparse.BooleanOptionalAction, default=MOTION_GATE_ENABLED)
+    parser.add_argument("--regions", metavar="PATH",
+                        help="Per-camera region config (see pipeline/regions.py; default: none)")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    parser.add_argument("--verbose", action="store_true", help="Log the pipeline's per-frame output to stderr")
+    args = parser.parse_args()
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING, rate_limit=not args.verbose)
+
+    videos = dict(video.split("=", 1) for video in args.videos) if args.videos else BENCHMARK_VIDEOS
+    detector = _load_detector(args.detector, args.stub_detector_ms, args.backend)
+    read_texts = _load_reader(args.ocr, args.stub_ocr_ms)
+
+    work_dir = tempfile.mkdtemp(prefix="vehicle_benchmark_")
+    try:
+        report = run_benchmark(
+            videos, detector, read_texts, max_frames=args.max_frames, batch_size=args.batch_size,
+            max_latency_ms=args.max_latency_ms, motion_gate=args.motion_gate, work_dir=work_dir,
+            regions=load_camera_regions(args.regions) if args.regions else None
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
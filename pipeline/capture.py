@@ -0,0 +1,121 @@
+import queue
+import threading
+import cv2
+
+CAPTURE_QUEUE_SIZE = 4          # Decoded frames buffered per camera
+CAPTURE_POLL_TIMEOUT = 0.01     # Seconds the runner waits on an empty camera queue
+DROP_OLDEST = "drop_oldest"     # Live streams: always keep the freshest frames
+BLOCK = "block"                 # Files: never drop, decoder waits for the pipeline
+
+
+def is_live_source(video_source):
+    """
+    Webcams (integer indexes) and network streams are live; anything else is a file.
+    """
+    if isinstance(video_source, int):
+        return True
+    source = str(video_source).strip().lower()
+    return source.isdigit() or source.startswith(("rtsp://", "rtmp://", "http://", "https://"))
+
+
+class FrameGrabber:
+    """
+    Decodes a video source on its own thread into a bounded queue, so `cv2.VideoCapture.read`
+    never waits behind inference.
+
+    With the DROP_OLDEST policy (default for live sources) a full queue discards its oldest
+    frame, so the pipeline always works on the freshest frames with bounded latency; the
+    discarded frames are counted in `dropped`. With BLOCK (default for files) the decoder
+    waits for space, so every frame is processed.
+    """
+
+    def __init__(self, video_source, queue_size=CAPTURE_QUEUE_SIZE, policy=None):
+        self.video_source = video_source
+        self.policy = policy or (DROP_OLDEST if is_live_source(video_source) else BLOCK)
+        self.frames_read = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stop = threading.Event()
+        self._ended = threading.Event()
+        self._cap = cv2.VideoCapture(video_source)
+        self._thread = None
+
+    def is_opened(self):
+        return self._cap.isOpened()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"FrameGrabber-{self.video_source}", daemon=True)
+        self._thread.start()
+        return self
+
+    def get(self, timeout=None):
+        """
+        Returns:
+            The next frame, or None if none arrived within `timeout` (or the stream ended)
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def read(self):
+        """
+        Blocking, cv2.VideoCapture-compatible read.
+
+        Returns:
+            (ret, frame) — ret is False once the stream has ended and the queue is empty
+        """
+        while True:
+            frame = self.get(timeout=CAPTURE_POLL_TIMEOUT)
+            if frame is not None:
+                return True, frame
+            if self.finished:
+                return False, None
+
+    @property
+    def finished(self):
+        """
+        True once the source is exhausted (or stopped) and every queued frame was consumed.
+        """
+        return self._ended.is_set() and self._queue.empty()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._cap.release()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set() and self._cap.isOpened():
+                ret, frame = self._cap.read()
+                if not ret:
+                    break
+                self.frames_read += 1
+                self._put(frame)
+        finally:
+            self._ended.set()
+
+    def _put(self, frame):
+        if self.policy == DROP_OLDEST:
+            while True:
+                try:
+                    self._queue.put_nowait(frame)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        else:
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(frame, timeout=CAPTURE_POLL_TIMEOUT)
+                    return
+                except queue.Full:
+                    continue
@@ -0,0 +1,172 @@
+"""
+Accuracy/latency comparison of inference backends (see detection.onnx_backend) for the
+plate detector or the vehicle detector, over frames sampled from recorded videos.
+
+The first backend is the reference: for every other backend the report gives latency
+percentiles and how well its boxes agree with the reference's (matched at IoU >= 0.5).
+
+With --detector cascade the reference is full-frame plate detection on the first
+backend instead, and every backend is run as the cascade (detection.cascade) with
+letterboxed ROIs and with the ROIs stretched to one 320x240 canvas, so the report shows
+the plate recall the cascade keeps and what letterboxing changes.
+
+Run with:  python pipeline/compare_backends.py --detector plate --backends torch onnx onnx-int8
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+import cv2
+
+# Add root to path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from detection.onnx_backend import BACKENDS, TORCH, ONNX, ONNX_INT8
+from pipeline.benchmark import BENCHMARK_VIDEOS
+from pipeline.telemetry import configure_logging
+from pipeline.timing import StageTimer
+from pipeline.tracker import box_iou
+
+COMPARE_FRAMES = 50        # Frames sampled per video
+MATCH_IOU_THRESHOLD = 0.5
+
+
+def sample_frames(videos, frames_per_video=COMPARE_FRAMES):
+    """
+    Returns up to `frames_per_video` frames spread evenly over each video.
+    """
+    frames = []
+    for path in videos.values():
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or frames_per_video
+        step = max(1, total // frames_per_video)
+        index = taken = 0
+        while taken < frames_per_video:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index % step == 0:
+                frames.append(frame)
+                taken += 1
+            index += 1
+        cap.release()
+    return frames
+
+
+STRETCHED_ROI_SIZES = ((320, 240),)  # The cascade's former single stretched ROI canvas
+
+
+def _detector_fn(detector, backend):
+    """
+    Returns detect(frame) -> [(x1, y1, x2, y2), ...] for `detector` on `backend`.
+    """
+    if detector in ("cascade", "cascade-stretched"):
+        from detection.cascade import CascadeDetector, get_cascade_detector
+        model = get_cascade_detector(backend=backend)
+        if detector == "cascade-stretched":
+            model = CascadeDetector(model.plate_detector, backend=backend, roi_sizes=STRETCHED_ROI_SIZES,
+                                    roi_letterbox=False)
+        return lambda frame: [box for _, box, _ in model.detect([frame])[0]]
+
+    if detector == "plate":
+        from detection.plate_detector import get_plate_detector
+        model = get_plate_detector(backend=backend)
+        return lambda frame: [box for _, box in model.detect([frame])[0]]
+
+    from detection.detect_vehicles import detect_vehicles
+    return lambda frame: [box for _, box in detect_vehicles(frame, backend=backend)]
+
+
+def agreement(reference, candidate, iou_threshold=MATCH_IOU_THRESHOLD):
+    """
+    Greedy IoU matching of two box lists.
+
+    Returns:
+        (matched, ious) — number of matched pairs and the IoU of each match
+    """
+    pairs = sorted(
+        ((box_iou(r, c), i, j) for i, r in enumerate(reference) for j, c in enumerate(candidate)),
+        reverse=True
+    )
+    used_r, used_c, ious = set(), set(), []
+    for iou, i, j in pairs:
+        if iou < iou_threshold:
+            break
+        if i in used_r or j in used_c:
+            continue
+        used_r.add(i)
+        used_c.add(j)
+        ious.append(iou)
+    return len(ious), ious
+
+
+def compare_backends(detector, backends, frames):
+    """
+    Runs every frame through each backend (after one warm-up frame) and compares each
+    backend's boxes with the first backend's (for the cascade: with full-frame plate
+    detection's, see the module docstring).
+
+    Returns:
+        Report dict: per-backend latency percentiles (ms) and, relative to the reference,
+        recall, precision and mean IoU of matched boxes
+    """
+    if detector == "cascade":
+        variants = [("plate-full-frame", _detector_fn("plate", backends[0]))]
+        for backend in backends:
+            variants.append((backend, _detector_fn("cascade", backend)))
+            variants.append((f"{backend}-stretched", _detector_fn("cascade-stretched", backend)))
+    else:
+        variants = [(backend, _detector_fn(detector, backend)) for backend in backends]
+
+    timer = StageTimer()
+    results = {}
+    for name, detect in variants:
+        detect(frames[0])  # Warm-up: first call may export/quantize and allocate
+        boxes = []
+        for frame in frames:
+            with timer.time(name):
+                boxes.append(detect(frame))
+        results[name] = boxes
+
+    latency = timer.summary()
+    reference = variants[0][0]
+    report = {"detector": detector, "reference": reference, "frames": len(frames), "backends": {}}
+    for backend, _ in variants:
+        ref_total = sum(len(boxes) for boxes in results[reference])
+        cand_total = sum(len(boxes) for boxes in results[backend])
+        matched, ious = 0, []
+        for ref_boxes, cand_boxes in zip(results[reference], results[backend]):
+            frame_matched, frame_ious = agreement(ref_boxes, cand_boxes)
+            matched += frame_matched
+            ious.extend(frame_ious)
+
+        report["backends"][backend] = {
+            "latency": latency[backend],
+            "speedup_vs_reference": round(latency[reference]["mean_ms"] / latency[backend]["mean_ms"], 2),
+            "boxes": cand_total,
+            "recall_vs_reference": round(matched / ref_total, 4) if ref_total else 1.0,
+            "precision_vs_reference": round(matched / cand_total, 4) if cand_total else 1.0,
+            "mean_iou_vs_reference": round(sum(ious) / len(ious), 4) if ious else None,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inference backends for accuracy and latency.")
+    parser.add_argument("--detector", choices=["plate", "vehicle", "cascade"], default="plate")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=[TORCH, ONNX, ONNX_INT8],
+                        help="First one is the reference")
+    parser.add_argument("--frames", type=int, default=COMPARE_FRAMES, help="Frames sampled per video")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+    configure_logging(logging.WARNING)
+
+    report = compare_backends(args.detector, args.backends, sample_frames(BENCHMARK_VIDEOS, args.frames))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
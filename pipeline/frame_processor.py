@@ -0,0 +1,407 @@
+import os
+import time
+import logging
+import cv2
+
+from color_detection.color_detector import get_dominant_colors
+from ocr.number_plate_reader import read_plate_texts
+from pipeline.sessions import SightingSessionizer, OPENED
+from pipeline.tracker import PlateTracker, crop_sharpness
+from storage.database import insert_detection, insert_session, to_unix_time, format_timestamp
+
+DEBUG_SAMPLE_EVERY = 0  # Dump every Nth OCR'd plate crop to the debug dir; 0 disables dumps
+
+log = logging.getLogger(__name__)
+
+
+class FrameWork:
+    """
+    Intermediate state of one frame between FrameProcessor.collect and FrameProcessor.finish.
+    """
+
+    def __init__(self, frame_count, frame, timestamp=None):
+        self.frame_count = frame_count
+        self.frame = frame
+        self.timestamp = timestamp  # When the frame was captured; None: when it is stored
+        self.plates = []          # [(box, track, sharpness), ...]
+        self.color_requests = []  # [(track, vehicle or plate crop), ...] for tracks without a color yet
+        self.ocr_requests = []    # [(track, crop, debug_frame_info, cache_scope), ...]
+        self.finished = []        # Tracks that left the frame on this update
+
+
+class FrameProcessor:
+    """
+    Per-camera handling of detected plate boxes: tracking, color, OCR, storage and annotation.
+
+    Detection itself happens elsewhere (possibly batched across cameras), so this only
+    needs the frame and the boxes the detector returned for it. Boxes are tracked across
+    frames; color is classified once per track and OCR only runs on a track's first and
+    sharpest crops, with the plate resolved by confidence-weighted voting.
+
+    Processing is split into `collect` (track boxes, pick crops that need color or OCR)
+    and `finish` (apply reads, store, annotate), so color and OCR for many frames and
+    cameras can each be done in one batched call in between — see `process_batch`.
+
+    Plates are folded into per-plate sessions (pipeline.sessions) rather than stored frame
+    by frame, and a track only joins one once its vote has settled (Track.settle) or it
+    left the frame, so a vote flipping mid-track can't open a session for a misread. A
+    sighting and the sharpest frame so far are stored when a plate comes into view, the
+    session row is updated when its image or color meaningfully improves, and its final
+    state (with the sharpest frame it was seen in) is stored when it leaves (or on `close`).
+
+    Frames are referenced, not copied, while they may still become evidence, so they are
+    only copied to annotate one that is held that way or whose evidence image may still be
+    queued for writing; in `headless` mode they are never annotated. Evidence frames are saved
+    once each (however many plates they have) to `evidence_store`
+    (storage.evidence.EvidenceStore) when one is given. Stored plates are counted in
+    `metrics` (pipeline.metrics.PipelineMetrics) when one is given. Every plate in view is
+    checked against the live chat queries of `query_matcher`
+    (chat.query_channel.QueryMatcher) when one is given, once per session and query, so a
+    query set while its plate is in view alerts on the next frame it is seen in. Tracks
+    whose vote hasn't settled yet are checked on their current vote.
+
+    Sessions first seen before `defer_until` may continue one that started before this
+    processor's first frame (pipeline.ingest chunks), so nothing of them is stored: their
+    images are saved and closed ones collect in `deferred` for the caller to store or
+    merge (`close(carry=True)` hands over those still open).
+    """
+
+    def __init__(self, cam_name, debug_dir_path, padding=5, writer=None, evidence_store=None,
+                 headless=False, debug_sample_every=DEBUG_SAMPLE_EVERY, metrics=None, query_matcher=None,
+                 defer_until=None):
+        self.cam_name = cam_name
+        self.debug_dir_path = debug_dir_path
+        self.padding = padding
+        self.writer = writer  # storage.database.DetectionWriter; falls back to insert_detection
+        self.evidence_store = evidence_store
+        self.headless = headless
+        self.debug_sample_every = debug_sample_every
+        self.metrics = metrics
+        self.query_matcher = query_matcher
+        self.tracker = PlateTracker()
+        self.sessions = SightingSessionizer(cam_name)
+        self.defer_until = defer_until  # Sessions first seen before this Unix time are held back
+        self.deferred = []              # Held back sessions that closed
+        self.ocr_calls = 0
+        self._ocr_requested = 0
+
+    def process(self, frame_count, frame, detections):
+        """
+        Parameters:
+            frame_count (int): index of the frame within this camera's stream
+            frame (numpy array): BGR frame; annotated in place unless headless
+            detections (list): [(score, (x1, y1, x2, y2)), ...] from PlateDetector.detect, or
+                [(score, plate_box, vehicle_box), ...] from CascadeDetector.detect
+
+        Returns:
+            The annotated frame
+        """
+        return process_batch({self.cam_name: self}, [(self.cam_name, frame_count)], [frame], [detections])[0]
+
+    def collect(self, frame_count, frame, detections, timestamp=None):
+        """
+        Tracks this frame's boxes and queues crops of new tracks for color classification
+        and crops whose tracks still want an OCR read. Color is classified on the vehicle
+        crop when the detector provides vehicle boxes, otherwise on the plate crop.
+
+        `timestamp` (Unix time or "%Y-%m-%d %H:%M:%S") is stored with the frame's plates; by default
+        they are stamped with the time they are stored, which is right for live streams
+        but not for recorded video.
+
+        Returns:
+            FrameWork to pass to `finish` together with the OCR results for its requests
+        """
+        cam_name = self.cam_name
+        work = FrameWork(frame_count, frame, timestamp)
+        h, w, _ = frame.shape
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("boxes detected", extra={"camera": cam_name, "frame": frame_count, "boxes": len(detections)})
+
+        boxes = [detection[1] for detection in detections]
+        vehicle_boxes = [detection[2] if len(detection) > 2 else None for detection in detections]
+        tracks, work.finished = self.tracker.update(frame_count, boxes)
+
+        for (x1, y1, x2, y2), vehicle_box, track in zip(boxes, vehicle_boxes, tracks):
+            x1_p, y1_p = max(0, x1 - self.padding), max(0, y1 - self.padding)
+            x2_p, y2_p = min(w, x2 + self.padding), min(h, y2 + self.padding)
+            plate_crop = frame[y1_p:y2_p, x1_p:x2_p]
+            if plate_crop.size == 0:
+                continue
+
+            sharpness = crop_sharpness(plate_crop)
+            work.plates.append(((x1, y1, x2, y2), track, sharpness))
+            if track.final_plate is None and sharpness > track.best_frame_sharpness:
+                track.best_frame = (frame_count, frame)  # Evidence candidate until the vote settles
+                track.best_frame_sharpness = sharpness
+            try:
+                if track.color is None:
+                    track.color = "unknown"  # Filled in by process_batch
+                    color_crop = plate_crop
+                    if vehicle_box is not None:
+                        vx1, vy1, vx2, vy2 = vehicle_box
+                        vehicle_crop = frame[max(0, vy1):min(h, vy2), max(0, vx1):min(w, vx2)]
+                        if vehicle_crop.size:
+                            color_crop = vehicle_crop
+                    work.color_requests.append((track, color_crop))
+
+                if track.request_ocr(sharpness):
+                    # Only a track's first read may come from the OCR cache; re-reads are
+                    # asked for to get an independent vote on a sharper crop
+                    cache_scope = cam_name if track.ocr_reads == 1 else None
+                    work.ocr_requests.append((track, plate_crop, self._debug_frame_info(frame_count, track),
+                                              cache_scope))
+            except Exception:
+                log.exception("plate processing failed", extra={"camera": cam_name, "frame": frame_count})
+
+        return work
+
+    def finish(self, work, reads):
+        """
+        Parameters:
+            work (FrameWork): result of `collect`
+            reads (list): (text, confidence) for each of `work.ocr_requests`, in order
+
+        Returns:
+            The annotated frame (the input frame itself when headless or without plates)
+        """
+        cam_name = self.cam_name
+        frame_count = work.frame_count
+
+        for (track, _, _, _), (raw_plate, confidence) in zip(work.ocr_requests, reads):
+            self.ocr_calls += 1
+            raw_plate = ''.join(filter(str.isalnum, raw_plate)).upper()
+            track.add_read(raw_plate if raw_plate != "UNKNOWN" else "N/A", confidence)
+
+        seen_at = to_unix_time(work.timestamp)
+        self._store_sessions(self.sessions.expire(seen_at))
+
+        evidence = {}  # id(frame) -> evidence path saved by this call
+        observed = []
+        for (x1, y1, x2, y2), track, sharpness in work.plates:
+            if track.first_seen_at is None:
+                track.first_seen_at = seen_at
+            track.last_seen_at = seen_at
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("plate seen", extra={"camera": cam_name, "frame": frame_count, "track": track.id,
+                                               "color": track.color, "plate": track.plate})
+            if track.final_plate is not None:
+                observed.append(self._observe(track, frame_count, seen_at, sharpness, (frame_count, work.frame),
+                                              evidence))
+            elif track.settle() is not None:
+                observed.append(self._settled(track, frame_count, evidence))
+            else:
+                self._match_vote(track, seen_at)
+        for track in work.finished:
+            self._ended(track, frame_count, evidence)
+
+        if self.headless or not work.plates:
+            return work.frame
+
+        # Annotation happens after every crop and evidence image was taken. Only a frame
+        # still held for a later evidence image, or whose evidence image may still be
+        # waiting in the writer queue, needs a copy.
+        held = [track.best_frame for _, track, _ in work.plates] + [session.best_image for session in observed]
+        retained = id(work.frame) in evidence or any(image is not None and image[1] is work.frame for image in held)
+        annotated = work.frame.copy() if retained else work.frame
+        for (x1, y1, x2, y2), track, _ in work.plates:
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            cv2.putText(annotated, f"#{track.id} {track.plate}", (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        return annotated
+
+    def close(self, carry=False):
+        """
+        Resolves the plates of tracks still in view and stores the final state of every
+        open session (the camera stopped). Call before closing the writer.
+
+        With `carry`, open sessions are stored as they are instead of closed and returned,
+        for the caller to continue (pipeline.ingest's next chunk).
+
+        Returns:
+            The sessions still open when `carry` is set, otherwise []
+        """
+        evidence = {}
+        for track in self.tracker.flush():
+            self._ended(track, None, evidence)
+        if not carry:
+            self._store_sessions(self.sessions.close_all(), evidence)
+            return []
+        carried = list(self.sessions.sessions.values())
+        self._store_sessions(carried, evidence)
+        return carried
+
+    def _held_back(self, session):
+        return self.defer_until is not None and session.first_seen < self.defer_until
+
+    def _settled(self, track, frame_count, evidence):
+        """
+        Folds a track whose vote just settled into its plate's session: every frame it was
+        seen in so far, with the sharpest of them as its image.
+        """
+        best_frame, track.best_frame = track.best_frame, None
+        return self._observe(track, frame_count, track.last_seen_at, track.best_frame_sharpness, best_frame,
+                             evidence, first_seen=track.first_seen_at, sightings=track.hits)
+
+    def _ended(self, track, frame_count, evidence):
+        """
+        A track left the frame. If its vote never settled, its final vote is used.
+        """
+        if track.final_plate is None and track.first_seen_at is not None and track.settle(ended=True):
+            self._settled(track, frame_count, evidence)
+
+    def _observe(self, track, frame_count, seen_at, sharpness, image, evidence, first_seen=None, sightings=1):
+        cam_name = self.cam_name
+        plate_text = track.final_plate
+        color = (track.color or "unknown").lower()
+        session, event = self.sessions.observe(plate_text, color, seen_at, sharpness, image, first_seen, sightings)
+        timestamp = format_timestamp(seen_at)
+        if event is not None:
+            self._store_sessions([session], evidence)
+        if event == OPENED and not self._held_back(session):
+            timestamp = format_timestamp(session.first_seen)
+            store_detection = self.writer.add if self.writer is not None else insert_detection
+            store_detection(
+                plate=plate_text,
+                color=color,
+                timestamp=timestamp,
+                camera=cam_name,
+                image_path=session.image_path
+            )
+            log.info("plate stored", extra={"camera": cam_name, "frame": frame_count, "track": track.id,
+                                            "color": color, "plate": plate_text})
+            if self.metrics is not None:
+                self.metrics.plates_stored.inc(camera=cam_name)
+        # Also while the plate stays in view, so a query set after its session opened
+        # alerts on the next frame rather than when the session next opens
+        session.queries_checked |= track.queries_matched
+        self._match_queries(session, timestamp)
+        return session
+
+    def _match_vote(self, track, seen_at):
+        """
+        Alerts on the current vote of a track that hasn't settled yet, so a wanted plate
+        doesn't wait for the vote to settle. Queries it didn't match are checked again
+        on later frames, as the vote may still change.
+        """
+        if (self.query_matcher is None or track.plate == "N/A"
+                or (self.defer_until is not None and track.first_seen_at < self.defer_until)):
+            return
+        matched = self.query_matcher.check(track.plate, (track.color or "unknown").lower(), self.cam_name,
+                                           format_timestamp(seen_at), checked=set(track.queries_matched))
+        track.queries_matched.update(matched)
+        if matched and self.metrics is not None:
+            self.metrics.query_alerts.inc(len(matched), camera=self.cam_name)
+
+    def _match_queries(self, session, timestamp):
+        """
+        Checks the session's plate against the live queries it wasn't checked against yet.
+        """
+        if self.query_matcher is None or self._held_back(session):
+            return
+        matched = self.query_matcher.check(session.plate, session.color, self.cam_name, timestamp,
+                                           session.image_path, checked=session.queries_checked)
+        if matched and self.metrics is not None:
+            self.metrics.query_alerts.inc(len(matched), camera=self.cam_name)
+
+    def _store_sessions(self, sessions, evidence=None):
+        """
+        Persists sessions, saving the image they hold (if any) as their evidence first.
+        `evidence` (id(frame) -> path) avoids saving one frame twice within a call.
+        """
+        evidence = {} if evidence is None else evidence
+        store_session = self.writer.add_session if self.writer is not None else insert_session
+        for session in sessions:
+            if session.best_image is not None:
+                frame_count, frame = session.best_image
+                session.best_image = None
+                if id(frame) not in evidence:
+                    evidence[id(frame)] = self._save_evidence(frame_count, frame)
+                session.image_path = evidence[id(frame)]
+            if self._held_back(session):
+                if session.closed:
+                    self.deferred.append(session)
+                continue
+            store_session(session.plate, session.color, self.cam_name, session.first_seen, session.last_seen,
+                          session.sightings, image_path=session.image_path, closed=session.closed)
+            if session.closed:
+                log.info("plate left", extra={"camera": self.cam_name, "plate": session.plate,
+                                              "sightings": session.sightings,
+                                              "seconds": round(session.last_seen - session.first_seen, 1)})
+
+    def _save_evidence(self, frame_count, frame):
+        if self.evidence_store is not None:
+            return self.evidence_store.put(frame)
+
+        vehicle_img_path = os.path.join(self.debug_dir_path, f"{self.cam_name}_frame{frame_count}_full_vehicle.jpg")
+        cv2.imwrite(vehicle_img_path, frame)
+        return vehicle_img_path
+
+    def _debug_frame_info(self, frame_count, track):
+        """
+        Debug file prefix for every `debug_sample_every`-th OCR'd crop, otherwise None.
+        """
+        self._ocr_requested += 1
+        if self.debug_sample_every <= 0 or self._ocr_requested % self.debug_sample_every:
+            return None
+        return f"{self.cam_name}_frame{frame_count}_track{track.id}"
+
+
+def process_batch(processors, keys, frames, detections, read_texts=None, timer=None, timestamps=None):
+    """
+    Runs a detector batch through the per-camera processors with a single color call and
+    a single OCR call covering every crop that needs them across all frames and cameras.
+
+    Parameters:
+        processors (dict): cam_name -> FrameProcessor
+        keys (list): (cam_name, frame_count) per frame
+        frames (list): BGR frames, annotated in place unless their evidence image is pending
+        detections (list): per-frame detector output
+        read_texts (callable): OCR with read_plate_texts' signature; defaults to read_plate_texts
+        timer (pipeline.timing.StageTimer): optional; records "color_classification" and "ocr"
+        timestamps (list): optional capture time per frame (see FrameProcessor.collect)
+
+    Returns:
+        List of annotated frames, in order
+    """
+    read_texts = read_texts or read_plate_texts
+
+    timestamps = timestamps or [None] * len(frames)
+
+    works = []
+    for (cam_name, frame_count), frame, frame_detections, timestamp in zip(keys, frames, detections, timestamps):
+        processor = processors[cam_name]
+        works.append((processor, processor.collect(frame_count, frame, frame_detections, timestamp)))
+
+    color_requests = [request for _, work in works for request in work.color_requests]
+    if color_requests:
+        start = time.perf_counter()
+        colors = get_dominant_colors([crop for _, crop in color_requests])
+        if timer is not None:
+            timer.record("color_classification", time.perf_counter() - start)
+        for (track, _), color in zip(color_requests, colors):
+            track.color = color
+
+    requests = [request for _, work in works for request in work.ocr_requests]
+    reads = []
+    if requests:
+        frame_infos = [frame_info for _, _, frame_info, _ in requests]
+        start = time.perf_counter()
+        reads = read_texts(
+            [crop for _, crop, _, _ in requests],
+            debug=any(frame_infos),
+            debug_dir=works[0][0].debug_dir_path,
+            frame_infos=frame_infos,
+            return_confidence=True,
+            cache_scopes=[cache_scope for _, _, _, cache_scope in requests]
+        )
+        if timer is not None:
+            timer.record("ocr", time.perf_counter() - start)
+
+    annotated = []
+    offset = 0
+    for processor, work in works:
+        count = len(work.ocr_requests)
+        annotated.append(processor.finish(work, reads[offset:offset + count]))
+        offset += count
+    return annotated
@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import logging
+import multiprocessing
+import cv2
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+from pipeline.capture import is_live_source
+from pipeline.motion_gate import MotionGate, MOTION_GATE_ENABLED
+from pipeline.telemetry import configure_logging
+
+RING_SLOTS = 8                       # Frames buffered per camera
+DEFAULT_FRAME_SHAPE = (720, 1280, 3)  # Used when a source doesn't report its resolution
+
+# Header layout (int64): [write_seq, read_seq, closed]
+_HEADER_FIELDS = 3
+_WRITE_SEQ, _READ_SEQ, _CLOSED = 0, 1, 2
+
+log = logging.getLogger(__name__)
+
+
+def probe_frame_shape(video_source):
+    """
+    Returns the (height, width, 3) frame shape a source reports, or DEFAULT_FRAME_SHAPE.
+    """
+    cap = cv2.VideoCapture(video_source)
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    if width <= 0 or height <= 0:
+        return DEFAULT_FRAME_SHAPE
+    return (height, width, 3)
+
+
+class FrameRing:
+    """
+    Single-writer / single-reader ring of decoded frames in shared memory.
+
+    The capture process writes frames; an inference worker reads them without pickling
+    or copying through a pipe. Each slot carries the sequence number of the frame it
+    holds (-1 while being written), so a reader can detect frames that were overwritten
+    mid-copy and skip them instead of returning a torn image. Slots also record the
+    frame's index in the source stream, which differs from the sequence number when the
+    capture side skips frames (e.g. motion gating).
+    """
+
+    def __init__(self, shm, shape, slots):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+
+        header_bytes = (_HEADER_FIELDS + 2 * slots) * 8
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self._slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=_HEADER_FIELDS * 8)
+        self._slot_index = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf,
+                                      offset=(_HEADER_FIELDS + slots) * 8)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=header_bytes)
+
+        # Reader-side state (local to the attaching process)
+        self.last_read = 0
+        self.dropped = 0
+
+    @classmethod
+    def create(cls, shape, slots=RING_SLOTS):
+        size = (_HEADER_FIELDS + 2 * slots) * 8 + slots * int(np.prod(shape))
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, shape, slots)
+        ring._header[:] = 0
+        ring._slot_seq[:] = 0
+        ring._slot_index[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, shape, slots=RING_SLOTS):
+        """
+        Opens a ring created by another process. Only the creator unlinks the segment,
+        so the attaching process must not leave it registered with a resource tracker of
+        its own, which would unlink it (with a "leaked shared_memory" warning) when this
+        process exits.
+        """
+        if sys.version_info >= (3, 13):
+            return cls(shared_memory.SharedMemory(name=name, track=False), shape, slots)
+        shm = shared_memory.SharedMemory(name=name)
+        # Processes started by multiprocessing share their parent's tracker, where the
+        # registration is a no-op and unregistering would drop the creator's entry
+        if os.name == "posix" and multiprocessing.parent_process() is None:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, shape, slots)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """
+        Returns:
+            (name, shape, slots) — everything another process needs to attach
+        """
+        return self.name, self.shape, self.slots
+
+    # ---- writer side ----
+
+    def write(self, frame, frame_index=None, block=False, poll_interval=0.002):
+        """
+        Copies `frame` into the next slot. If `block` is set, waits while the reader is a
+        full ring behind (for files); otherwise the oldest unread frame is overwritten.
+        `frame_index` defaults to the sequence number minus one.
+
+        Returns:
+            The sequence number assigned to the frame
+        """
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+
+        seq = int(self._header[_WRITE_SEQ]) + 1
+        if block:
+            while seq - int(self._header[_READ_SEQ]) > self.slots and not self.closed:
+                time.sleep(poll_interval)
+
+        slot = seq % self.slots
+        self._slot_seq[slot] = -1
+        np.copyto(self._frames[slot], frame)
+        self._slot_index[slot] = seq - 1 if frame_index is None else frame_index
+        self._slot_seq[slot] = seq
+        self._header[_WRITE_SEQ] = seq
+        return seq
+
+    def mark_closed(self):
+        self._header[_CLOSED] = 1
+
+    @property
+    def closed(self):
+        return bool(self._header[_CLOSED])
+
+    # ---- reader side ----
+
+    def read(self):
+        """
+        Returns:
+            (frame_index, frame) for the next unread frame, or None if nothing new is available.
+            Frames overwritten before the reader got to them are counted in `dropped`.
+        """
+        write_seq = int(self._header[_WRITE_SEQ])
+        if write_seq <= self.last_read:
+            return None
+
+        seq = max(self.last_read + 1, write_seq - self.slots + 1)
+        self.dropped += seq - (self.last_read + 1)
+
+        slot = seq % self.slots
+        frame = None
+        if self._slot_seq[slot] == seq:
+            frame_index = int(self._slot_index[slot])
+            frame = self._frames[slot].copy()
+            if self._slot_seq[slot] != seq:
+                frame = None
+
+        self.last_read = seq
+        self._header[_READ_SEQ] = seq
+        if frame is None:
+            self.dropped += 1
+            return None
+        return frame_index, frame
+
+    def exhausted(self):
+        """
+        True once the writer has closed the ring and every frame has been read.
+        """
+        return self.closed and self.last_read >= int(self._header[_WRITE_SEQ])
+
+    def close(self):
+        self._header = self._slot_seq = self._slot_index = self._frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def capture_to_ring(cam_name, video_source, ring_spec, max_frames_limit, motion_gate=MOTION_GATE_ENABLED):
+    """
+    Lightweight capture process: decodes frames and writes them into a FrameRing.
+    Imports nothing model-related, so it starts quickly and uses little memory.
+    With `motion_gate` set, frames without significant motion never reach the ring.
+    """
+    configure_logging()
+    ring = FrameRing.attach(*ring_spec)
+    block = not is_live_source(video_source)
+    gate = MotionGate() if motion_gate else None
+
+    cap = cv2.VideoCapture(video_source)
+    if not cap.isOpened():
+        log.error("could not open video stream", extra={"camera": cam_name, "source": video_source})
+        ring.mark_closed()
+        ring.close()
+        return
+
+    log.info("capturing into shared memory ring", extra={"pid": os.getpid(), "camera": cam_name, "ring": ring.name})
+    frame_count = 0
+    while cap.isOpened() and frame_count < max_frames_limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if ring.closed:
+            log.warning("ring closed by the server, stopping capture", extra={"camera": cam_name})
+            break
+        if gate is None or gate.should_process(frame):
+            ring.write(frame, frame_index=frame_count, block=block)
+        frame_count += 1
+
+    cap.release()
+    ring.mark_closed()
+    ring.close()
+    log.info("capture finished", extra={"pid": os.getpid(), "camera": cam_name, "frames": frame_count})
+    if gate is not None:
+        log.info("motion gate finished", extra={"camera": cam_name, **gate.stats()})
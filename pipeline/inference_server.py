@@ -0,0 +1,215 @@
+"""
+Shared inference server: one lightweight capture process per camera writes decoded
+frames into a shared-memory FrameRing, and a small pool of inference workers (each
+owning a single copy of the YOLOS and EasyOCR models) consumes frames from all rings.
+
+Run with:  python pipeline/inference_server.py
+"""
+
+import sys
+import os
+import time
+import logging
+import multiprocessing
+
+# Add root to path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Capture processes are spawned with this module as __main__, so nothing imported here
+# may load torch/transformers/EasyOCR: models load lazily through the model registry.
+from chat.query_channel import QueryMatcher, start_query_broker, QUERY_CHANNEL_ENABLED
+from detection.cascade import get_frame_detector
+from detection.plate_detector import select_device
+from ocr.number_plate_reader import ocr_cache
+from pipeline.batching import FrameBatcher, BATCH_SIZE, BATCH_MAX_LATENCY_MS
+from pipeline.frame_processor import FrameProcessor, process_batch
+from pipeline.frame_ring import FrameRing, RING_SLOTS, capture_to_ring, probe_frame_shape
+from pipeline.metrics import PipelineMetrics, start_metrics_server, METRICS_ENABLED, METRICS_PORT
+from pipeline.model_registry import models
+from pipeline.regions import load_camera_regions, detect_in_regions
+from pipeline.telemetry import configure_logging
+from storage.database import init_db, DetectionWriter
+from storage.evidence import EvidenceWriter, EvidenceStore
+
+DEBUG_DIR = os.path.join(os.path.dirname(__file__), "..", "debug")
+
+MAX_FRAMES = 1000            # Per camera; set to a high number for live streams
+NUM_INFERENCE_WORKERS = 1    # Each worker holds one copy of every model
+IDLE_SLEEP_SECONDS = 0.002   # Back-off when no ring has a new frame
+SUPERVISE_INTERVAL = 0.2     # Seconds between the server's checks of its processes
+
+log = logging.getLogger("pipeline.inference_server")
+
+
+def inference_worker(ring_specs, debug_dir_path, device_for_model=None,
+                     batch_size=BATCH_SIZE, max_latency_ms=BATCH_MAX_LATENCY_MS, metrics_port=None, cascade=None,
+                     regions=None):
+    """
+    Owns the models and serves every camera ring in `ring_specs` ({cam_name: ring_spec}).
+    Frames from all rings are batched into shared detector forward passes. Workers are
+    always headless; evidence images are encoded in the background. Metrics are served
+    on `metrics_port` (if given and METRICS_ENABLED). `regions` (default:
+    load_camera_regions()) restrict detection per camera, see pipeline.regions.
+    """
+    configure_logging()
+    cam_names = ",".join(ring_specs)
+    try:
+        device_for_model = device_for_model or select_device()
+        log.info("inference worker loading models", extra={"pid": os.getpid(), "cameras": cam_names,
+                                                           "device": device_for_model})
+        detector = get_frame_detector(device_for_model, cascade=cascade)
+        models.warm_up("easyocr")
+    except Exception:
+        log.exception("failed to load models", extra={"pid": os.getpid()})
+        sys.exit(1)  # The server closes this worker's rings, which stops their capture processes
+
+    metrics = PipelineMetrics()
+    metrics.observe_model_loads(models.load_times())
+    server = start_metrics_server(metrics, metrics_port) if METRICS_ENABLED and metrics_port is not None else None
+
+    regions = load_camera_regions() if regions is None else regions
+    rings = {cam_name: FrameRing.attach(*spec) for cam_name, spec in ring_specs.items()}
+    writer = DetectionWriter(timer=metrics)
+    evidence_writer = EvidenceWriter(timer=metrics)
+    evidence_store = EvidenceStore(writer=evidence_writer)
+    query_matcher = QueryMatcher() if QUERY_CHANNEL_ENABLED else None
+    processors = {
+        cam_name: FrameProcessor(cam_name, debug_dir_path, writer=writer, evidence_store=evidence_store,
+                                 headless=True, metrics=metrics, query_matcher=query_matcher)
+        for cam_name in rings
+    }
+    batcher = FrameBatcher(max_batch_size=batch_size, max_latency_ms=max_latency_ms)
+    for cam_name, ring in rings.items():
+        metrics.frames_dropped.set_function(lambda r=ring: r.dropped, camera=cam_name)
+    metrics.queue_depth.set_function(writer.pending, queue="db_writer")
+    metrics.queue_depth.set_function(evidence_writer.queue_depth, queue="evidence_writer")
+    metrics.queue_depth.set_function(lambda: len(batcher), queue="batcher")
+
+    try:
+        while True:
+            got_frame = False
+            for cam_name, ring in rings.items():
+                item = ring.read()
+                if item is None:
+                    continue
+                got_frame = True
+                metrics.frames_in.inc(camera=cam_name)
+                frame_index, frame = item
+                batcher.add((cam_name, frame_index), frame)
+                if batcher.is_ready():
+                    _run_batch(detector, batcher, processors, metrics, regions)
+
+            if batcher.is_ready():
+                _run_batch(detector, batcher, processors, metrics, regions)
+
+            if not got_frame:
+                if all(ring.exhausted() for ring in rings.values()):
+                    break
+                time.sleep(IDLE_SLEEP_SECONDS)
+
+        if len(batcher):
+            _run_batch(detector, batcher, processors, metrics, regions)
+    finally:
+        for processor in processors.values():
+            processor.close()  # Final state of sessions still open
+        evidence_writer.close()
+        writer.close()
+        if query_matcher is not None:
+            query_matcher.close()
+        if server is not None:
+            server.shutdown()
+
+    for cam_name, ring in rings.items():
+        if ring.dropped:
+            log.warning("frames dropped (inference fell behind capture)",
+                        extra={"camera": cam_name, "dropped": ring.dropped})
+        ring.close()
+    log.info("OCR cache finished", extra={"pid": os.getpid(), **ocr_cache.stats()})
+    log.info("inference worker finished", extra={"pid": os.getpid(), "cameras": cam_names})
+
+
+def _run_batch(detector, batcher, processors, metrics, regions=None):
+    keys, frames = batcher.flush()
+    start = time.perf_counter()
+    detections = detect_in_regions(detector, keys, frames, regions, timer=metrics)
+    metrics.record("detection", time.perf_counter() - start)
+    metrics.observe_batch(keys, detections)
+    process_batch(processors, keys, frames, detections, timer=metrics)
+
+
+def run_inference_server(cameras, num_workers=NUM_INFERENCE_WORKERS, max_frames_limit=MAX_FRAMES,
+                         debug_dir_path=DEBUG_DIR, ring_slots=RING_SLOTS):
+    """
+    Starts one capture process per camera and `num_workers` inference workers.
+    Cameras are assigned to workers round-robin; worker i serves its metrics on
+    METRICS_PORT + i. The chat query broker runs in this (parent) process.
+
+    A ring is closed as soon as either of its ends exits: a worker that dies (e.g. its
+    models failed to load) would otherwise leave file captures blocked on a full ring
+    forever, and a capture that crashes would leave its worker waiting for frames.
+    """
+    configure_logging()
+    os.makedirs(debug_dir_path, exist_ok=True)
+    init_db()
+    log.info("starting shared inference server", extra={"cameras": len(cameras), "workers": num_workers})
+
+    rings = {}
+    for cam_name, video_source in cameras.items():
+        rings[cam_name] = FrameRing.create(probe_frame_shape(video_source), slots=ring_slots)
+
+    num_workers = max(1, min(num_workers, len(rings)))
+    assignments = [{} for _ in range(num_workers)]
+    for idx, (cam_name, ring) in enumerate(rings.items()):
+        assignments[idx % num_workers][cam_name] = ring.spec()
+
+    broker = start_query_broker() if QUERY_CHANNEL_ENABLED else None
+    capture_processes = []
+    try:
+        for cam_name, video_source in cameras.items():
+            p = multiprocessing.Process(
+                target=capture_to_ring,
+                args=(cam_name, video_source, rings[cam_name].spec(), max_frames_limit)
+            )
+            capture_processes.append(p)
+            p.start()
+
+        worker_processes = []
+        for worker_index, ring_specs in enumerate(assignments):
+            p = multiprocessing.Process(target=inference_worker, args=(ring_specs, debug_dir_path),
+                                        kwargs={"metrics_port": METRICS_PORT + worker_index})
+            worker_processes.append(p)
+            p.start()
+
+        capture_cameras = {p: [cam_name] for p, cam_name in zip(capture_processes, cameras)}
+        worker_cameras = dict(zip(worker_processes, assignments))
+        while capture_cameras or worker_cameras:
+            for processes in (capture_cameras, worker_cameras):
+                for p in [p for p in processes if not p.is_alive()]:
+                    if p.exitcode:
+                        log.error("process failed", extra={"pid": p.pid, "exitcode": p.exitcode})
+                    for cam_name in processes.pop(p):
+                        rings[cam_name].mark_closed()
+            time.sleep(SUPERVISE_INTERVAL)
+
+        for p in capture_processes + worker_processes:
+            p.join()
+    finally:
+        for ring in rings.values():
+            ring.close()
+            ring.unlink()
+        if broker is not None:
+            broker.close()
+
+    log.info("all processing complete")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    multiprocessing.set_start_method('spawn', force=True)
+
+    cameras = {
+        "cam1": "sample_videos/cam1.mp4",
+        "cam2": "sample_videos/cam2.mp4",
+    }
+
+    run_inference_server(cameras)
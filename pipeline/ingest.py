@@ -0,0 +1,501 @@
+"""
+Offline ingest of recorded video: processes one video file as fast as the hardware
+allows, instead of replaying it like a live stream the way pipeline.runner does.
+
+- The video is split into frame-range chunks that worker processes decode and process
+  in parallel (each worker holds one copy of the models and seeks to its chunk).
+- Only every `stride`-th frame is processed (or one frame per `interval` seconds of
+  video); the frames in between are grabbed but never decoded into images.
+- Plates are stored with the time they appear in the video (start time + frame
+  position), not the time they were processed.
+- Finished chunks are recorded in a checkpoint file next to the video, so an
+  interrupted ingest started again with the same arguments picks up where it stopped.
+  A chunk that fails is recorded as such and the others carry on; running the ingest
+  again retries just the failed chunks.
+
+Tracking restarts at each chunk boundary, so plate sessions are stitched back together
+across the seams: a worker stores nothing of the sessions that start within
+SESSION_IDLE_SECONDS of its chunk's start (they may continue one from the previous
+chunk) and leaves the sessions open at its chunk's end open. Both are returned and
+kept in the checkpoint, and once every chunk is done `stitch_sessions` merges a
+vehicle in view across a seam (or out of view for less than SESSION_IDLE_SECONDS
+across one or more short chunks) into one session with one sighting.
+
+Run with:  python pipeline/ingest.py recordings/gate1.mp4 --camera gate1 \\
+               --start-time "2024-05-01 08:00:00" --workers 4 --interval 0.5
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import cv2
+
+# Add root to path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipeline.batching import BATCH_SIZE
+from pipeline.frame_processor import FrameProcessor, process_batch
+from pipeline.motion_gate import MotionGate, MOTION_GATE_ENABLED
+from pipeline.regions import load_camera_regions, detect_in_regions, CAMERA_REGIONS_FILE
+from pipeline.sessions import SESSION_IDLE_SECONDS
+from pipeline.telemetry import configure_logging
+from storage.database import init_db, DetectionWriter, format_timestamp
+from storage.evidence import EvidenceWriter, EvidenceStore
+
+INGEST_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # Worker processes; each holds one copy of every model
+INGEST_CHUNK_FRAMES = 3000   # Video frames per chunk (the unit of parallelism and of checkpointing)
+INGEST_STRIDE = 1            # Process every Nth frame by default
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+DEBUG_DIR = os.path.join(os.path.dirname(__file__), "..", "debug")
+
+log = logging.getLogger("pipeline.ingest")
+
+
+def video_info(path):
+    """
+    Returns:
+        (fps, frame_count) of the video at `path`; frame_count is the container's
+        estimate (the last chunk reads on to the real end of the file regardless)
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+    if not fps or fps <= 0:
+        raise ValueError(f"Video has no frame rate, can't derive timestamps: {path}")
+    return fps, max(0, frame_count)
+
+
+def default_start_time(path, fps, frame_count):
+    """
+    Recording start time assumed when none is given: the file's modification time
+    (when the recorder finished writing it) minus the video's duration.
+    """
+    end = datetime.fromtimestamp(os.path.getmtime(path))
+    return (end - timedelta(seconds=frame_count / fps)).replace(microsecond=0)
+
+
+def plan_chunks(frame_count, chunk_frames=INGEST_CHUNK_FRAMES, stride=INGEST_STRIDE):
+    """
+    Splits frames [0, frame_count) into (start, end) ranges of about `chunk_frames`
+    frames. Chunk starts are multiples of `stride`, so sampling every `stride`-th frame
+    per chunk samples the same frames as one sequential pass. The last chunk's end is
+    None: it reads until the video ends.
+    """
+    chunk_frames = max(stride, chunk_frames - chunk_frames % stride)
+    starts = list(range(0, max(frame_count, 1), chunk_frames))
+    return [(start, next_start) for start, next_start in zip(starts, starts[1:] + [None])]
+
+
+class Checkpoint:
+    """
+    The finished chunks of one ingest, kept in a JSON file written atomically after
+    each chunk, together with the sessions each chunk left for stitching (until they
+    are stitched), and the error of each chunk that failed. Resuming requires the same
+    video and sampling settings, otherwise the chunks recorded wouldn't line up with the
+    chunks planned.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.completed = set()
+        self.sessions = {}   # chunk start -> session records left by the chunk (see ingest_chunk)
+        self.failed = {}     # chunk start -> error
+        self.stitched = False
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("settings") != settings:
+                raise ValueError(f"Checkpoint {path} was written by an ingest with different settings "
+                                 f"({saved.get('settings')}); delete it to start over")
+            self.completed = {tuple(chunk) for chunk in saved.get("completed", [])}
+            self.sessions = {int(start): records for start, records in saved.get("sessions", {}).items()}
+            self.failed = {int(start): error for start, error in saved.get("failed", {}).items()}
+            self.stitched = saved.get("stitched", False)
+
+    def done(self, chunk):
+        return chunk in self.completed
+
+    def mark_done(self, chunk, sessions=()):
+        self.completed.add(chunk)
+        self.sessions[chunk[0]] = list(sessions)
+        self.failed.pop(chunk[0], None)
+        self._save()
+
+    def mark_failed(self, chunk, error):
+        self.failed[chunk[0]] = error
+        self._save()
+
+    def mark_stitched(self):
+        self.stitched = True
+        self.sessions = {}
+        self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"settings": self.settings,
+                       "completed": sorted(self.completed, key=lambda c: c[0]),
+                       "sessions": self.sessions,
+                       "failed": self.failed,
+                       "stitched": self.stitched}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def stitch_sessions(chunks, sessions, idle_seconds=SESSION_IDLE_SECONDS):
+    """
+    Merges the sessions chunks left open at their end with the sessions later chunks
+    held back at their start (see ingest_chunk), seam by seam: a held back session
+    continues the open one of the same plate last seen most recently, if at most
+    `idle_seconds` before it. Open sessions nothing continues are carried across the
+    following seams too, as a chunk may be shorter than `idle_seconds` (the plate can
+    be out of view for a whole chunk and still be in the same session).
+
+    Parameters:
+        chunks (list): every planned (start, end) chunk, in order
+        sessions (dict): chunk start -> the chunk's session records
+
+    Returns:
+        (opened, updated): records of held back sessions that continue nothing (each
+        needs a sighting), and the final state of every session to store
+    """
+    opened, updated = [], []
+    tails = []  # Sessions open at the end of earlier chunks, already stored
+    for start, _ in chunks:
+        records = sessions.get(start, [])
+        next_tails = [record for record in records if record["open"] and not record["held"]]
+        for head in sorted((record for record in records if record["held"]), key=lambda r: r["first_seen"]):
+            candidates = [tail for tail in tails if tail["plate"] == head["plate"]
+                          and head["first_seen"] - tail["last_seen"] <= idle_seconds]
+            if not candidates:
+                opened.append(head)
+                merged = dict(head, held=False)
+            else:
+                tail = max(candidates, key=lambda r: r["last_seen"])
+                tails.remove(tail)
+                merged = dict(tail, last_seen=max(tail["last_seen"], head["last_seen"]),
+                              sightings=tail["sightings"] + head["sightings"], open=head["open"])
+                if head["color"] != "unknown":
+                    merged["color"] = head["color"]
+                if head["image_path"] and head["sharpness"] > tail["sharpness"]:
+                    merged.update(image_path=head["image_path"], sharpness=head["sharpness"])
+            if merged["open"]:
+                next_tails.append(merged)
+            else:
+                updated.append(merged)
+        tails += next_tails
+    updated.extend(dict(tail, open=False) for tail in tails)  # Nothing continued them
+    return opened, updated
+
+
+def ingest_chunk(job):
+    """
+    Worker: decodes one chunk of the video and runs its sampled frames through
+    detection and a FrameProcessor of their own (headless). Detections and evidence
+    images are written before returning, so a chunk reported done is fully stored —
+    except for the sessions that may continue across its seams, which are returned.
+
+    Frames are stamped with their position reported by the decoder after reading, so
+    the timestamps stay right even if seeking to the chunk's first frame doesn't land
+    exactly (which is checked; seeking falls back to reading up to the frame).
+
+    Returns:
+        dict of per-chunk counters, and under "sessions" records of the sessions it
+        held back (first seen within SESSION_IDLE_SECONDS of the chunk's start) or left
+        open (at its end) for stitch_sessions
+    """
+    configure_logging()
+    chunk = job["chunk"]
+    start_frame, end_frame = chunk
+    stride, fps = job["stride"], job["fps"]
+    start_time = datetime.strptime(job["start_time"], TIMESTAMP_FORMAT)
+    defer_until = None
+    if start_frame:  # Not the first chunk: sessions may continue from the previous one
+        defer_until = (start_time + timedelta(seconds=start_frame / fps)).timestamp() + SESSION_IDLE_SECONDS
+    detector = _load_detector(job["detector"], job["cascade"])
+    read_texts = _load_reader(job["ocr"])
+    regions = load_camera_regions(job["regions_path"])
+
+    cap = _open_at(job["video"], start_frame)
+
+    cam_name = job["camera"]
+    init_db(job["db_path"])
+    writer = DetectionWriter(db_path=job["db_path"])
+    evidence_writer = EvidenceWriter(block=True)  # Decoding waits for the encoders rather than losing images
+    evidence_store = EvidenceStore(writer=evidence_writer)
+    processor = FrameProcessor(cam_name, DEBUG_DIR, writer=writer, evidence_store=evidence_store,
+                               headless=True, defer_until=defer_until)
+    processors = {cam_name: processor}
+    gate = MotionGate() if job["motion_gate"] else None
+    keys, frames, timestamps = [], [], []
+    decoded = processed = 0
+
+    def run_batch():
+        detections = detect_in_regions(detector, keys, frames, regions)
+        process_batch(processors, keys, frames, detections, read_texts=read_texts, timestamps=timestamps)
+        del keys[:], frames[:], timestamps[:]
+
+    chunk_start = time.perf_counter()
+    try:
+        frame_index = start_frame
+        while end_frame is None or frame_index < end_frame:
+            if frame_index % stride:
+                if not cap.grab():  # Skipped frames are demuxed but never converted to images
+                    break
+                frame_index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded += 1
+            if gate is None or gate.should_process(frame):
+                keys.append((cam_name, frame_index))
+                frames.append(frame)
+                position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0  # Of the frame just read
+                if position <= 0 and frame_index:
+                    position = frame_index / fps  # Decoder doesn't report positions
+                timestamps.append((start_time + timedelta(seconds=position)).timestamp())
+                processed += 1
+                if len(frames) >= job["batch_size"]:
+                    run_batch()
+            frame_index += 1
+        if frames:
+            run_batch()
+        # Sessions still open at the end of a chunk with a successor may continue there
+        carried = processor.close(carry=end_frame is not None)
+    finally:
+        cap.release()
+        evidence_writer.close()
+        writer.close()
+
+    return {
+        "chunk": chunk,
+        "frames_read": frame_index - start_frame,
+        "frames_decoded": decoded,
+        "frames_processed": processed,
+        "rows": writer.rows_written,
+        "errors": writer.errors,
+        "evidence_lost": evidence_writer.dropped + evidence_writer.errors,
+        "seconds": round(time.perf_counter() - chunk_start, 2),
+        "sessions": [_session_record(session, defer_until) for session in processor.deferred + carried],
+    }
+
+
+def _open_at(video, start_frame):
+    """
+    Opens `video` positioned at `start_frame`. Seeking by frame number isn't exact for
+    every codec and container, so where the decoder reports landing elsewhere the video
+    is read up to the frame instead.
+    """
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {video}")
+    if not start_frame:
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    landed = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if landed == start_frame:
+        return cap
+
+    log.warning("inexact seek, reading up to the chunk instead",
+                extra={"video": video, "frame": start_frame, "landed": landed})
+    cap.release()
+    cap = cv2.VideoCapture(video)
+    for _ in range(start_frame):
+        if not cap.grab():
+            break
+    return cap
+
+
+def _session_record(session, defer_until):
+    return {
+        "plate": session.plate,
+        "color": session.color,
+        "first_seen": session.first_seen,
+        "last_seen": session.last_seen,
+        "sightings": session.sightings,
+        "sharpness": session.best_sharpness,
+        "image_path": session.image_path,
+        "held": defer_until is not None and session.first_seen < defer_until,  # Nothing stored yet
+        "open": not session.closed,
+    }
+
+
+def run_ingest(video, camera=None, start_time=None, workers=INGEST_WORKERS, chunk_frames=INGEST_CHUNK_FRAMES,
+               stride=INGEST_STRIDE, interval=None, checkpoint_path=None, db_path=None, batch_size=BATCH_SIZE,
+               motion_gate=MOTION_GATE_ENABLED, regions_path=CAMERA_REGIONS_FILE, cascade=None,
+               detector="yolos", ocr="easyocr"):
+    """
+    Ingests `video` as camera `camera` (default: the file name) on `workers` processes.
+
+    Parameters:
+        start_time (datetime): wall-clock time of the first frame (default: see default_start_time)
+        stride (int): process every `stride`-th frame
+        interval (float): process one frame per `interval` seconds of video instead
+            (rounded to a whole number of frames)
+        checkpoint_path (str): default: VIDEO.ingest.json
+
+    Returns:
+        dict of totals over the chunks processed by this run
+    """
+    video = os.path.abspath(video)
+    camera = camera or os.path.splitext(os.path.basename(video))[0]
+    fps, frame_count = video_info(video)
+    if interval is not None:
+        stride = max(1, round(interval * fps))
+    start_time = start_time or default_start_time(video, fps, frame_count)
+    checkpoint_path = checkpoint_path or video + ".ingest.json"
+
+    settings = {
+        "video": video,
+        "camera": camera,
+        "start_time": start_time.strftime(TIMESTAMP_FORMAT),
+        "stride": stride,
+        "chunk_frames": chunk_frames,
+    }
+    checkpoint = Checkpoint(checkpoint_path, settings)
+    chunks = plan_chunks(frame_count, chunk_frames, stride)
+    pending = [chunk for chunk in chunks if not checkpoint.done(chunk)]
+    log.info("ingest planned", extra={"video": video, "camera": camera, "fps": round(fps, 2), "frames": frame_count,
+                                      "stride": stride, "chunks": len(chunks), "pending": len(pending),
+                                      "workers": workers, "start_time": settings["start_time"]})
+
+    init_db(db_path)  # Once here, so workers don't race to create the schema
+    jobs = [dict(settings, chunk=chunk, fps=fps, db_path=db_path, batch_size=batch_size,
+                 motion_gate=motion_gate, regions_path=regions_path, cascade=cascade,
+                 detector=detector, ocr=ocr) for chunk in pending]
+
+    totals = {"chunks": 0, "failed": 0, "frames_read": 0, "frames_decoded": 0, "frames_processed": 0,
+              "rows": 0, "errors": 0, "evidence_lost": 0}
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes=max(1, min(workers, len(jobs) or 1))) as pool:
+        # Chunks finish out of order; each is checkpointed as soon as it is stored
+        for result in pool.imap_unordered(_run_chunk, jobs):
+            if "error" in result:
+                checkpoint.mark_failed(tuple(result["chunk"]), result["error"])
+                totals["failed"] += 1
+                log.error("chunk failed", extra={"camera": camera, "start": result["chunk"][0],
+                                                 "end": result["chunk"][1], "error": result["error"]})
+                continue
+            checkpoint.mark_done(tuple(result["chunk"]), result["sessions"])
+            totals["chunks"] += 1
+            for key in ("frames_read", "frames_decoded", "frames_processed", "rows", "errors", "evidence_lost"):
+                totals[key] += result[key]
+            log.info("chunk ingested", extra={"camera": camera, "start": result["chunk"][0],
+                                              "end": result["chunk"][1], "done": len(checkpoint.completed),
+                                              "chunks": len(chunks), "rows": result["rows"],
+                                              "evidence_lost": result["evidence_lost"], "seconds": result["seconds"]})
+
+    if len(checkpoint.completed) == len(chunks) and not checkpoint.stitched:
+        opened, updated = stitch_sessions(chunks, checkpoint.sessions)
+        _store_stitched(camera, db_path, opened, updated)
+        checkpoint.mark_stitched()
+        log.info("sessions stitched", extra={"camera": camera, "sightings": len(opened), "sessions": len(updated)})
+    elif checkpoint.failed:
+        log.warning("ingest incomplete, run it again to retry the failed chunks",
+                    extra={"camera": camera, "failed": len(checkpoint.failed)})
+
+    wall_seconds = time.perf_counter() - start
+    totals["wall_seconds"] = round(wall_seconds, 2)
+    totals["realtime_factor"] = round(totals["frames_read"] / fps / wall_seconds, 1) if wall_seconds else 0.0
+    log.info("ingest finished", extra={"camera": camera, **totals})
+    return totals
+
+
+def _run_chunk(job):
+    """
+    ingest_chunk, with a failure reported as {"chunk", "error"} instead of ending the pool.
+    """
+    try:
+        return ingest_chunk(job)
+    except Exception as e:
+        log.exception("chunk failed", extra={"camera": job["camera"], "start": job["chunk"][0]})
+        return {"chunk": job["chunk"], "error": f"{type(e).__name__}: {e}"}
+
+
+def _store_stitched(camera, db_path, opened, updated):
+    writer = DetectionWriter(db_path=db_path)
+    try:
+        for record in opened:
+            writer.add(plate=record["plate"], color=record["color"], timestamp=format_timestamp(record["first_seen"]),
+                       camera=camera, image_path=record["image_path"])
+        for record in updated:
+            writer.add_session(record["plate"], record["color"], camera, record["first_seen"], record["last_seen"],
+                               record["sightings"], image_path=record["image_path"], closed=not record["open"])
+    finally:
+        writer.close()
+
+
+def _load_detector(name, cascade):
+    if name == "stub":
+        from pipeline.benchmark import StubPlateDetector
+        return StubPlateDetector()
+    from detection.cascade import get_frame_detector
+    return get_frame_detector(cascade=cascade)  # Loaded once per worker process by the model registry
+
+
+def _load_reader(name):
+    if name == "stub":
+        from pipeline.benchmark import StubPlateReader
+        return StubPlateReader()
+    from ocr.number_plate_reader import read_plate_texts
+    from pipeline.model_registry import models
+    models.warm_up("easyocr")
+    return read_plate_texts
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    multiprocessing.set_start_method("spawn", force=True)  # Same as the runner, for GPU compatibility
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Ingest a recorded video faster than real time.")
+    parser.add_argument("video", help="Video file to ingest")
+    parser.add_argument("--camera", help="Camera name to store plates under (default: the file name)")
+    parser.add_argument("--start-time", type=lambda value: datetime.strptime(value, TIMESTAMP_FORMAT),
+                        help='Wall-clock time of the first frame, "YYYY-mm-dd HH:MM:SS" '
+                             "(default: file modification time minus the video's duration)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Worker processes (one model copy each)")
+    parser.add_argument("--chunk-frames", type=int, default=INGEST_CHUNK_FRAMES, help="Video frames per chunk")
+    sampling = parser.add_mutually_exclusive_group()
+    sampling.add_argument("--stride", type=int, default=INGEST_STRIDE, help="Process every Nth frame")
+    sampling.add_argument("--interval", type=float, help="Process one frame per this many seconds of video")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: VIDEO.ingest.json)")
+    parser.add_argument("--db", help="Database to store detections in (default: the pipeline's database)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--motion-gate", action=argparse.BooleanOptionalAction, default=MOTION_GATE_ENABLED)
+    parser.add_argument("--regions", default=CAMERA_REGIONS_FILE,
+                        help="Per-camera region config (see pipeline/regions.py)")
+    parser.add_argument("--cascade", action=argparse.BooleanOptionalAction, default=None,
+                        help="Vehicle-first cascade detection (default: DETECTION_CASCADE env)")
+    parser.add_argument("--detector", choices=["yolos", "stub"], default="yolos",
+                        help="stub: model-free boxes from pipeline.benchmark, for trying out an ingest")
+    parser.add_argument("--ocr", choices=["easyocr", "stub"], default="easyocr")
+    args = parser.parse_args()
+
+    if args.stride < 1 or (args.interval is not None and args.interval <= 0):
+        parser.error("--stride and --interval must be positive")
+
+    try:
+        totals = run_ingest(
+            args.video, camera=args.camera, start_time=args.start_time, workers=args.workers,
+            chunk_frames=args.chunk_frames, stride=args.stride, interval=args.interval,
+            checkpoint_path=args.checkpoint, db_path=args.db, batch_size=args.batch_size,
+            motion_gate=args.motion_gate, regions_path=args.regions, cascade=args.cascade,
+            detector=args.detector, ocr=args.ocr,
+        )
+    except (FileNotFoundError, ValueError) as e:
+        parser.error(str(e))
+    print(json.dumps(totals, indent=2))
@@ -0,0 +1,249 @@
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"   # Local only; put a reverse proxy in front to expose it
+METRICS_PORT = 9108          # Process i of a run serves on METRICS_PORT + i
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+log = logging.getLogger(__name__)
+
+
+class _Metric:
+    """
+    Base for labelled metrics. Values are keyed by label values, in `labelnames` order.
+    A value can also be a callable, evaluated when scraped (see `set_function`), so
+    state other components already track (queue sizes, drop counters) costs nothing on
+    the hot path.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set_function(self, fn, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = fn
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            if callable(value):
+                try:
+                    value = value()
+                except Exception as e:
+                    log.warning("metric callback failed", extra={"metric": self.name, "error": e})
+                    continue
+            lines.append(f"{self.name}{self._labels(key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (non-cumulative) + overflow, sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    A set of metrics rendered together in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+class PipelineMetrics:
+    """
+    The camera pipeline's metrics, on their own registry.
+
+    Also implements the StageTimer interface (`record(stage, seconds)`), so it can be
+    passed as `timer=` to the detector, process_batch and the DB/evidence writers, which
+    then feed `pipeline_stage_seconds{stage=...}`.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.frames_in = r.counter(
+            "pipeline_frames_in_total", "Frames taken from the camera", ["camera"])
+        self.frames_processed = r.counter(
+            "pipeline_frames_processed_total", "Frames run through detection", ["camera"])
+        self.frames_skipped = r.counter(
+            "pipeline_frames_skipped_total", "Frames skipped by the motion gate", ["camera"])
+        self.frames_dropped = r.counter(
+            "pipeline_frames_dropped_total", "Frames dropped because processing fell behind", ["camera"])
+        self.frames_throttled = r.counter(
+            "pipeline_frames_throttled_total", "Frames skipped by adaptive frame rate control", ["camera"])
+        self.target_fps = r.gauge(
+            "pipeline_camera_target_fps", "Frame rate a camera is currently processed at", ["camera"])
+        self.worker_load = r.gauge(
+            "pipeline_worker_load", "Fraction of time the worker spent processing batches")
+        self.boxes_per_frame = r.histogram(
+            "pipeline_boxes_per_frame", "Plate boxes detected per frame", ["camera"], buckets=COUNT_BUCKETS)
+        self.plates_stored = r.counter(
+            "pipeline_plates_stored_total", "Plate sightings stored", ["camera"])
+        self.query_alerts = r.counter(
+            "pipeline_query_alerts_total", "Stored plates that matched a live chat query", ["camera"])
+        self.batch_size = r.histogram(
+            "pipeline_batch_frames", "Frames per detector batch", buckets=COUNT_BUCKETS)
+        self.stage_seconds = r.histogram(
+            "pipeline_stage_seconds", "Latency per pipeline stage", ["stage"])
+        self.queue_depth = r.gauge(
+            "pipeline_queue_depth", "Items waiting in a queue", ["queue"])
+        self.model_load_seconds = r.gauge(
+            "pipeline_model_load_seconds", "Time it took to load each model in this process", ["model"])
+
+    def record(self, stage, seconds):
+        self.stage_seconds.observe(seconds, stage=stage)
+
+    def observe_batch(self, keys, detections):
+        """
+        Counts a detector batch: `keys` are (cam_name, frame_count) per frame, `detections`
+        the detector output for each.
+        """
+        self.batch_size.observe(len(keys))
+        for (cam_name, _), boxes in zip(keys, detections):
+            self.frames_processed.inc(camera=cam_name)
+            self.boxes_per_frame.observe(len(boxes), camera=cam_name)
+
+    def observe_model_loads(self, load_times):
+        """
+        `load_times` as returned by ModelRegistry.load_times().
+        """
+        for model, seconds in load_times.items():
+            self.model_load_seconds.set(seconds, model=model)
+
+    def render(self):
+        return self.registry.render()
+
+
+def start_metrics_server(metrics, port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Serves `metrics.render()` at http://host:port/metrics from a daemon thread.
+
+    Returns:
+        The ThreadingHTTPServer (call `shutdown()` to stop it), or None if the port is taken
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes are not worth a log line each
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        log.warning("metrics endpoint not started", extra={"port": port, "error": e})
+        return None
+
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"MetricsServer-{port}", daemon=True).start()
+    log.info("metrics endpoint started", extra={"url": f"http://{host}:{port}/metrics"})
+    return server
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
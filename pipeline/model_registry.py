@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Loads models lazily, on first use, and caches them for the life of the process.
+
+    Model modules register a loader under a name at import time (which is cheap: no
+    torch/transformers/EasyOCR import happens until a loader runs). `get` loads the model
+    on first call and returns the cached instance afterwards; keyword arguments (e.g. the
+    device) are part of the cache key. `warm_up` loads models up front so the first frame
+    doesn't pay for it. Load times are logged and kept in `load_times()`.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._load_times = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        """
+        Registers `loader(**kwargs) -> model` under `name`. Re-registering replaces the
+        loader but keeps models that were already loaded.
+        """
+        self._loaders[name] = loader
+
+    def registered(self):
+        return sorted(self._loaders)
+
+    def get(self, name, **kwargs):
+        key = (name, tuple(sorted(kwargs.items())))
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        # Per-model lock: concurrent first calls load once, other models aren't blocked
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(key, name, kwargs)
+        return model
+
+    def is_loaded(self, name, **kwargs):
+        return (name, tuple(sorted(kwargs.items()))) in self._models
+
+    def warm_up(self, *names, **kwargs):
+        """
+        Loads `names` (default: every registered model) now. `kwargs` go to every loader.
+
+        Returns:
+            dict name -> load seconds (0.0 for models that were already loaded)
+        """
+        times = {}
+        for name in names or self.registered():
+            already_loaded = self.is_loaded(name, **kwargs)
+            self.get(name, **kwargs)
+            times[name] = 0.0 if already_loaded else self._load_times[self._label(name, kwargs)]
+        return times
+
+    def load_times(self):
+        """
+        Returns:
+            dict "<name>[(<kwargs>)]" -> seconds the load took, for every model loaded so far
+        """
+        return dict(self._load_times)
+
+    def unload(self, name=None):
+        """
+        Drops cached models (all of them, or every variant of `name`) so they can be freed.
+        """
+        for key in list(self._models):
+            if name is None or key[0] == name:
+                del self._models[key]
+
+    def _load(self, key, name, kwargs):
+        try:
+            loader = self._loaders[name]
+        except KeyError:
+            raise KeyError(f"No model registered under {name!r} (registered: {self.registered()})") from None
+
+        start = time.perf_counter()
+        model = loader(**kwargs)
+        seconds = time.perf_counter() - start
+
+        self._models[key] = model
+        self._load_times[self._label(name, kwargs)] = seconds
+        log.info("model loaded", extra={"model": self._label(name, kwargs), "seconds": round(seconds, 3)})
+        return model
+
+    @staticmethod
+    def _label(name, kwargs):
+        if not kwargs:
+            return name
+        return name + "(" + ",".join(f"{k}={v}" for k, v in sorted(kwargs.items())) + ")"
+
+
+# Per-process registry shared by every model module
+models = ModelRegistry()
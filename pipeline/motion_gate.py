@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+MOTION_GATE_ENABLED = True
+MOTION_DOWNSCALE_WIDTH = 160     # Frames are compared at this width
+MOTION_PIXEL_THRESHOLD = 25      # Gray-level change for a pixel to count as moving
+MOTION_AREA_THRESHOLD = 0.01     # Fraction of moving pixels needed to forward a frame
+MOTION_WARMUP_FRAMES = 15        # Frames always forwarded while the background settles
+MOTION_BACKGROUND_RATE = 0.05    # Running-average update rate for the background model
+
+
+class MotionGate:
+    """
+    Cheap per-camera pre-filter that only lets frames with significant motion through
+    to the detector.
+
+    Each frame is downscaled, converted to blurred grayscale and compared against a
+    running-average background. Frames during the warmup period are always forwarded,
+    so vehicles already in view at startup are still processed.
+    """
+
+    def __init__(self, pixel_threshold=MOTION_PIXEL_THRESHOLD, area_threshold=MOTION_AREA_THRESHOLD,
+                 warmup_frames=MOTION_WARMUP_FRAMES, background_rate=MOTION_BACKGROUND_RATE,
+                 downscale_width=MOTION_DOWNSCALE_WIDTH):
+        self.pixel_threshold = pixel_threshold
+        self.area_threshold = area_threshold
+        self.warmup_frames = warmup_frames
+        self.background_rate = background_rate
+        self.downscale_width = downscale_width
+
+        self._background = None
+        self.last_motion = 0.0
+        self.frames_seen = 0
+        self.frames_forwarded = 0
+        self.frames_skipped = 0
+
+    def should_process(self, frame):
+        """
+        Returns:
+            True if the frame shows enough change to be worth running detection on
+        """
+        self.frames_seen += 1
+
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.downscale_width / float(w))
+        small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        self.last_motion = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        cv2.accumulateWeighted(gray, self._background, self.background_rate)
+
+        forward = bool(self.frames_seen <= self.warmup_frames or self.last_motion >= self.area_threshold)
+        if forward:
+            self.frames_forwarded += 1
+        else:
+            self.frames_skipped += 1
+        return forward
+
+    def stats(self):
+        return {
+            "seen": self.frames_seen,
+            "forwarded": self.frames_forwarded,
+            "skipped": self.frames_skipped,
+        }
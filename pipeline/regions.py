@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+
+import cv2
+import numpy as np
+
+# Per-camera regions of interest, as JSON:
+#   {"cam1": {"polygon": [[x, y], ...], "inference_size": 640}, ...}
+# `polygon` is in full-frame pixel coordinates; `inference_size` caps the longest side of
+# what the detector sees. Cameras that aren't listed are processed whole, at the
+# detector's default resolution.
+CAMERA_REGIONS_FILE = os.environ.get(
+    "CAMERA_REGIONS_FILE", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "camera_regions.json"))
+)
+
+log = logging.getLogger(__name__)
+
+
+class CameraRegion:
+    """
+    What part of a camera's frames the detector looks at, and at what resolution.
+
+    `prepare` crops a frame to the polygon's bounding rectangle, downscales it so its
+    longest side is at most `inference_size`, and blacks out everything outside the
+    polygon. Boxes found in the prepared image are mapped back to full-frame coordinates
+    with `to_frame`, so the rest of the pipeline (crops, OCR, evidence) keeps working on
+    the original frame.
+    """
+
+    def __init__(self, polygon=None, inference_size=None):
+        self.polygon = np.array(polygon, dtype=np.int32) if polygon else None
+        self.inference_size = int(inference_size) if inference_size else None
+        self._masks = {}  # (frame shape) -> (bounding rect, output size, mask)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(polygon=config.get("polygon"), inference_size=config.get("inference_size"))
+
+    def prepare(self, frame):
+        """
+        Returns:
+            (image, transform): the image to run detection on, and the transform
+            (offset_x, offset_y, scale_x, scale_y) `to_frame` needs to map its boxes back
+        """
+        (x1, y1, x2, y2), (out_w, out_h), mask = self._geometry(frame.shape[:2])
+        image = frame[y1:y2, x1:x2]
+        if (out_w, out_h) != (x2 - x1, y2 - y1):
+            image = cv2.resize(image, (out_w, out_h), interpolation=cv2.INTER_AREA)
+        if mask is not None:
+            image = cv2.bitwise_and(image, image, mask=mask)
+        return image, (x1, y1, (x2 - x1) / float(out_w), (y2 - y1) / float(out_h))
+
+    @staticmethod
+    def to_frame(box, transform):
+        ox, oy, sx, sy = transform
+        x1, y1, x2, y2 = box
+        return ox + int(x1 * sx), oy + int(y1 * sy), ox + int(x2 * sx), oy + int(y2 * sy)
+
+    def input_size(self, image):
+        """
+        The detector input size (shortest_edge, longest_edge) that keeps `image` at its
+        prepared resolution, or None to leave the detector's default.
+        """
+        if self.inference_size is None:
+            return None
+        h, w = image.shape[:2]
+        return min(h, w), max(h, w)
+
+    def _geometry(self, frame_hw):
+        geometry = self._masks.get(frame_hw)
+        if geometry is not None:
+            return geometry
+
+        h, w = frame_hw
+        if self.polygon is not None:
+            x, y, rect_w, rect_h = cv2.boundingRect(self.polygon)
+            x1, y1, x2, y2 = max(0, x), max(0, y), min(w, x + rect_w), min(h, y + rect_h)
+        else:
+            x1, y1, x2, y2 = 0, 0, w, h
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            raise ValueError(f"Region polygon lies outside the {w}x{h} frame")
+
+        scale = 1.0
+        if self.inference_size is not None:
+            scale = min(1.0, self.inference_size / float(max(x2 - x1, y2 - y1)))
+        out_w, out_h = max(1, round((x2 - x1) * scale)), max(1, round((y2 - y1) * scale))
+
+        mask = None
+        if self.polygon is not None:
+            # Polygon in the coordinates of the cropped, resized image
+            points = (self.polygon - [x1, y1]) * [out_w / float(x2 - x1), out_h / float(y2 - y1)]
+            mask = np.zeros((out_h, out_w), dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(points).astype(np.int32)], 255)
+
+        geometry = self._masks[frame_hw] = ((x1, y1, x2, y2), (out_w, out_h), mask)
+        return geometry
+
+
+def load_camera_regions(path=CAMERA_REGIONS_FILE):
+    """
+    Reads the per-camera region config.
+
+    Returns:
+        dict cam_name -> CameraRegion (empty if the file doesn't exist)
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        config = json.load(f)
+    regions = {cam_name: CameraRegion.from_config(cam_config) for cam_name, cam_config in config.items()}
+    log.info("camera regions loaded", extra={"path": path, "cameras": ",".join(sorted(regions))})
+    return regions
+
+
+def detect_in_regions(detector, keys, frames, regions, timer=None):
+    """
+    Runs `detector` over a batch of frames, each restricted to its camera's region
+    (`keys` are (cam_name, frame_count) per frame; cameras without a region are passed
+    through whole). Frames are grouped by detector input size, so each group is still a
+    single batched call.
+
+    Returns:
+        The detector's output for each frame, with every box in full-frame coordinates
+    """
+    if not regions:
+        return detector.detect(frames, timer=timer)
+
+    images, transforms, groups = [], [], {}
+    for idx, ((cam_name, _), frame) in enumerate(zip(keys, frames)):
+        region = regions.get(cam_name)
+        if region is None:
+            image, transform, input_size = frame, None, None
+        else:
+            image, transform = region.prepare(frame)
+            input_size = region.input_size(image)
+        images.append(image)
+        transforms.append(transform)
+        groups.setdefault(input_size, []).append(idx)
+
+    detections = [[] for _ in frames]
+    for input_size, indices in groups.items():
+        batch = [images[i] for i in indices]
+        if input_size is None:
+            results = detector.detect(batch, timer=timer)
+        else:
+            results = detector.detect(batch, timer=timer, input_size=input_size)
+        for idx, result in zip(indices, results):
+            transform = transforms[idx]
+            if transform is None:
+                detections[idx] = result
+            else:
+                detections[idx] = [
+                    (detection[0],) + tuple(CameraRegion.to_frame(box, transform) for box in detection[1:])
+                    for detection in result
+                ]
+    return detections
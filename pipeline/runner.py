@@ -1,159 +1,255 @@
 import sys
 import os
+import time
+import logging
 import cv2
-import torch
-import numpy as np
-from PIL import Image
-from datetime import datetime
-from transformers import YolosImageProcessor, YolosForObjectDetection
 import multiprocessing
 
+# Add root to path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipeline.telemetry import configure_logging
+
+configure_logging()
+log = logging.getLogger("pipeline.runner")
+
 # Set multiprocessing mode
 try:
     if multiprocessing.get_start_method(allow_none=True) is None:
         multiprocessing.set_start_method('spawn', force=True)
-        print("💡 Multiprocessing start method set to 'spawn' for GPU compatibility.")
+        log.debug("multiprocessing start method set to spawn for GPU compatibility")
 except RuntimeError:
-    print("💡 Multiprocessing start method already set.")
-
-# Add root to path for internal imports
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-
-from color_detection.color_detector import get_dominant_color
-from ocr.number_plate_reader import read_plate_text
-from storage.database import init_db, insert_detection
-
-# Set device
-if torch.backends.mps.is_available():
-    device = 'mps'
-    print("🚀 Using Apple MPS (Metal Performance Shaders) for GPU acceleration.")
-elif torch.cuda.is_available():
-    device = 'cuda'
-    print("🚀 Using NVIDIA CUDA for GPU acceleration.")
-else:
-    device = 'cpu'
-    print("⚠️ Using CPU. This will be slower than GPU (MPS/CUDA).")
+    log.debug("multiprocessing start method already set")
+
+from chat.query_channel import QueryMatcher, start_query_broker, QUERY_CHANNEL_ENABLED
+from detection.cascade import get_frame_detector
+from detection.plate_detector import select_device
+from pipeline.batching import FrameBatcher, BATCH_SIZE, BATCH_MAX_LATENCY_MS
+from pipeline.capture import FrameGrabber, CAPTURE_POLL_TIMEOUT
+from pipeline.frame_processor import FrameProcessor, process_batch
+from pipeline.motion_gate import MotionGate, MOTION_GATE_ENABLED
+from pipeline.regions import load_camera_regions, detect_in_regions
+from pipeline.metrics import PipelineMetrics, start_metrics_server, METRICS_ENABLED, METRICS_PORT
+from pipeline.model_registry import models
+from ocr.number_plate_reader import ocr_cache
+from storage.database import init_db, DetectionWriter
+from storage.evidence import EvidenceWriter, EvidenceStore
 
 DEBUG_DIR = os.path.join(os.path.dirname(__file__), "..", "debug")
 os.makedirs(DEBUG_DIR, exist_ok=True)
 
 MAX_FRAMES = 1000  # Set to a high number for live streams
-
-def process_single_camera(cam_name, video_source, debug_dir_path, max_frames_limit, device_for_model):
-    print(f" [PID {os.getpid()}] Loading YOLOS model for {cam_name}...")
+CAMERAS_PER_PROCESS = 1  # Cameras sharing one model/process; their frames are batched together
+HEADLESS = False  # Production servers: no annotation, no display windows
+
+def process_camera_group(cameras, debug_dir_path, max_frames_limit, device_for_model=None,
+                         batch_size=BATCH_SIZE, max_latency_ms=BATCH_MAX_LATENCY_MS,
+                         motion_gate=MOTION_GATE_ENABLED, headless=HEADLESS, metrics_port=None, cascade=None,
+                         regions=None):
+    """
+    Processes one or more cameras in a single process, sharing one YOLOS model.
+
+    Each camera is decoded on its own FrameGrabber thread (dropping the oldest frames of
+    live streams when inference falls behind). Frames are taken round-robin from every
+    camera and batched (up to `batch_size` frames, waiting at most `max_latency_ms` for
+    the batch to fill) into a single detector forward pass. Results are fanned back out
+    to each camera's FrameProcessor. With `motion_gate` set, frames without significant
+    motion skip detection entirely. With `headless` set, frames are never annotated or
+    displayed. Evidence images are encoded and written by a background EvidenceWriter.
+
+    Per-camera frame counters, boxes per frame, stage latencies and queue depths are
+    served in Prometheus format on `metrics_port` (if given and METRICS_ENABLED).
+
+    Models come from the per-process registry; the device is picked here (default:
+    select_device()), and the detector and OCR are warmed up before the first frame.
+    With `cascade` (default: DETECTION_CASCADE env), plates are only searched inside
+    vehicle ROIs from a small vehicle detector (see detection.cascade).
+
+    `regions` ({cam_name: CameraRegion}, default: load_camera_regions()) restrict
+    detection to a polygon of each camera's frame at a capped inference resolution.
+
+    With QUERY_CHANNEL_ENABLED, active chat queries are pushed into this process and
+    every stored plate is matched against them on the spot (see chat.query_channel).
+    """
+    configure_logging()
+    cam_names = ",".join(cameras)
+    device_for_model = device_for_model or select_device()
+    log.info("loading models", extra={"pid": os.getpid(), "cameras": cam_names, "device": device_for_model})
     try:
-        processor = YolosImageProcessor.from_pretrained("nickmuchi/yolos-small-finetuned-license-plate-detection")
-        model = YolosForObjectDetection.from_pretrained("nickmuchi/yolos-small-finetuned-license-plate-detection")
-        model.to(device_for_model)
-        model.eval()
-        print(f"[PID {os.getpid()}] YOLOS model loaded using {device_for_model.upper()}.")
-    except Exception as e:
-        print(f"❌ [PID {os.getpid()}] Error loading YOLOS model: {e}")
+        detector = get_frame_detector(device_for_model, cascade=cascade)
+        models.warm_up("easyocr")
+    except Exception:
+        log.exception("failed to load models", extra={"pid": os.getpid()})
         return
 
+    metrics = PipelineMetrics()
+    metrics.observe_model_loads(models.load_times())
+    server = start_metrics_server(metrics, metrics_port) if METRICS_ENABLED and metrics_port is not None else None
+
     init_db()
+    regions = load_camera_regions() if regions is None else regions
 
-    cap = cv2.VideoCapture(video_source)
-    if not cap.isOpened():
-        print(f"❌ Could not open video stream: {video_source}")
-        return
+    captures = {}
+    for cam_name, video_source in cameras.items():
+        grabber = FrameGrabber(video_source)
+        if not grabber.is_opened():
+            log.error("could not open video stream", extra={"camera": cam_name, "source": video_source})
+            grabber.stop()
+            continue
+        captures[cam_name] = grabber.start()
+        metrics.frames_dropped.set_function(lambda g=grabber: g.dropped, camera=cam_name)
+        metrics.queue_depth.set_function(grabber.queue_depth, queue=f"capture:{cam_name}")
+
+    writer = DetectionWriter(timer=metrics)
+    evidence_writer = EvidenceWriter(timer=metrics)
+    evidence_store = EvidenceStore(writer=evidence_writer)
+    query_matcher = QueryMatcher() if QUERY_CHANNEL_ENABLED else None
+    processors = {
+        cam_name: FrameProcessor(cam_name, debug_dir_path, writer=writer, evidence_store=evidence_store,
+                                 headless=headless, metrics=metrics, query_matcher=query_matcher)
+        for cam_name in captures
+    }
+    frame_counts = {cam_name: 0 for cam_name in captures}
+    gates = {cam_name: MotionGate() for cam_name in captures} if motion_gate else {}
+    batcher = FrameBatcher(max_batch_size=batch_size, max_latency_ms=max_latency_ms)
+    metrics.queue_depth.set_function(writer.pending, queue="db_writer")
+    metrics.queue_depth.set_function(evidence_writer.queue_depth, queue="evidence_writer")
+    metrics.queue_depth.set_function(lambda: len(batcher), queue="batcher")
+    active = list(captures)
+    stop = False
 
-    frame_count = 0
-
-    while cap.isOpened() and frame_count < max_frames_limit:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        orig_frame = frame.copy()
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(frame_rgb)
-        inputs = processor(images=pil_image, return_tensors="pt").to(device_for_model)
-
-        with torch.no_grad():
-            outputs = model(**inputs)
-
-        target_sizes = torch.tensor([pil_image.size[::-1]]).to(device_for_model)
-        results = processor.post_process_object_detection(outputs, threshold=0.4, target_sizes=target_sizes)[0]
-
-        print(f"🔍 Frame {frame_count}: Detected {len(results['boxes'])} boxes")
-
-        for i, (score, label, box) in enumerate(zip(results["scores"], results["labels"], results["boxes"])):
-            x1, y1, x2, y2 = map(int, box.tolist())
-            h, w, _ = orig_frame.shape
-            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
-
-            if x1 >= x2 or y1 >= y2:
-                continue
-
-            padding = 5
-            x1_p, y1_p = max(0, x1 - padding), max(0, y1 - padding)
-            x2_p, y2_p = min(w, x2 + padding), min(h, y2 + padding)
-            plate_crop = orig_frame[y1_p:y2_p, x1_p:x2_p]
-            if plate_crop.size == 0:
-                continue
-
-            try:
-                color = get_dominant_color(plate_crop)
-                raw_plate = read_plate_text(
-                    plate_crop,
-                    debug=True,
-                    debug_dir=debug_dir_path,
-                    frame_info=f"{cam_name}_frame{frame_count}_plate{i}"
-                )
-                plate_text = ''.join(filter(str.isalnum, raw_plate)).upper()
-                plate_text = plate_text if plate_text and plate_text != "UNKNOWN" else "N/A"
-            except Exception as e:
-                print(f"❌ Error processing plate: {e}")
-                plate_text = "N/A"
-
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{cam_name} - Frame {frame_count}] Color: {color}, Plate: {plate_text}")
-
-            if plate_text != "N/A":
-                vehicle_img_path = os.path.join(
-                    debug_dir_path,
-                    f"{cam_name}_frame{frame_count}_full_vehicle_{i}.jpg"
-                )
-                cv2.imwrite(vehicle_img_path, orig_frame)
-
-                insert_detection(
-                    plate=plate_text,
-                    color=color.lower(),
-                    timestamp=timestamp,
-                    camera=cam_name,
-                    image_path=vehicle_img_path
-                )
-
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-            cv2.putText(frame, plate_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-        frame_count += 1
-        cv2.imshow(f"Live - {cam_name}", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-    print(f"✅ [PID {os.getpid()}] Finished processing {cam_name}.")
-
-def run_on_all_cameras(cameras):
+    try:
+        while active and not stop:
+            got_frame = False
+            for cam_name in list(active):
+                grabber = captures[cam_name]
+                frame = grabber.get(timeout=0 if len(active) > 1 else CAPTURE_POLL_TIMEOUT)
+                if frame is None:
+                    if grabber.finished:
+                        active.remove(cam_name)
+                    continue
+                got_frame = True
+                metrics.frames_in.inc(camera=cam_name)
+
+                gate = gates.get(cam_name)
+                if gate is None or gate.should_process(frame):
+                    batcher.add((cam_name, frame_counts[cam_name]), frame)
+                else:
+                    metrics.frames_skipped.inc(camera=cam_name)
+                frame_counts[cam_name] += 1
+                if frame_counts[cam_name] >= max_frames_limit:
+                    active.remove(cam_name)
+
+                if batcher.is_ready():
+                    stop = run_batch(detector, batcher, processors, headless, metrics, regions)
+                    if stop:
+                        break
+
+            if not got_frame and not stop:
+                if batcher.is_ready():
+                    stop = run_batch(detector, batcher, processors, headless, metrics, regions)
+                elif len(active) > 1:
+                    time.sleep(CAPTURE_POLL_TIMEOUT)
+
+        if len(batcher) and not stop:
+            run_batch(detector, batcher, processors, headless, metrics, regions)
+    finally:
+        # Images and detections still queued are written before the process exits
+        for processor in processors.values():
+            processor.close()  # Final state of sessions still open
+        evidence_writer.close()
+        writer.close()
+        if query_matcher is not None:
+            query_matcher.close()
+        if server is not None:
+            server.shutdown()
+
+    for cam_name, grabber in captures.items():
+        grabber.stop()
+        if grabber.dropped:
+            log.warning("frames dropped to keep up with the live stream",
+                        extra={"camera": cam_name, "dropped": grabber.dropped, "read": grabber.frames_read})
+    if not headless:
+        cv2.destroyAllWindows()
+    log.info("database writer finished", extra={"pid": os.getpid(), "rows": writer.rows_written,
+                                                 "batches": writer.batches_written, "errors": writer.errors})
+    log.info("evidence writer finished", extra={"pid": os.getpid(), "written": evidence_writer.written,
+                                                 "deduplicated": evidence_store.deduplicated,
+                                                 "dropped": evidence_writer.dropped})
+    for cam_name, gate in gates.items():
+        log.info("motion gate finished", extra={"camera": cam_name, **gate.stats()})
+    log.info("OCR cache finished", extra={"pid": os.getpid(), **ocr_cache.stats()})
+    log.info("finished processing", extra={"pid": os.getpid(), "cameras": cam_names})
+
+def run_batch(detector, batcher, processors, headless=HEADLESS, metrics=None, regions=None):
+    """
+    Runs one detector forward pass over everything queued in `batcher` (restricted to
+    each camera's region of interest, if it has one in `regions`), hands each
+    frame's boxes to its camera's FrameProcessor and reads all their plate crops in one
+    batched OCR call. With `metrics`, records the batch in them (frames processed,
+    boxes per frame, stage latencies).
+
+    Returns:
+        True if the user asked to quit (pressed 'q'), False otherwise
+    """
+    keys, frames = batcher.flush()
+    start = time.perf_counter()
+    detections = detect_in_regions(detector, keys, frames, regions, timer=metrics)
+    if metrics is not None:
+        metrics.record("detection", time.perf_counter() - start)
+        metrics.observe_batch(keys, detections)
+
+    annotated_frames = process_batch(processors, keys, frames, detections, timer=metrics)
+    if headless:
+        return False
+
+    for (cam_name, _), annotated in zip(keys, annotated_frames):
+        cv2.imshow(f"Live - {cam_name}", annotated)
+
+    return cv2.waitKey(1) & 0xFF == ord('q')
+
+def process_single_camera(cam_name, video_source, debug_dir_path, max_frames_limit, device_for_model=None,
+                          batch_size=BATCH_SIZE, max_latency_ms=BATCH_MAX_LATENCY_MS,
+                          motion_gate=MOTION_GATE_ENABLED, headless=HEADLESS, metrics_port=None):
+    process_camera_group(
+        {cam_name: video_source}, debug_dir_path, max_frames_limit, device_for_model,
+        batch_size=batch_size, max_latency_ms=max_latency_ms, motion_gate=motion_gate,
+        headless=headless, metrics_port=metrics_port
+    )
+
+def run_on_all_cameras(cameras, cameras_per_process=CAMERAS_PER_PROCESS, headless=HEADLESS):
+    """
+    Starts one process per group of `cameras_per_process` cameras. Cameras in the same
+    group share a model and are batched together in each forward pass. Group i serves
+    its metrics on METRICS_PORT + i. The chat query broker runs in this (parent) process.
+
+    Processes are not restarted and the camera set is fixed; for a supervised worker
+    pool with a reloadable camera config, use pipeline.scheduler.
+    """
     init_db()
-    print("🚀 Starting multiprocessing for all cameras...")
+    broker = start_query_broker() if QUERY_CHANNEL_ENABLED else None
+    log.info("starting camera processes", extra={"cameras": len(cameras), "cameras_per_process": cameras_per_process})
+
+    camera_items = list(cameras.items())
+    cameras_per_process = max(1, cameras_per_process)
 
     processes = []
-    for cam_name, video_source in cameras.items():
+    for group_index, start in enumerate(range(0, len(camera_items), cameras_per_process)):
+        group = dict(camera_items[start:start + cameras_per_process])
         p = multiprocessing.Process(
-            target=process_single_camera,
-            args=(cam_name, video_source, DEBUG_DIR, MAX_FRAMES, device)
+            target=process_camera_group,
+            args=(group, DEBUG_DIR, MAX_FRAMES),
+            kwargs={"headless": headless, "metrics_port": METRICS_PORT + group_index}
         )
         processes.append(p)
         p.start()
 
     for p in processes:
         p.join()
+    if broker is not None:
+        broker.close()
 
-    print("\n🚗 All processing complete.")
+    log.info("all processing complete")
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
@@ -0,0 +1,572 @@
+"""
+Supervised camera scheduler: runs any number of cameras on a fixed pool of worker
+processes and keeps them running.
+
+- Cameras come from a JSON config file that is re-read while running; added, removed
+  and changed cameras are applied to the workers without restarting anything else.
+- Cameras are spread over the workers by expected load (priority x max_fps), and stay
+  on their worker when the config changes.
+- Each worker (one copy of the models, like pipeline.runner.process_camera_group)
+  adapts every camera's frame rate to its load, slowing low-priority cameras first.
+- A camera whose live stream fails is reopened with exponential back-off inside its
+  worker; a video file is finite: the camera is finished at its end (or if the file
+  can't be opened) and its frames are paced to the camera's rate rather than skipped.
+  A worker process that dies is restarted with back-off by the scheduler.
+
+Config (cameras.json, or the file named by CAMERA_CONFIG_FILE):
+    {"gate1": {"source": "rtsp://...", "priority": 3, "max_fps": 15},
+     "lobby": {"source": 0},
+     "yard": {"source": "sample_videos/cam1.mp4", "enabled": false}}
+
+Run with:  python pipeline/scheduler.py --workers 8
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import namedtuple
+
+# Add root to path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chat.query_channel import QueryMatcher, start_query_broker, QUERY_CHANNEL_ENABLED
+from detection.cascade import get_frame_detector
+from detection.plate_detector import select_device
+from ocr.number_plate_reader import ocr_cache
+from pipeline.batching import FrameBatcher, BATCH_SIZE, BATCH_MAX_LATENCY_MS
+from pipeline.capture import FrameGrabber, CAPTURE_POLL_TIMEOUT, is_live_source
+from pipeline.frame_processor import FrameProcessor
+from pipeline.metrics import PipelineMetrics, start_metrics_server, METRICS_ENABLED, METRICS_PORT
+from pipeline.model_registry import models
+from pipeline.motion_gate import MotionGate, MOTION_GATE_ENABLED
+from pipeline.regions import load_camera_regions
+from pipeline.runner import run_batch, DEBUG_DIR
+from pipeline.telemetry import configure_logging
+from storage.database import init_db, DetectionWriter
+from storage.evidence import EvidenceWriter, EvidenceStore
+
+CAMERA_CONFIG_FILE = os.environ.get(
+    "CAMERA_CONFIG_FILE", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "cameras.json"))
+)
+NUM_WORKERS = 2                # Worker processes; each holds one copy of every model
+DEFAULT_PRIORITY = 1           # Higher = slowed down less when a worker is overloaded
+DEFAULT_MAX_FPS = 10.0         # Frames per second a camera is processed at when there is headroom
+
+CONFIG_POLL_INTERVAL = 2.0     # Seconds between checks of the config file
+SUPERVISE_INTERVAL = 0.5       # Seconds between checks of the worker processes
+CONTROL_POLL_INTERVAL = 0.25   # Seconds between a worker's checks for camera changes
+RESTART_BACKOFF_MIN = 1.0      # First restart delay of a failed worker or stream
+RESTART_BACKOFF_MAX = 60.0     # Restart delay cap
+RESTART_RESET_AFTER = 60.0     # A task that ran this long before failing restarts from the minimum delay
+
+RATE_WINDOW = 2.0              # Seconds of load measured per frame-rate adjustment
+LOAD_HIGH = 0.85               # Fraction of time spent processing above which cameras are slowed down
+LOAD_LOW = 0.6                 # ... and below which they are sped up again
+SLOWDOWN_STEP = 1.25           # Factor the slowdown changes by per adjustment
+MAX_SLOWDOWN = 20.0            # Lowest-priority cameras never drop below max_fps / MAX_SLOWDOWN
+
+CameraSpec = namedtuple("CameraSpec", ["source", "priority", "max_fps"])
+
+log = logging.getLogger("pipeline.scheduler")
+
+
+def load_camera_config(path=CAMERA_CONFIG_FILE):
+    """
+    Reads the camera config file.
+
+    Returns:
+        dict cam_name -> CameraSpec for every enabled camera
+    """
+    with open(path) as f:
+        config = json.load(f)
+
+    cameras = {}
+    for cam_name, cam_config in config.items():
+        if not cam_config.get("enabled", True):
+            continue
+        if "source" not in cam_config:
+            raise ValueError(f"Camera {cam_name!r} has no source")
+        cameras[cam_name] = CameraSpec(
+            source=cam_config["source"],
+            priority=max(1, int(cam_config.get("priority", DEFAULT_PRIORITY))),
+            max_fps=float(cam_config.get("max_fps", DEFAULT_MAX_FPS)),
+        )
+    return cameras
+
+
+def camera_load(spec):
+    return spec.priority * spec.max_fps
+
+
+def assign_cameras(cameras, num_workers, previous=None):
+    """
+    Spreads `cameras` ({cam_name: CameraSpec}) over `num_workers` workers.
+
+    Cameras already placed in `previous` (a list of per-worker name collections) stay on
+    their worker, so a config change only touches the cameras it added; new cameras go,
+    heaviest first, to the least loaded worker.
+
+    Returns:
+        List of {cam_name: CameraSpec}, one per worker
+    """
+    assignment = [{} for _ in range(num_workers)]
+    placed = set()
+    for worker_index, names in enumerate(previous or ()):
+        if worker_index >= num_workers:
+            break
+        for cam_name in names:
+            if cam_name in cameras:
+                assignment[worker_index][cam_name] = cameras[cam_name]
+                placed.add(cam_name)
+
+    new_cameras = sorted((name for name in cameras if name not in placed),
+                         key=lambda name: (-camera_load(cameras[name]), name))
+    for cam_name in new_cameras:
+        target = min(range(num_workers),
+                     key=lambda i: (sum(camera_load(spec) for spec in assignment[i].values()), i))
+        assignment[target][cam_name] = cameras[cam_name]
+    return assignment
+
+
+class Backoff:
+    """
+    Exponential restart delay. The delay resets once a task has run for `reset_after`
+    seconds, so a camera that fails once a day isn't penalized for yesterday's failure.
+    """
+
+    def __init__(self, minimum=RESTART_BACKOFF_MIN, maximum=RESTART_BACKOFF_MAX, reset_after=RESTART_RESET_AFTER):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.reset_after = reset_after
+        self.delay = 0.0
+        self.failures = 0
+        self._started_at = None
+
+    def started(self, now):
+        self._started_at = now
+
+    def failed(self, now):
+        """
+        Returns:
+            The time (same clock as `now`) to retry at
+        """
+        if self._started_at is not None and now - self._started_at >= self.reset_after:
+            self.delay = 0.0
+        self.delay = min(self.maximum, max(self.minimum, self.delay * 2))
+        self.failures += 1
+        self._started_at = None
+        return now + self.delay
+
+
+class FrameRateController:
+    """
+    Adaptive per-camera frame rate for one worker.
+
+    The worker reports the time it spends processing batches (`record_busy`); every
+    `window` seconds the fraction of wall time that was busy is compared against
+    LOAD_HIGH / LOAD_LOW and a shared `slowdown` factor is raised or lowered. A camera
+    is processed at most every (1 / max_fps) * slowdown ** (1 / priority) seconds, so
+    priority-1 cameras absorb the full slowdown and higher priorities progressively
+    less. Live cameras' frames in between are skipped before detection; files are paced
+    instead, by only taking their next frame once `is_due` (the decoder waits meanwhile).
+    """
+
+    def __init__(self, window=RATE_WINDOW, high=LOAD_HIGH, low=LOAD_LOW, step=SLOWDOWN_STEP,
+                 max_slowdown=MAX_SLOWDOWN):
+        self.window = window
+        self.high = high
+        self.low = low
+        self.step = step
+        self.max_slowdown = max_slowdown
+        self.slowdown = 1.0
+        self.load = 0.0
+        self._busy = 0.0
+        self._window_start = time.monotonic()
+        self._last_processed = {}
+
+    def record_busy(self, seconds):
+        self._busy += seconds
+
+    def interval(self, spec):
+        return self.slowdown ** (1.0 / spec.priority) / spec.max_fps if spec.max_fps > 0 else 0.0
+
+    def target_fps(self, spec):
+        interval = self.interval(spec)
+        return 1.0 / interval if interval else 0.0
+
+    def is_due(self, cam_name, spec, now):
+        last = self._last_processed.get(cam_name)
+        return last is None or now - last >= self.interval(spec)
+
+    def should_process(self, cam_name, spec, now):
+        if not self.is_due(cam_name, spec, now):
+            return False
+        self._last_processed[cam_name] = now
+        return True
+
+    def forget(self, cam_name):
+        self._last_processed.pop(cam_name, None)
+
+    def update(self, now):
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        self.load = min(1.0, self._busy / elapsed)
+        if self.load > self.high:
+            self.slowdown = min(self.max_slowdown, self.slowdown * self.step)
+        elif self.load < self.low:
+            self.slowdown = max(1.0, self.slowdown / self.step)
+        self._busy = 0.0
+        self._window_start = now
+
+
+class _CameraTask:
+    """
+    One camera inside a worker: its capture (reopened with back-off when a live stream
+    fails, finished when a file ends or can't be opened) and its FrameProcessor.
+    """
+
+    def __init__(self, cam_name, spec, processor, gate=None):
+        self.cam_name = cam_name
+        self.spec = spec
+        self.live = is_live_source(spec.source)
+        self.processor = processor
+        self.gate = gate
+        self.grabber = None
+        self.frame_count = 0
+        self.finished = False
+        self.backoff = Backoff()
+        self.retry_at = 0.0
+
+    def open(self, now):
+        grabber = FrameGrabber(self.spec.source)
+        if not grabber.is_opened():
+            grabber.stop()
+            if not self.live:  # Reopening won't make a missing or unreadable file appear
+                self.finished = True
+                log.error("could not open video file", extra={"camera": self.cam_name, "source": self.spec.source,
+                                                              "exists": os.path.isfile(str(self.spec.source))})
+                return False
+            self.retry_at = self.backoff.failed(now)
+            log.error("could not open video stream",
+                      extra={"camera": self.cam_name, "source": self.spec.source, "retry_in": self.backoff.delay})
+            return False
+        self.grabber = grabber.start()
+        self.backoff.started(now)
+        log.info("camera opened", extra={"camera": self.cam_name, "source": self.spec.source})
+        return True
+
+    def ended(self, now):
+        """
+        Called when the capture has nothing more to give: files are done, live streams
+        are reopened after a back-off delay.
+        """
+        self.grabber.stop()
+        self.grabber = None
+        if self.live:
+            self.retry_at = self.backoff.failed(now)
+            log.warning("live stream ended, reopening",
+                        extra={"camera": self.cam_name, "retry_in": self.backoff.delay,
+                               "failures": self.backoff.failures})
+        else:
+            self.finished = True
+            log.info("video finished", extra={"camera": self.cam_name, "frames": self.frame_count})
+
+    def close(self):
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
+
+
+def camera_worker(worker_index, control, debug_dir_path=DEBUG_DIR, device_for_model=None,
+                  batch_size=BATCH_SIZE, max_latency_ms=BATCH_MAX_LATENCY_MS, motion_gate=MOTION_GATE_ENABLED,
+                  metrics_port=None, cascade=None):
+    """
+    Worker process: loads the models once, then serves whatever cameras the scheduler
+    assigns through `control` (a queue of ("cameras", {cam_name: CameraSpec}) and
+    ("stop", None) messages). Always headless.
+    """
+    configure_logging()
+    device_for_model = device_for_model or select_device()
+    log.info("worker loading models", extra={"worker": worker_index, "pid": os.getpid(), "device": device_for_model})
+    try:
+        detector = get_frame_detector(device_for_model, cascade=cascade)
+        models.warm_up("easyocr")
+    except Exception:
+        log.exception("failed to load models", extra={"worker": worker_index})
+        sys.exit(1)  # The scheduler restarts the worker after a back-off delay
+
+    metrics = PipelineMetrics()
+    metrics.observe_model_loads(models.load_times())
+    server = start_metrics_server(metrics, metrics_port) if METRICS_ENABLED and metrics_port is not None else None
+
+    init_db()
+    regions = load_camera_regions()
+    writer = DetectionWriter(timer=metrics)
+    evidence_writer = EvidenceWriter(timer=metrics)
+    evidence_store = EvidenceStore(writer=evidence_writer)
+    query_matcher = QueryMatcher() if QUERY_CHANNEL_ENABLED else None
+    batcher = FrameBatcher(max_batch_size=batch_size, max_latency_ms=max_latency_ms)
+    rate = FrameRateController()
+    tasks = {}
+    processors = {}
+
+    metrics.queue_depth.set_function(writer.pending, queue="db_writer")
+    metrics.queue_depth.set_function(evidence_writer.queue_depth, queue="evidence_writer")
+    metrics.queue_depth.set_function(lambda: len(batcher), queue="batcher")
+    metrics.worker_load.set_function(lambda: rate.load)
+
+    def process():
+        start = time.perf_counter()
+        run_batch(detector, batcher, processors, headless=True, metrics=metrics, regions=regions)
+        rate.record_busy(time.perf_counter() - start)
+
+    def set_cameras(cameras):
+        if len(batcher):
+            process()  # Queued frames may belong to a camera that is being removed
+        for cam_name in list(tasks):
+            if cameras.get(cam_name) == tasks[cam_name].spec:
+                continue
+            task = tasks.pop(cam_name)
+            task.close()
+            processors.pop(cam_name).close()
+            rate.forget(cam_name)
+            metrics.target_fps.remove(camera=cam_name)
+            log.info("camera removed", extra={"worker": worker_index, "camera": cam_name})
+        for cam_name, spec in cameras.items():
+            if cam_name in tasks:
+                continue
+            processor = FrameProcessor(cam_name, debug_dir_path, writer=writer, evidence_store=evidence_store,
+                                       headless=True, metrics=metrics, query_matcher=query_matcher)
+            tasks[cam_name] = _CameraTask(cam_name, spec, processor, MotionGate() if motion_gate else None)
+            processors[cam_name] = processor
+            metrics.target_fps.set_function(lambda s=spec: rate.target_fps(s), camera=cam_name)
+            log.info("camera added", extra={"worker": worker_index, "camera": cam_name, "priority": spec.priority,
+                                            "max_fps": spec.max_fps})
+
+    stopping = False
+    next_control = 0.0
+    try:
+        while not stopping:
+            now = time.monotonic()
+            if now >= next_control:
+                next_control = now + CONTROL_POLL_INTERVAL
+                # Block briefly only when there is nothing else to do
+                idle = not any(task.grabber is not None for task in tasks.values()) and not len(batcher)
+                try:
+                    while True:
+                        command, payload = control.get(timeout=CONTROL_POLL_INTERVAL if idle else 0)
+                        idle = False
+                        if command == "stop":
+                            stopping = True
+                            break
+                        if command == "cameras":
+                            set_cameras(payload)
+                except queue.Empty:
+                    pass
+                now = time.monotonic()
+                for task in tasks.values():
+                    if task.grabber is None and not task.finished and now >= task.retry_at:
+                        task.open(now)
+
+            got_frame = False
+            for task in tasks.values():
+                if task.grabber is None:
+                    continue
+                if not task.live and not rate.is_due(task.cam_name, task.spec, time.monotonic()):
+                    continue  # Paced: the file's next frame waits in its capture queue
+                frame = task.grabber.get(timeout=0)
+                if frame is None:
+                    if task.grabber.finished:
+                        task.ended(time.monotonic())
+                    continue
+                got_frame = True
+                cam_name = task.cam_name
+                metrics.frames_in.inc(camera=cam_name)
+
+                frame_count = task.frame_count
+                task.frame_count += 1
+                if not rate.should_process(cam_name, task.spec, time.monotonic()):
+                    metrics.frames_throttled.inc(camera=cam_name)
+                    continue
+                if task.gate is not None and not task.gate.should_process(frame):
+                    metrics.frames_skipped.inc(camera=cam_name)
+                    continue
+                batcher.add((cam_name, frame_count), frame)
+                if batcher.is_ready():
+                    process()
+
+            if batcher.is_ready():
+                process()
+            elif not got_frame and tasks:
+                time.sleep(CAPTURE_POLL_TIMEOUT)
+            rate.update(time.monotonic())
+
+        if len(batcher):
+            process()
+    finally:
+        for task in tasks.values():
+            task.close()
+        for processor in processors.values():
+            processor.close()  # Final state of sessions still open
+        evidence_writer.close()
+        writer.close()
+        if query_matcher is not None:
+            query_matcher.close()
+        if server is not None:
+            server.shutdown()
+
+    log.info("OCR cache finished", extra={"worker": worker_index, **ocr_cache.stats()})
+    log.info("worker finished", extra={"worker": worker_index, "pid": os.getpid(), "rows": writer.rows_written})
+
+
+class _WorkerSlot:
+    """
+    Scheduler-side state of one worker: its process, control queue and restart back-off.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.control = None
+        self.cameras = {}
+        self.backoff = Backoff()
+        self.restart_at = 0.0
+
+
+class CameraScheduler:
+    """
+    Runs the cameras of a config file on `num_workers` supervised worker processes.
+
+    `run` blocks until `stop` is called (or Ctrl+C): it re-reads the config file when it
+    changes, sends each worker its updated camera set, and restarts workers that exit
+    unexpectedly (with exponential back-off) with the cameras they had.
+    """
+
+    def __init__(self, config_path=CAMERA_CONFIG_FILE, num_workers=NUM_WORKERS, worker_kwargs=None):
+        self.config_path = config_path
+        self.num_workers = max(1, num_workers)
+        self.worker_kwargs = dict(worker_kwargs or {})
+        self.cameras = {}
+        self.workers = [_WorkerSlot(i) for i in range(self.num_workers)]
+        self._config_mtime = None
+        self._next_config_check = 0.0
+        self._stopping = False
+
+    def run(self):
+        configure_logging()
+        init_db()
+        broker = start_query_broker() if QUERY_CHANNEL_ENABLED else None
+        log.info("scheduler started", extra={"config": self.config_path, "workers": self.num_workers})
+        try:
+            while not self._stopping:
+                self.tick()
+                time.sleep(SUPERVISE_INTERVAL)
+        except KeyboardInterrupt:
+            log.info("scheduler interrupted")
+        finally:
+            self.shutdown()
+            if broker is not None:
+                broker.close()
+
+    def stop(self):
+        self._stopping = True
+
+    def tick(self):
+        now = time.monotonic()
+        if now >= self._next_config_check:
+            self._next_config_check = now + CONFIG_POLL_INTERVAL
+            self.reload_config()
+        for slot in self.workers:
+            self._supervise(slot, now)
+
+    def reload_config(self):
+        """
+        Applies the config file if it changed since the last call. An unreadable or
+        invalid file is logged and the running configuration is kept.
+        """
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            if self._config_mtime is None:
+                log.warning("camera config not found", extra={"path": self.config_path})
+                self._config_mtime = -1
+            return False
+        if mtime == self._config_mtime:
+            return False
+
+        try:
+            cameras = load_camera_config(self.config_path)
+        except (OSError, ValueError) as e:
+            log.error("camera config rejected, keeping the running one", extra={"path": self.config_path, "error": e})
+            self._config_mtime = mtime
+            return False
+
+        self._config_mtime = mtime
+        added = sorted(set(cameras) - set(self.cameras))
+        removed = sorted(set(self.cameras) - set(cameras))
+        changed = sorted(name for name in set(cameras) & set(self.cameras) if cameras[name] != self.cameras[name])
+        self.cameras = cameras
+        log.info("camera config loaded", extra={"cameras": len(cameras), "added": ",".join(added),
+                                                "removed": ",".join(removed), "changed": ",".join(changed)})
+
+        assignment = assign_cameras(cameras, self.num_workers, [slot.cameras for slot in self.workers])
+        for slot, slot_cameras in zip(self.workers, assignment):
+            if slot_cameras != slot.cameras:
+                slot.cameras = slot_cameras
+                if slot.process is not None and slot.process.is_alive():
+                    slot.control.put(("cameras", slot_cameras))
+        return True
+
+    def shutdown(self):
+        self._stopping = True
+        for slot in self.workers:
+            if slot.process is not None and slot.process.is_alive():
+                slot.control.put(("stop", None))
+        for slot in self.workers:
+            if slot.process is not None:
+                slot.process.join()
+        log.info("scheduler stopped")
+
+    def _supervise(self, slot, now):
+        if slot.process is not None:
+            if slot.process.is_alive():
+                return
+            exitcode = slot.process.exitcode
+            slot.process = None
+            slot.restart_at = slot.backoff.failed(now)
+            log.error("worker exited, restarting", extra={"worker": slot.index, "exitcode": exitcode,
+                                                          "retry_in": slot.backoff.delay,
+                                                          "failures": slot.backoff.failures})
+        if not slot.cameras or now < slot.restart_at:
+            return
+
+        slot.control = multiprocessing.Queue()
+        slot.control.put(("cameras", slot.cameras))
+        kwargs = dict(self.worker_kwargs, metrics_port=METRICS_PORT + slot.index)
+        slot.process = multiprocessing.Process(target=camera_worker, args=(slot.index, slot.control),
+                                               kwargs=kwargs, name=f"CameraWorker-{slot.index}")
+        slot.process.start()
+        slot.backoff.started(now)
+        log.info("worker started", extra={"worker": slot.index, "pid": slot.process.pid,
+                                          "cameras": ",".join(slot.cameras)})
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Run the cameras of a config file on a supervised worker pool.")
+    parser.add_argument("--config", default=CAMERA_CONFIG_FILE, help="Camera config file (re-read while running)")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Worker processes (one model copy each)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-latency-ms", type=float, default=BATCH_MAX_LATENCY_MS)
+    args = parser.parse_args()
+
+    CameraScheduler(args.config, args.workers, worker_kwargs={
+        "batch_size": args.batch_size, "max_latency_ms": args.max_latency_ms,
+    }).run()
@@ -0,0 +1,145 @@
+from collections import OrderedDict
+
+SESSION_IDLE_SECONDS = 30.0      # A plate not read on a camera for this long ends its session
+SESSION_MAX_OPEN = 256           # Open sessions kept per camera; beyond this the least recently seen is closed
+SESSION_UPDATE_INTERVAL = 10.0   # Min seconds between persisted updates of an open session
+SESSION_IMAGE_GAIN = 1.5         # A crop this many times sharper than the session's best replaces its image
+
+OPENED = "opened"
+IMPROVED = "improved"
+RECOLORED = "recolored"
+
+
+class Session:
+    """
+    One continuous presence of a plate in front of one camera.
+    """
+
+    def __init__(self, plate, color, camera, seen_at, sharpness, image=None):
+        self.plate = plate
+        self.color = color
+        self.camera = camera
+        self.first_seen = seen_at
+        self.last_seen = seen_at
+        self.sightings = 1             # Frames the plate was seen in
+        self.best_sharpness = sharpness
+        self.best_image = image        # Image of the sharpest crop while not yet persisted, else None
+        self.image_path = None         # Evidence image persisted so far
+        self.persisted_at = seen_at
+        self.closed = False
+        self.queries_checked = set()   # Ids of the live chat queries this session was matched against
+
+
+class SightingSessionizer:
+    """
+    Folds a camera's per-frame plate readings into sessions, so storage only hears about
+    a vehicle when something worth keeping changes.
+
+    Open sessions live in a bounded LRU (plate -> Session, least recently seen first).
+    `observe` is called for every plate read and reports whether the reading should be
+    persisted:
+
+    - OPENED: the plate wasn't in view; store a sighting and an evidence image
+    - IMPROVED: the session holds a crop `image_gain` times sharper than its persisted
+      one; store the session with a new evidence image
+    - RECOLORED: the color classification changed; store the session
+    - None: only last seen, the sighting count and the best image change, in memory
+
+    IMPROVED and RECOLORED are only reported once `update_interval` seconds have passed
+    since the session was last persisted. The sharpest crop's image (whatever the caller
+    passes, e.g. the frame) is kept in `best_image` until it is persisted, so a vehicle
+    that leaves within the interval still gets its best image stored when it closes.
+
+    A session closes once its plate hasn't been read for `idle_seconds`, or when it is
+    evicted to make room for a new one; `expire` and `close_all` return closed sessions
+    so their final state can be persisted. Times are Unix timestamps of the frames
+    (media time for recorded video), so sessions are the same whether a video is
+    replayed live or ingested offline.
+    """
+
+    def __init__(self, camera, idle_seconds=SESSION_IDLE_SECONDS, max_open=SESSION_MAX_OPEN,
+                 update_interval=SESSION_UPDATE_INTERVAL, image_gain=SESSION_IMAGE_GAIN):
+        self.camera = camera
+        self.idle_seconds = idle_seconds
+        self.max_open = max_open
+        self.update_interval = update_interval
+        self.image_gain = image_gain
+        self.sessions = OrderedDict()
+        self._closed = []
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def observe(self, plate, color, seen_at, sharpness=0.0, image=None, first_seen=None, sightings=1):
+        """
+        Records `sightings` readings of `plate`, the last at `seen_at` and the first at
+        `first_seen` (default: `seen_at`), with `image` showing a crop of `sharpness`.
+
+        Returns:
+            (session, event): event is OPENED, IMPROVED, RECOLORED or None (see class
+            docstring). Whenever the caller persists the session it saves `best_image`
+            (if set) as evidence, sets `image_path` and resets `best_image` to None
+        """
+        first_seen = seen_at if first_seen is None else first_seen
+        session = self.sessions.get(plate)
+        if session is None or first_seen - session.last_seen > self.idle_seconds:
+            if session is not None:
+                self._close(self.sessions.pop(plate))
+            session = self.sessions[plate] = Session(plate, color, self.camera, first_seen, sharpness, image)
+            session.last_seen = seen_at
+            session.sightings = sightings
+            session.persisted_at = seen_at
+            while len(self.sessions) > self.max_open:
+                self._close(self.sessions.popitem(last=False)[1])
+            return session, OPENED
+
+        self.sessions.move_to_end(plate)
+        session.last_seen = max(session.last_seen, seen_at)
+        session.sightings += sightings
+        if image is not None and sharpness > session.best_sharpness * self.image_gain:
+            session.best_sharpness = sharpness
+            session.best_image = image
+
+        if seen_at - session.persisted_at < self.update_interval:
+            return session, None
+        if session.best_image is not None:
+            event = IMPROVED
+        elif color != session.color and color != "unknown":
+            event = RECOLORED
+        else:
+            return session, None
+        if color != "unknown":
+            session.color = color
+        session.persisted_at = seen_at
+        return session, event
+
+    def expire(self, now):
+        """
+        Closes sessions not seen for `idle_seconds` before `now`.
+
+        Returns:
+            The sessions closed since the last call (including evicted ones)
+        """
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if now - session.last_seen <= self.idle_seconds:
+                break
+            self._close(self.sessions.popitem(last=False)[1])
+        closed, self._closed = self._closed, []
+        return closed
+
+    def close_all(self):
+        """
+        Closes every open session (e.g. when the camera stops).
+
+        Returns:
+            The sessions closed since the last call
+        """
+        while self.sessions:
+            self._close(self.sessions.popitem(last=False)[1])
+        closed, self._closed = self._closed, []
+        return closed
+
+    def _close(self, session):
+        session.closed = True
+        self._closed.append(session)
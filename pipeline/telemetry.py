@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+
+LOG_LEVEL = logging.INFO
+LOG_RATE_LIMIT_INTERVAL = 1.0  # Seconds per rate-limit window, per log call site
+LOG_RATE_LIMIT_BURST = 5       # Records a call site may emit per window; the rest are counted and dropped
+
+# Attributes every LogRecord has; anything else came in through `extra=` and is a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class LogfmtFormatter(logging.Formatter):
+    """
+    Formats records as logfmt (`key=value` pairs), so they can be grepped and parsed:
+
+        ts=2025-06-20T10:00:00 level=info logger=pipeline.runner msg="batch done" camera=cam1 frames=4
+
+    Fields passed with `extra={...}` are appended after the message.
+    """
+
+    def format(self, record):
+        parts = [
+            f"ts={self.formatTime(record, '%Y-%m-%dT%H:%M:%S')}",
+            f"level={record.levelname.lower()}",
+            f"logger={record.name}",
+            f"msg={_quote(record.getMessage())}",
+        ]
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                parts.append(f"{key}={_quote(value)}")
+        if record.exc_info:
+            parts.append(f"exc={_quote(self.formatException(record.exc_info))}")
+        return " ".join(parts)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets each call site (logger + message template) emit at most `burst` records per
+    `interval` seconds. Dropped records are counted, and the next record that gets
+    through from that call site carries `suppressed=<count>`.
+    """
+
+    def __init__(self, interval=LOG_RATE_LIMIT_INTERVAL, burst=LOG_RATE_LIMIT_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._windows = {}  # (logger, template) -> [window_start, emitted, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                window = self._windows[key] = [now, 0, suppressed]
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            if window[2]:
+                record.suppressed = window[2]
+                window[2] = 0
+        return True
+
+
+def configure_logging(level=LOG_LEVEL, rate_limit=True):
+    """
+    Sends all logging to stderr as rate-limited logfmt. Call once at the start of each
+    process (spawned processes don't inherit the parent's configuration); repeated calls
+    only update the level.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    if any(getattr(handler, "_pipeline_handler", False) for handler in root.handlers):
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(LogfmtFormatter())
+    if rate_limit:
+        handler.addFilter(RateLimitFilter())
+    handler._pipeline_handler = True
+    root.addHandler(handler)
+
+
+def _quote(value):
+    text = str(value)
+    if text and not any(c in text for c in ' "=\n'):
+        return text
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
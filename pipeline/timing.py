@@ -0,0 +1,59 @@
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+TIMING_PERCENTILES = (50, 90, 99)
+
+
+class StageTimer:
+    """
+    Collects latency samples per pipeline stage (e.g. "detection", "ocr", "db_write").
+
+    Components that support timing take an optional `timer` and call `record` with the
+    seconds a stage took; they skip timing entirely when no timer is given. Samples may be
+    recorded from background threads (DB and evidence writers), so recording is locked.
+    """
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def stages(self):
+        with self._lock:
+            return list(self._samples)
+
+    def summary(self, percentiles=TIMING_PERCENTILES):
+        """
+        Returns:
+            dict stage -> {count, total_s, mean_ms, p<N>_ms..., max_ms}
+        """
+        with self._lock:
+            samples = {stage: np.array(values) for stage, values in self._samples.items()}
+
+        summary = {}
+        for stage, values in samples.items():
+            ms = values * 1000.0
+            stats = {
+                "count": int(len(values)),
+                "total_s": round(float(values.sum()), 4),
+                "mean_ms": round(float(ms.mean()), 3),
+            }
+            for p, value in zip(percentiles, np.percentile(ms, percentiles)):
+                stats[f"p{p}_ms"] = round(float(value), 3)
+            stats["max_ms"] = round(float(ms.max()), 3)
+            summary[stage] = stats
+        return summary
@@ -0,0 +1,201 @@
+import cv2
+
+TRACK_IOU_THRESHOLD = 0.3        # Min IoU to continue a track
+TRACK_CENTROID_DISTANCE = 0.5    # Fallback match: centroid shift as a fraction of the box diagonal
+TRACK_MAX_MISSED_FRAMES = 15     # Processed frames a track survives without a matching box
+TRACK_INITIAL_READS = 2          # First crops of a track are always OCR'd
+TRACK_MAX_READS = 5              # Total OCR budget per track; later reads need a sharper crop
+TRACK_SETTLE_FRAMES = 10         # Frames a track goes without a new OCR read before its vote is final
+
+
+def box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def crop_sharpness(image):
+    """
+    Variance of the Laplacian — higher means a sharper (less blurred) crop.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class Track:
+    """
+    One plate followed across frames. OCR reads are accumulated as confidence-weighted
+    votes, and the plate with the highest total weight wins.
+
+    The vote can flip while reads arrive, so consumers that must not see the plate change
+    wait for `settle`: it fixes `final_plate` once no further read could change the
+    outcome, or once the track went TRACK_SETTLE_FRAMES frames without one. A settled
+    track gets no more reads.
+    """
+
+    def __init__(self, track_id, box, frame_index):
+        self.id = track_id
+        self.box = box
+        self.first_seen = frame_index
+        self.last_seen = frame_index
+        self.hits = 1
+        self.missed = 0
+
+        self.color = None
+        self.best_frame = None          # (frame_count, frame) of the sharpest crop before settling
+        self.best_frame_sharpness = -1.0
+        self.first_seen_at = None       # Unix times of the first and last frame with this track
+        self.last_seen_at = None
+        self.votes = {}
+        self.ocr_reads = 0
+        self.best_sharpness = -1.0
+        self.final_plate = None
+        self.queries_matched = set()    # Ids of the live chat queries its vote so far alerted on
+        self._hits_at_read = 0
+
+    def request_ocr(self, sharpness):
+        """
+        Claims an OCR read for a crop of this track. Granted for the first
+        TRACK_INITIAL_READS crops, then only for crops sharper than any seen so far,
+        up to TRACK_MAX_READS reads in total.
+
+        Returns:
+            True if the crop should be OCR'd (its result then goes to add_read)
+        """
+        if self.final_plate is not None or self.ocr_reads >= TRACK_MAX_READS:
+            return False
+        if self.ocr_reads >= TRACK_INITIAL_READS and sharpness <= self.best_sharpness:
+            return False
+        self.ocr_reads += 1
+        self.best_sharpness = max(self.best_sharpness, sharpness)
+        self._hits_at_read = self.hits
+        return True
+
+    def add_read(self, text, confidence):
+        if text and text != "N/A":
+            self.votes[text] = self.votes.get(text, 0.0) + max(confidence, 1e-3)
+
+    @property
+    def plate(self):
+        if not self.votes:
+            return "N/A"
+        return max(self.votes, key=self.votes.get)
+
+    @property
+    def settled(self):
+        """
+        True once the remaining OCR budget can't overturn the leading plate (a read adds
+        at most 1.0), or no read was granted for TRACK_SETTLE_FRAMES frames.
+        """
+        if not self.votes:
+            return False
+        if self.ocr_reads >= TRACK_MAX_READS or self.hits - self._hits_at_read >= TRACK_SETTLE_FRAMES:
+            return True
+        leader, runner_up = (sorted(self.votes.values(), reverse=True) + [0.0])[:2]
+        return leader - runner_up > TRACK_MAX_READS - self.ocr_reads
+
+    def settle(self, ended=False):
+        """
+        Fixes `final_plate` to the current vote once the track is `settled`, or
+        unconditionally when it `ended`.
+
+        Returns:
+            final_plate, or None while the vote may still change (or there are no votes)
+        """
+        if self.final_plate is None and self.votes and (ended or self.settled):
+            self.final_plate = self.plate
+        return self.final_plate
+
+
+class PlateTracker:
+    """
+    Greedy IoU tracker with a centroid-distance fallback, assigning stable IDs to plate
+    boxes so OCR and color classification can run once per vehicle instead of per frame.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, centroid_distance=TRACK_CENTROID_DISTANCE,
+                 max_missed_frames=TRACK_MAX_MISSED_FRAMES):
+        self.iou_threshold = iou_threshold
+        self.centroid_distance = centroid_distance
+        self.max_missed_frames = max_missed_frames
+        self.tracks = {}
+        self._next_id = 1
+
+    def update(self, frame_index, boxes):
+        """
+        Parameters:
+            frame_index (int): index of the current frame
+            boxes (list): [(x1, y1, x2, y2), ...] detected in this frame
+
+        Returns:
+            (assigned, finished): the Track for each box (same order as `boxes`), and the
+            tracks that expired on this update
+        """
+        assigned = [None] * len(boxes)
+        unmatched_tracks = set(self.tracks)
+
+        candidates = []
+        for box_idx, box in enumerate(boxes):
+            for track_id in unmatched_tracks:
+                iou = box_iou(box, self.tracks[track_id].box)
+                if iou >= self.iou_threshold:
+                    candidates.append((iou, box_idx, track_id))
+
+        for _, box_idx, track_id in sorted(candidates, reverse=True):
+            if assigned[box_idx] is None and track_id in unmatched_tracks:
+                assigned[box_idx] = self.tracks[track_id]
+                unmatched_tracks.discard(track_id)
+
+        for box_idx, box in enumerate(boxes):
+            if assigned[box_idx] is not None:
+                continue
+            track_id = self._nearest_centroid(box, unmatched_tracks)
+            if track_id is not None:
+                assigned[box_idx] = self.tracks[track_id]
+                unmatched_tracks.discard(track_id)
+            else:
+                track = Track(self._next_id, box, frame_index)
+                self._next_id += 1
+                self.tracks[track.id] = track
+                assigned[box_idx] = track
+
+        for box, track in zip(boxes, assigned):
+            if track.last_seen != frame_index:
+                track.hits += 1
+            track.box = box
+            track.last_seen = frame_index
+            track.missed = 0
+
+        finished = []
+        for track_id in unmatched_tracks:
+            track = self.tracks[track_id]
+            track.missed += 1
+            if track.missed > self.max_missed_frames:
+                finished.append(self.tracks.pop(track_id))
+
+        return assigned, finished
+
+    def flush(self):
+        """
+        Ends every live track (e.g. at end of stream) and returns them.
+        """
+        finished = list(self.tracks.values())
+        self.tracks = {}
+        return finished
+
+    def _nearest_centroid(self, box, track_ids):
+        cx, cy = (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+        best_id, best_dist = None, None
+        for track_id in track_ids:
+            tb = self.tracks[track_id].box
+            tcx, tcy = (tb[0] + tb[2]) / 2.0, (tb[1] + tb[3]) / 2.0
+            diag = ((tb[2] - tb[0]) ** 2 + (tb[3] - tb[1]) ** 2) ** 0.5
+            dist = ((cx - tcx) ** 2 + (cy - tcy) ** 2) ** 0.5
+            if dist <= self.centroid_distance * diag and (best_dist is None or dist < best_dist):
+                best_id, best_dist = track_id, dist
+        return best_id
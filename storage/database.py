@@ -1,15 +1,127 @@
 import sqlite3
 import os
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+from storage.plate_index import plate_keys, rank_plates, FUZZY_TOP_K, FUZZY_MAX_DISTANCE
+
 DB_PATH = os.path.join(os.path.dirname(__file__), "vehicle_data.db")
 
-def init_db():
+WRITER_BATCH_SIZE = 50        # Rows per executemany in DetectionWriter
+WRITER_FLUSH_INTERVAL = 1.0   # Max seconds a queued row waits before being written
+BUSY_TIMEOUT_SECONDS = 30     # How long a connection waits on another process's lock
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+PRUNE_BATCH_SIZE = 10000      # Rows deleted per transaction by prune_sightings
+READER_POOL_SIZE = 8          # Idle read-only connections ReadOnlyPool keeps open
+
+log = logging.getLogger(__name__)
+
+_SESSION = object()  # Tags plate session rows in DetectionWriter's queue
+
+UPSERT_DETECTION_SQL = """
+    INSERT INTO vehicle_detections (plate, color, camera, timestamp, image_path)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(plate) DO UPDATE SET
+        timestamp = excluded.timestamp,
+        color = excluded.color,
+        camera = excluded.camera,
+        image_path = excluded.image_path
+    WHERE excluded.timestamp >= vehicle_detections.timestamp;  -- Older (e.g. ingested) footage never replaces a newer sighting
+"""
+
+INSERT_SIGHTING_SQL = """
+    INSERT INTO sightings (plate, color, camera, ts, image_path)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+INSERT_PLATE_KEY_SQL = "INSERT OR IGNORE INTO plate_keys (key, plate) VALUES (?, ?)"
+DELETE_PLATE_KEY_SQL = "DELETE FROM plate_keys WHERE key = ? AND plate = ?"
+
+UPSERT_SESSION_SQL = """
+    INSERT INTO plate_sessions (plate, color, camera, first_seen, last_seen, sightings, image_path, closed)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(camera, plate, first_seen) DO UPDATE SET
+        color = excluded.color,
+        last_seen = excluded.last_seen,
+        sightings = excluded.sightings,
+        image_path = excluded.image_path,
+        closed = excluded.closed;
+"""
+
+def connect(db_path=None):
     """
-    Creates the `vehicle_detections` table if it doesn't already exist.
-    Now also stores image_path.
+    Opens a connection (to DB_PATH by default) in WAL mode, so readers (e.g. the UI) never
+    block camera writers and writers from several processes only serialize on the short
+    commit itself.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=BUSY_TIMEOUT_SECONDS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def connect_readonly(db_path=None):
+    """
+    Opens a read-only connection (to DB_PATH by default) for readers such as the UI. It
+    can't take write locks, so it never competes with the camera writers, and it may be
+    used from a thread other than the one that opened it (one thread at a time).
+    """
+    path = os.path.abspath(db_path or DB_PATH)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_SECONDS,
+                           check_same_thread=False)
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+class ReadOnlyPool:
+    """
+    Reusable read-only connections for long-lived, multi-threaded readers (the Streamlit
+    UI serves every operator session from its own thread). `connection()` lends an idle
+    connection, or opens one if all are in use, so concurrent readers never share a
+    connection and none pays for opening one per query.
+    """
+
+    def __init__(self, db_path=None, max_idle=READER_POOL_SIZE):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect_readonly(self.db_path)
+        try:
+            yield conn
+        except BaseException:
+            # Not only query errors: a Streamlit rerun or an abandoned generator may leave
+            # the connection mid-statement, so it is never lent again
+            conn.close()
+            raise
+        else:
+            if self._idle.qsize() < self.max_idle:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+def init_db(db_path=None):
+    """
+    Creates the `vehicle_detections` and `sightings` tables (and their indexes) if they
+    don't already exist.
+
+    - `vehicle_detections` keeps the latest sighting per plate
+    - `sightings` is append-only: one row per stored detection, with a numeric Unix
+      timestamp (`ts`) so time-range queries can use the indexes
+    - `plate_keys` is the fuzzy plate index (see storage.plate_index), a few keys per
+      distinct plate, written together with the detections
+    - `plate_sessions` has one row per continuous presence of a plate in front of a
+      camera (see pipeline.sessions): first/last seen, how many frames it was read in
+      and its best evidence image
+    """
+    with connect(db_path) as conn:
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS vehicle_detections (
@@ -21,6 +133,59 @@ def init_db():
                 image_path TEXT            -- File path of detected image
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sightings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                plate TEXT NOT NULL,       -- License plate
+                color TEXT,                -- Detected vehicle color
+                camera TEXT,               -- Source camera name
+                ts REAL NOT NULL,          -- Unix timestamp of the sighting
+                image_path TEXT            -- File path of detected image
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sightings_plate_ts ON sightings (plate, ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sightings_color_ts ON sightings (color, ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sightings_camera_ts ON sightings (camera, ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sightings_ts ON sightings (ts)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON vehicle_detections (timestamp)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS plate_keys (
+                key TEXT NOT NULL,         -- Canonical plate or one of its deletions
+                plate TEXT NOT NULL,       -- Plate as stored in vehicle_detections
+                PRIMARY KEY (key, plate)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS plate_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                plate TEXT NOT NULL,       -- License plate
+                color TEXT,                -- Detected vehicle color
+                camera TEXT NOT NULL,      -- Source camera name
+                first_seen REAL NOT NULL,  -- Unix timestamp of the first read
+                last_seen REAL NOT NULL,   -- Unix timestamp of the latest read
+                sightings INTEGER NOT NULL,  -- Frames the plate was read in
+                image_path TEXT,           -- File path of the best image
+                closed INTEGER NOT NULL DEFAULT 0,  -- 1 once the plate left the camera's view
+                UNIQUE (camera, plate, first_seen)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_plate_last_seen ON plate_sessions (plate, last_seen)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON plate_sessions (last_seen)")
+
+        # Seed history from databases created before the sightings table existed
+        cursor.execute("""
+            INSERT INTO sightings (plate, color, camera, ts, image_path)
+            SELECT plate, color, camera, CAST(strftime('%s', timestamp, 'utc') AS REAL), image_path
+            FROM vehicle_detections
+            WHERE plate IS NOT NULL AND timestamp IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM sightings)
+            ORDER BY timestamp
+        """)
+
+        # Index plates stored before the fuzzy index existed
+        if cursor.execute("SELECT 1 FROM plate_keys LIMIT 1").fetchone() is None:
+            plates = [row[0] for row in cursor.execute("SELECT plate FROM vehicle_detections WHERE plate IS NOT NULL")]
+            cursor.executemany(INSERT_PLATE_KEY_SQL, _plate_key_params(plates))
         conn.commit()
 
 def insert_detection(plate, color, camera, timestamp=None, image_path=None):
@@ -30,73 +195,477 @@ def insert_detection(plate, color, camera, timestamp=None, image_path=None):
     - Skips "N/A" or empty plates
     - Converts all plates to uppercase, color to lowercase
     - If the plate already exists, updates its timestamp/color/camera/image_path
+    - Always appends a row to `sightings`, so the movement history is kept
     """
-    if not plate or plate.strip().upper() == "N/A":
+    row = _detection_row(plate, color, camera, timestamp, image_path)
+    if row is None:
         return
 
-    processed_plate = plate.strip().upper()
-    processed_color = color.strip().lower()
-    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
+    processed_plate, timestamp = row[0], row[3]
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("""
-                INSERT INTO vehicle_detections (plate, color, camera, timestamp, image_path)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(plate) DO UPDATE SET
-                    timestamp = excluded.timestamp,
-                    color = excluded.color,
-                    camera = excluded.camera,
-                    image_path = excluded.image_path
-                WHERE plate = excluded.plate;
-            """, (processed_plate, processed_color, camera, timestamp, image_path))
+            cursor.execute(UPSERT_DETECTION_SQL, row[:5])
+            cursor.execute(INSERT_SIGHTING_SQL, _sighting_params(row))
+            cursor.executemany(INSERT_PLATE_KEY_SQL, _plate_key_params([processed_plate]))
             conn.commit()
 
-            print(f"✔️ Database: Plate {processed_plate} processed at {timestamp}.")
+            log.debug("detection stored", extra={"plate": processed_plate, "timestamp": timestamp})
         except sqlite3.Error as e:
-            print(f"❌ Database error while processing plate {processed_plate}: {e}")
+            log.error("database write failed", extra={"plate": processed_plate, "error": e})
 
-def query_latest_match(color=None, plate=None):
+def insert_session(plate, color, camera, first_seen, last_seen, sightings, image_path=None, closed=False):
     """
-    Fetch the most recent vehicle match based on color and/or plate.
-
-    Returns:
-    - dict with plate, color, camera, timestamp, image_path OR None
+    Inserts or updates a plate session (keyed by camera, plate and first_seen). A closed
+    session also becomes the plate's latest sighting in `vehicle_detections`.
     """
+    row = _session_row(plate, color, camera, first_seen, last_seen, sightings, image_path, closed)
     with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
+        try:
+            _write_sessions(conn, [row])
+            conn.commit()
+        except sqlite3.Error as e:
+            log.error("database write failed", extra={"plate": row[1][0], "error": e})
+
+def _session_row(plate, color, camera, first_seen, last_seen, sightings, image_path=None, closed=False):
+    """
+    (_SESSION, UPSERT_SESSION_SQL parameters), as queued by DetectionWriter.add_session.
+    """
+    params = (plate.strip().upper(), color.strip().lower(), camera, to_unix_time(first_seen),
+              to_unix_time(last_seen), int(sightings), image_path, int(bool(closed)))
+    return (_SESSION, params)
+
+def _write_sessions(conn, rows):
+    params = [row[1] for row in rows]
+    conn.executemany(UPSERT_SESSION_SQL, params)
+    # A session that ended moves the plate's latest sighting to when it was last seen
+    conn.executemany(UPSERT_DETECTION_SQL, [
+        (plate, color, camera, format_timestamp(last_seen), image_path)
+        for plate, color, camera, _, last_seen, _, image_path, closed in params if closed
+    ])
+
+def _detection_row(plate, color, camera, timestamp=None, image_path=None):
+    """
+    Normalizes a detection into (plate, color, camera, timestamp, image_path, ts), or None
+    for "N/A"/empty plates. The first five are the UPSERT_DETECTION_SQL parameters.
+
+    `timestamp` may be a "%Y-%m-%d %H:%M:%S" string, a datetime or a Unix timestamp; it
+    is kept as a string for `vehicle_detections` and as a number (`ts`) for `sightings`.
+    """
+    if not plate or plate.strip().upper() == "N/A":
+        return None
+
+    processed_plate = plate.strip().upper()
+    processed_color = color.strip().lower()
+    ts = to_unix_time(timestamp)
+    timestamp = timestamp if isinstance(timestamp, str) else format_timestamp(ts)
+    return (processed_plate, processed_color, camera, timestamp, image_path, ts)
+
+def _sighting_params(row):
+    plate, color, camera, _, image_path, ts = row
+    return (plate, color, camera, ts, image_path)
+
+def _plate_key_params(plates):
+    return [(key, plate) for plate in set(plates) for key in plate_keys(plate)]
+
+def to_unix_time(timestamp):
+    """
+    Converts a "%Y-%m-%d %H:%M:%S" string (local time), datetime or number to a Unix timestamp.
+    """
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp()
+
+def format_timestamp(timestamp=None):
+    """
+    Formats a Unix timestamp, datetime or string (passed through) as "%Y-%m-%d %H:%M:%S"
+    local time. Defaults to now.
+    """
+    if timestamp is None:
+        return datetime.now().strftime(TIMESTAMP_FORMAT)
+    if isinstance(timestamp, str):
+        return timestamp
+    if isinstance(timestamp, (int, float)):
+        timestamp = datetime.fromtimestamp(timestamp)
+    return timestamp.strftime(TIMESTAMP_FORMAT)
 
-        query = "SELECT plate, color, camera, timestamp, image_path FROM vehicle_detections"
-        conditions = []
-        params = []
+class DetectionWriter:
+    """
+    Write-behind detection writer for the camera processes.
+
+    `add` only normalizes the row and puts it on a queue, so the frame loop never waits on
+    SQLite. A background thread owns one persistent WAL-mode connection and writes queued
+    rows with `executemany`, one transaction per batch, whenever `batch_size` rows are
+    waiting or the oldest has waited `flush_interval` seconds. `close` writes whatever is
+    left before returning.
+
+    Plate sessions queued with `add_session` go into the same batches.
+
+    With a `timer` (pipeline.timing.StageTimer), each batch transaction is recorded as
+    "db_write".
+    """
+
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, db_path=None, batch_size=WRITER_BATCH_SIZE, flush_interval=WRITER_FLUSH_INTERVAL, timer=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timer = timer
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.errors = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="DetectionWriter", daemon=True)
+        self._thread.start()
+
+    def add(self, plate, color, camera, timestamp=None, image_path=None):
+        """
+        Same arguments and normalization as insert_detection, but returns immediately.
+        """
+        row = _detection_row(plate, color, camera, timestamp, image_path)
+        if row is not None:
+            self._queue.put(row)
 
-        if plate:
-            conditions.append("plate = ?")
-            params.append(plate.strip().upper())
+    def add_session(self, plate, color, camera, first_seen, last_seen, sightings, image_path=None, closed=False):
+        """
+        Same arguments as insert_session, but returns immediately.
+        """
+        self._queue.put(_session_row(plate, color, camera, first_seen, last_seen, sightings, image_path, closed))
 
-        if color:
-            conditions.append("color = ?")
-            params.append(color.strip().lower())
+    def pending(self):
+        return self._queue.qsize()
 
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+    def flush(self):
+        """
+        Blocks until everything queued so far has been written.
+        """
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        done.wait()
 
-        query += " ORDER BY timestamp DESC LIMIT 1"
+    def close(self):
+        """
+        Writes all queued rows, then stops the writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
 
-        cursor.execute(query, params)
-        row = cursor.fetchone()
+    def __enter__(self):
+        return self
 
-        if row:
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        conn = connect(self.db_path)
+        rows = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is self._STOP:
+                    break
+                if isinstance(item, tuple) and item and item[0] is self._FLUSH:
+                    self._write(conn, rows)
+                    rows, deadline = [], None
+                    item[1].set()
+                    continue
+
+                if item is not None:
+                    rows.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+                if rows and (len(rows) >= self.batch_size or time.monotonic() >= deadline):
+                    self._write(conn, rows)
+                    rows, deadline = [], None
+        finally:
+            waiters = self._drain_into(rows)
+            self._write(conn, rows)
+            conn.close()
+            for done in waiters:
+                done.set()
+
+    def _drain_into(self, rows):
+        """
+        Moves everything still queued into `rows`; returns the flush events found.
+        """
+        waiters = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return waiters
+            if isinstance(item, tuple) and item and item[0] is self._FLUSH:
+                waiters.append(item[1])
+            elif item is not self._STOP:
+                rows.append(item)
+
+    def _write(self, conn, rows):
+        if not rows:
+            return
+        start = time.perf_counter()
+        detections = [row for row in rows if row[0] is not _SESSION]
+        sessions = [row for row in rows if row[0] is _SESSION]
+        try:
+            with conn:
+                conn.executemany(UPSERT_DETECTION_SQL, [row[:5] for row in detections])
+                conn.executemany(INSERT_SIGHTING_SQL, [_sighting_params(row) for row in detections])
+                conn.executemany(INSERT_PLATE_KEY_SQL, _plate_key_params(row[0] for row in detections))
+                _write_sessions(conn, sessions)
+            self.rows_written += len(rows)
+            self.batches_written += 1
+            if self.timer is not None:
+                self.timer.record("db_write", time.perf_counter() - start)
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.error("database batch write failed", extra={"rows": len(rows), "error": e})
+
+def query_latest_match(color=None, plate=None, conn=None, fuzzy=False):
+    """
+    Fetch the most recent vehicle match based on color and/or plate.
+
+    With `fuzzy`, a plate that was never stored exactly falls back to the closest stored
+    plates (see search_plates), tried closest first.
+
+    Returns:
+    - dict with plate, color, camera, timestamp, image_path and the distance between
+      the stored and the requested plate (0.0 for exact matches) OR None
+    """
+    candidates = [(plate, 0.0)]
+    if fuzzy and plate:
+        candidates += [match for match in search_plates(plate, conn=conn) if match[1] > 0]
+
+    for candidate, distance in candidates:
+        rows, _ = query_sightings(plate=candidate, color=color, limit=1, conn=conn)
+        if rows:
+            row = rows[0]
             return {
-                "plate": row[0],
-                "color": row[1],
-                "camera": row[2],
-                "timestamp": row[3],
-                "image_path": row[4]
+                "plate": row["plate"],
+                "color": row["color"],
+                "camera": row["camera"],
+                "timestamp": row["timestamp"],
+                "image_path": row["image_path"],
+                "distance": distance
             }
 
-        return None
+    return None
+
+def query_plate_sessions(plate, limit=50, conn=None):
+    """
+    When `plate` was in front of which camera, newest first.
+
+    Returns:
+    - List of dicts with camera, color, first_seen, last_seen (as "%Y-%m-%d %H:%M:%S"),
+      sightings, image_path and closed (False while the plate is still in view)
+    """
+    query = """
+        SELECT camera, color, first_seen, last_seen, sightings, image_path, closed
+        FROM plate_sessions WHERE plate = ? ORDER BY last_seen DESC LIMIT ?
+    """
+    params = (plate.strip().upper(), int(limit))
+    if conn is not None:
+        rows = conn.execute(query, params).fetchall()
+    else:
+        with connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+    return [
+        {
+            "camera": row[0],
+            "color": row[1],
+            "first_seen": format_timestamp(row[2]),
+            "last_seen": format_timestamp(row[3]),
+            "sightings": row[4],
+            "image_path": row[5],
+            "closed": bool(row[6])
+        }
+        for row in rows
+    ]
+
+def search_plates(plate, k=FUZZY_TOP_K, max_distance=FUZZY_MAX_DISTANCE, conn=None):
+    """
+    Stored plates closest to `plate`: candidates are those at most one wrong, missing or
+    extra character away once OCR confusions (O/0, B/8, ...) are collapsed (see
+    storage.plate_index), ranked by plate_distance, where each confusion still costs
+    CONFUSION_COST, and cut off at `max_distance`.
+
+    Served by the `plate_keys` index: one primary-key lookup per key of `plate`, so the
+    cost doesn't grow with the number of stored plates.
+
+    Returns:
+    - [(plate, distance), ...], closest first, at most `k`, within `max_distance`
+    """
+    keys = sorted(plate_keys(plate))
+    if not keys:
+        return []
+    query = "SELECT DISTINCT plate FROM plate_keys WHERE key IN (%s)" % ",".join("?" * len(keys))
+
+    if conn is not None:
+        candidates = [row[0] for row in conn.execute(query, keys)]
+    else:
+        with connect() as conn:
+            candidates = [row[0] for row in conn.execute(query, keys)]
+    return rank_plates(plate, candidates, k=k, max_distance=max_distance)
+
+def query_sightings(plate=None, color=None, camera=None, start_ts=None, end_ts=None, limit=100, before=None,
+                    after_id=None, conn=None):
+    """
+    Time-windowed sighting history, newest first, with keyset pagination.
+
+    Parameters:
+    - plate / color / camera: optional exact filters (served by the (column, ts) indexes)
+    - start_ts / end_ts: optional time window, as Unix timestamps, datetimes or
+      "%Y-%m-%d %H:%M:%S" strings (start inclusive, end exclusive)
+    - limit: page size
+    - before: cursor returned with the previous page, to fetch the next (older) one
+    - after_id: only rows stored after the sighting with this id (live polling: pass
+      the largest id seen so far). These are read in storage order along the rowid, so
+      an idle poll costs one index seek however large the table is: the page holds
+      the `limit` oldest new rows (newest first), and the next poll picks up the rest
+    - conn: connection to use (e.g. from ReadOnlyPool); a new one is opened otherwise
+
+    Returns:
+    - (rows, next_cursor): rows are dicts with id, plate, color, camera, ts, timestamp,
+      image_path; next_cursor is None when there are no more rows
+    """
+    conditions = []
+    params = []
+
+    if plate:
+        conditions.append("plate = ?")
+        params.append(plate.strip().upper())
+
+    if color:
+        conditions.append("color = ?")
+        params.append(color.strip().lower())
+
+    if camera:
+        conditions.append("camera = ?")
+        params.append(camera)
+
+    if start_ts is not None:
+        conditions.append("ts >= ?")
+        params.append(to_unix_time(start_ts))
+
+    if end_ts is not None:
+        conditions.append("ts < ?")
+        params.append(to_unix_time(end_ts))
+
+    if before is not None:
+        # Row-value form: a seek on the (column, ts) index (which ends in the rowid),
+        # where the equivalent OR would filter every older row
+        conditions.append("(ts, id) < (?, ?)")
+        params.extend([before[0], before[1]])
+
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(int(after_id))
+
+    query = "SELECT id, plate, color, camera, ts, image_path FROM sightings"
+    if after_id is not None:
+        # Walk the rowid range: sorting new rows by ts, or using a (column, ts) index for
+        # the filters, would make SQLite visit every row matching the filters
+        query += " NOT INDEXED"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id LIMIT ?" if after_id is not None else " ORDER BY ts DESC, id DESC LIMIT ?"
+    params.append(int(limit))
+
+    if conn is not None:
+        rows = conn.execute(query, params).fetchall()
+    else:
+        with connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+    if after_id is not None:
+        rows.reverse()
+
+    results = [
+        {
+            "id": row[0],
+            "plate": row[1],
+            "color": row[2],
+            "camera": row[3],
+            "ts": row[4],
+            "timestamp": format_timestamp(row[4]),
+            "image_path": row[5]
+        }
+        for row in rows
+    ]
+
+    next_cursor = (rows[-1][4], rows[-1][0]) if len(rows) == int(limit) else None
+    return results, next_cursor
+
+def prune_sightings(older_than_days=None, before_ts=None, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Retention: deletes sightings older than `older_than_days` (or before `before_ts`),
+    and plate sessions that ended before then. Plates left with neither are dropped
+    from the fuzzy index (`plate_keys`) in the same transaction, so search stops
+    suggesting plates that have no history left.
+
+    Rows are deleted in `batch_size` chunks along the ts index, one short transaction per
+    chunk, so camera writers are never locked out for long even on very large tables.
+
+    Returns:
+    - Number of rows deleted
+    """
+    if before_ts is None:
+        if older_than_days is None:
+            raise ValueError("prune_sightings needs older_than_days or before_ts")
+        before_ts = time.time() - older_than_days * 86400
+    cutoff = to_unix_time(before_ts)
+
+    deleted = 0
+    with connect() as conn:
+        for table, column in (("sightings", "ts"), ("plate_sessions", "last_seen")):
+            while True:
+                rows = conn.execute(f"SELECT id, plate FROM {table} WHERE {column} < ? ORDER BY {column} LIMIT ?",
+                                    (cutoff, batch_size)).fetchall()
+                conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row_id,) for row_id, _ in rows])
+                conn.executemany(DELETE_PLATE_KEY_SQL, _plate_key_params(_orphaned_plates(conn, rows)))
+                conn.commit()
+                deleted += len(rows)
+                if len(rows) < batch_size:
+                    break
+
+    return deleted
+
+def _orphaned_plates(conn, rows):
+    # Of the plates of the deleted `rows`, those with no sighting or session left
+    return [plate for plate in {plate for _, plate in rows}
+            if conn.execute("SELECT 1 FROM sightings WHERE plate = ? LIMIT 1", (plate,)).fetchone() is None
+            and conn.execute("SELECT 1 FROM plate_sessions WHERE plate = ? LIMIT 1", (plate,)).fetchone() is None]
+
+def fetch_referenced_image_paths():
+    """
+    Returns the set of image paths referenced by any detection, sighting or session
+    (used by evidence garbage collection).
+    """
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT image_path FROM vehicle_detections WHERE image_path IS NOT NULL
+            UNION
+            SELECT image_path FROM sightings WHERE image_path IS NOT NULL
+            UNION
+            SELECT image_path FROM plate_sessions WHERE image_path IS NOT NULL
+        """)
+        return {row[0] for row in cursor}
 
 def fetch_all_detections():
     """
@@ -133,5 +702,8 @@ def delete_all_detections():
     with sqlite3.connect(DB_PATH) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM vehicle_detections")
+        cursor.execute("DELETE FROM sightings")
+        cursor.execute("DELETE FROM plate_keys")
+        cursor.execute("DELETE FROM plate_sessions")
         conn.commit()
-        print("🧹 All detections deleted from the database.")
+        log.info("all detections deleted")
@@ -0,0 +1,254 @@
+import os
+import time
+import queue
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+EVIDENCE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "evidence"))
+EVIDENCE_MAX_WIDTH = 1280    # Stored frames are downscaled to at most this width; 0 keeps full size
+EVIDENCE_GC_MIN_AGE = 3600   # Seconds before an unreferenced file may be collected
+EVIDENCE_GC_MAX_BYTES = 5 * 1024 ** 3  # Size budget; unreferenced files beyond it are collected first
+EVIDENCE_GC_GRACE = 600      # Files written or re-used this recently are never collected, even over budget
+EVIDENCE_TOUCH_INTERVAL = 60  # Seconds between mtime refreshes of a re-used file (well within the grace)
+EVIDENCE_QUEUE_SIZE = 32     # Images waiting to be encoded; further submits are dropped
+EVIDENCE_WORKERS = 2         # Encoder threads (cv2.imwrite releases the GIL while encoding)
+EVIDENCE_JPEG_QUALITY = 90
+
+log = logging.getLogger(__name__)
+
+
+class EvidenceWriter:
+    """
+    Background JPEG encoder/writer for evidence images.
+
+    `submit` only queues the image, so encoding and disk writes happen off the frame loop.
+    The queue is bounded: when encoders can't keep up, new images are dropped (and counted)
+    rather than stalling detection — or, with `block` (offline ingest, where no image may
+    be lost and stalling only slows decoding), `submit` waits for room. `close` waits for
+    everything queued to be written.
+
+    Callers must not modify a submitted image afterwards. With a `timer`
+    (pipeline.timing.StageTimer), each encode + write is recorded as "image_write".
+    """
+
+    _STOP = object()
+
+    def __init__(self, workers=EVIDENCE_WORKERS, queue_size=EVIDENCE_QUEUE_SIZE, jpeg_quality=EVIDENCE_JPEG_QUALITY,
+                 timer=None, block=False):
+        self.jpeg_quality = jpeg_quality
+        self.block = block
+        self.timer = timer
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads = [
+            threading.Thread(target=self._run, name=f"EvidenceWriter-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, path, image):
+        """
+        Queues `image` to be written to `path`.
+
+        Returns:
+            True if queued, False if the queue was full and the image was dropped
+        """
+        try:
+            self._queue.put((path, image), block=self.block)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(self._STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            path, image = item
+            start = time.perf_counter()
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                ok = cv2.imwrite(path, image, params)
+            except cv2.error as e:
+                log.error("evidence write failed", extra={"path": path, "error": e})
+                ok = False
+            if ok and self.timer is not None:
+                self.timer.record("image_write", time.perf_counter() - start)
+            with self._lock:
+                if ok:
+                    self.written += 1
+                else:
+                    self.errors += 1
+
+
+class EvidenceStore:
+    """
+    Content-addressed evidence image store.
+
+    Each image is (optionally) downscaled, hashed, and stored once at
+    `<root>/<h[0:2]>/<h[2:4]>/<h>.jpg`, so the same frame referenced by several plates
+    (or re-submitted) is written only once, and no single directory grows without bound.
+    Database rows reference the returned path; `collect_garbage` removes files no row
+    points to any more. Re-using a stored file refreshes its mtime, so garbage collection
+    leaves it alone until the row referencing it has had time to be written.
+    """
+
+    def __init__(self, root=EVIDENCE_DIR, writer=None, max_width=EVIDENCE_MAX_WIDTH, recent_size=256):
+        self.root = os.path.abspath(root)
+        self.writer = writer  # EvidenceWriter for background encoding; synchronous if None
+        self.max_width = max_width
+        self.stored = 0
+        self.deduplicated = 0
+        self._recent = OrderedDict()  # path -> when it was last written or touched
+        self._recent_size = recent_size
+
+    def put(self, image):
+        """
+        Stores `image` (BGR) unless identical content is already stored.
+
+        Returns:
+            The image's path, or None if it could not be queued (writer backlog full)
+        """
+        image = self._downscale(image)
+        path = self.path_for(image)
+
+        # Written or touched just now (the write may still be queued): within GC's grace.
+        # Otherwise re-use the file only if it still exists, and touch it so GC keeps it.
+        now = time.time()
+        touched = self._recent.get(path)
+        if touched is not None and now - touched < EVIDENCE_TOUCH_INTERVAL:
+            self.deduplicated += 1
+            self._remember(path, touched)
+            return path
+        try:
+            os.utime(path)
+            self.deduplicated += 1
+            self._remember(path, now)
+            return path
+        except FileNotFoundError:
+            pass
+
+        if self.writer is not None:
+            if not self.writer.submit(path, image):
+                return None
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not cv2.imwrite(path, image):
+                return None
+
+        self.stored += 1
+        self._remember(path, now)
+        return path
+
+    def path_for(self, image):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(image.shape).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        key = digest.hexdigest()
+        return os.path.join(self.root, key[:2], key[2:4], key + ".jpg")
+
+    def _downscale(self, image):
+        h, w = image.shape[:2]
+        if not self.max_width or w <= self.max_width:
+            return image
+        scale = self.max_width / float(w)
+        return cv2.resize(image, (self.max_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    def _remember(self, path, touched):
+        self._recent[path] = touched
+        self._recent.move_to_end(path)
+        while len(self._recent) > self._recent_size:
+            self._recent.popitem(last=False)
+
+
+def collect_garbage(referenced_paths, root=EVIDENCE_DIR, min_age=EVIDENCE_GC_MIN_AGE,
+                    max_bytes=EVIDENCE_GC_MAX_BYTES, grace=EVIDENCE_GC_GRACE):
+    """
+    Deletes evidence files that no database row references.
+
+    - Unreferenced files older than `min_age` seconds are always removed (the grace period
+      covers rows still waiting in a write-behind queue)
+    - If the store is still over `max_bytes`, the oldest remaining unreferenced files are
+      removed until it fits, except those written or re-used (EvidenceStore touches them)
+      within the last `grace` seconds, whose rows may not be written yet
+    - Empty shard directories are removed
+
+    A file's mtime is checked again right before it is removed, so a file re-used while
+    the store was being scanned is kept.
+
+    Returns:
+        dict with files_deleted, bytes_deleted, bytes_remaining
+    """
+    root = os.path.abspath(root)
+    referenced = {os.path.abspath(path) for path in referenced_paths if path}
+    now = time.time()
+
+    total_bytes = 0
+    candidates = []  # (mtime, size, path) of unreferenced files
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            total_bytes += stat.st_size
+            if path not in referenced:
+                candidates.append((stat.st_mtime, stat.st_size, path))
+
+    candidates.sort()
+    files_deleted = bytes_deleted = 0
+    for mtime, size, path in candidates:
+        expired = now - mtime >= min_age
+        over_budget = total_bytes - bytes_deleted > max_bytes
+        if not (expired or over_budget) or now - mtime < grace:
+            continue
+        try:
+            if os.stat(path).st_mtime != mtime:
+                continue  # Re-used since the scan
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        files_deleted += 1
+        bytes_deleted += size
+
+    # Bottom-up, so shard directories emptied just now are removed too (rmdir fails on non-empty ones)
+    for dirpath, _, _ in os.walk(root, topdown=False):
+        if dirpath != root:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+    return {
+        "files_deleted": files_deleted,
+        "bytes_deleted": bytes_deleted,
+        "bytes_remaining": total_bytes - bytes_deleted,
+    }
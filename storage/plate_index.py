@@ -0,0 +1,85 @@
+"""
+Fuzzy plate matching that knows which characters the OCR confuses.
+
+`plate_distance` is an edit distance where swapping a character for one it is commonly
+misread as (the TO_NUMBER / TO_ALPHA pairs: O/0, B/8, S/5, ...) costs CONFUSION_COST
+instead of 1.
+
+The index (table `plate_keys`, maintained by storage.database) stores a few lookup keys
+per distinct plate: the plate in canonical form (every confusable letter replaced by its
+digit, so misreads collapse onto one spelling), plus that form with each character
+deleted in turn. Two plates share a key when their canonical forms become equal after
+deleting at most one character from each: one substitution, insertion or deletion (or
+one moved character, e.g. two adjacent ones swapped) on top of the confusions the
+canonical form absorbs. A search is therefore a handful of primary-key lookups, however
+many plates are stored, and only the few candidates found are ranked with
+`plate_distance`, which still counts every confusion: results beyond
+FUZZY_MAX_DISTANCE (e.g. five confusions, or one other error and three confusions) are
+dropped.
+"""
+
+from ocr.number_plate_reader import TO_NUMBER, TO_ALPHA
+
+CONFUSION_COST = 0.5        # Cost of substituting one character of a confusion pair for the other
+FUZZY_MAX_DISTANCE = 2.0    # Default cut-off for search results
+FUZZY_TOP_K = 5
+
+CONFUSABLE = (
+    {(a, b) for a, b in TO_NUMBER.items()} | {(b, a) for a, b in TO_NUMBER.items()}
+    | {(a, b) for a, b in TO_ALPHA.items()} | {(b, a) for a, b in TO_ALPHA.items()}
+)
+
+
+def normalize_plate(plate):
+    return "".join(filter(str.isalnum, plate or "")).upper()
+
+
+def canonical_plate(plate):
+    """
+    `plate` normalized, with every confusable letter replaced by the digit it is misread
+    as, so e.g. "RJ14AB1234" and "RJ14A81234" have the same canonical form.
+    """
+    return "".join(TO_NUMBER.get(char, char) for char in normalize_plate(plate))
+
+
+def plate_keys(plate):
+    """
+    Index keys of `plate`: its canonical form and every single-character deletion of it.
+    """
+    canonical = canonical_plate(plate)
+    keys = {canonical}
+    keys.update(canonical[:i] + canonical[i + 1:] for i in range(len(canonical)))
+    keys.discard("")
+    return keys
+
+
+def plate_distance(a, b):
+    """
+    Edit distance between two plates: insertions, deletions and substitutions cost 1,
+    except substitutions between OCR-confusable characters, which cost CONFUSION_COST.
+    """
+    a, b = normalize_plate(a), normalize_plate(b)
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [float(i)]
+        for j, char_b in enumerate(b, 1):
+            if char_a == char_b:
+                substitution = 0.0
+            elif (char_a, char_b) in CONFUSABLE:
+                substitution = CONFUSION_COST
+            else:
+                substitution = 1.0
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + substitution))
+        previous = current
+    return previous[-1]
+
+
+def rank_plates(query, candidates, k=FUZZY_TOP_K, max_distance=FUZZY_MAX_DISTANCE):
+    """
+    Returns:
+        Up to `k` (plate, distance) pairs from `candidates`, closest first, within
+        `max_distance` (None: no cut-off)
+    """
+    ranked = sorted((plate_distance(query, plate), plate) for plate in set(candidates))
+    return [(plate, distance) for distance, plate in ranked
+            if max_distance is None or distance <= max_distance][:k]
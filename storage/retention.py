@@ -0,0 +1,38 @@
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pipeline.telemetry import configure_logging
+from storage.database import init_db, prune_sightings, fetch_referenced_image_paths
+from storage.evidence import collect_garbage, EVIDENCE_DIR, EVIDENCE_GC_MAX_BYTES
+
+RETENTION_DAYS = 90
+
+log = logging.getLogger("storage.retention")
+
+def run_retention(days=RETENTION_DAYS, evidence_dir=EVIDENCE_DIR, max_evidence_bytes=EVIDENCE_GC_MAX_BYTES):
+    """
+    Deletes sightings older than `days` days, then garbage-collects evidence images no
+    longer referenced by any row. Meant to be run periodically (e.g. cron).
+    """
+    init_db()
+    deleted = prune_sightings(older_than_days=days)
+    log.info("sightings pruned", extra={"deleted": deleted, "days": days})
+
+    gc = collect_garbage(fetch_referenced_image_paths(), root=evidence_dir, max_bytes=max_evidence_bytes)
+    log.info("evidence collected", extra={"files_deleted": gc["files_deleted"], "bytes_freed": gc["bytes_deleted"],
+                                          "bytes_remaining": gc["bytes_remaining"]})
+    return deleted
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Prune old vehicle sightings and unreferenced evidence images.")
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS,
+                        help=f"Keep sightings from the last N days (default {RETENTION_DAYS})")
+    parser.add_argument("--max-evidence-gb", type=float, default=EVIDENCE_GC_MAX_BYTES / 1024 ** 3,
+                        help="Size budget for the evidence store in GB")
+    args = parser.parse_args()
+    run_retention(args.days, max_evidence_bytes=int(args.max_evidence_gb * 1024 ** 3))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add root to path for internal imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
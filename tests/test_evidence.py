@@ -0,0 +1,67 @@
+import os
+import time
+
+import numpy as np
+
+from storage import evidence
+from storage.evidence import EvidenceStore, EvidenceWriter, collect_garbage
+
+
+def frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_gc_keeps_recent_files_even_over_budget(tmp_path):
+    store = EvidenceStore(root=str(tmp_path))
+    path = store.put(frame(10))
+
+    stats = collect_garbage([], root=str(tmp_path), max_bytes=0)
+
+    assert stats["files_deleted"] == 0
+    assert os.path.exists(path)
+
+
+def test_reuse_touches_file_so_gc_keeps_it(tmp_path, monkeypatch):
+    store = EvidenceStore(root=str(tmp_path))
+    path = store.put(frame(10))
+    age(path, 2 * evidence.EVIDENCE_GC_MIN_AGE)
+    monkeypatch.setattr(evidence, "EVIDENCE_TOUCH_INTERVAL", 0)
+
+    assert store.put(frame(10)) == path
+    assert store.deduplicated == 1
+    assert collect_garbage([], root=str(tmp_path))["files_deleted"] == 0
+
+
+def test_unused_old_file_is_collected_and_rewritten_on_reuse(tmp_path, monkeypatch):
+    store = EvidenceStore(root=str(tmp_path))
+    path = store.put(frame(10))
+    age(path, 2 * evidence.EVIDENCE_GC_MIN_AGE)
+
+    assert collect_garbage([], root=str(tmp_path))["files_deleted"] == 1
+    monkeypatch.setattr(evidence, "EVIDENCE_TOUCH_INTERVAL", 0)
+    assert store.put(frame(10)) == path
+    assert os.path.exists(path)
+    assert store.stored == 2
+
+
+def test_referenced_files_are_kept(tmp_path):
+    store = EvidenceStore(root=str(tmp_path))
+    path = store.put(frame(10))
+    age(path, 2 * evidence.EVIDENCE_GC_MIN_AGE)
+
+    assert collect_garbage([path], root=str(tmp_path), max_bytes=0)["files_deleted"] == 0
+
+
+def test_blocking_writer_never_drops(tmp_path):
+    with EvidenceWriter(workers=1, queue_size=1, block=True) as writer:
+        store = EvidenceStore(root=str(tmp_path), writer=writer)
+        paths = [store.put(frame(value)) for value in range(20)]
+
+    assert None not in paths
+    assert (writer.written, writer.dropped) == (20, 0)
+    assert all(os.path.exists(path) for path in paths)
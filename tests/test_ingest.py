@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from pipeline.ingest import plan_chunks, Checkpoint, stitch_sessions
+
+SETTINGS = {"video": "/videos/gate1.mp4", "camera": "gate1", "start_time": "2024-05-01 08:00:00",
+            "stride": 5, "chunk_frames": 3000}
+
+
+def test_plan_chunks_covers_video_with_open_last_chunk():
+    assert plan_chunks(7000, chunk_frames=3000) == [(0, 3000), (3000, 6000), (6000, None)]
+    assert plan_chunks(0) == [(0, None)]
+
+
+def test_plan_chunks_aligns_starts_to_stride():
+    chunks = plan_chunks(10000, chunk_frames=3001, stride=7)
+    assert all(start % 7 == 0 for start, _ in chunks)
+    assert [end for _, end in chunks[:-1]] == [start for start, _ in chunks[1:]]
+
+
+def test_checkpoint_resumes_completed_chunks(tmp_path):
+    path = str(tmp_path / "gate1.ingest.json")
+    records = [{"plate": "AB12CDE", "open": True, "held": False}]
+    checkpoint = Checkpoint(path, SETTINGS)
+    checkpoint.mark_done((0, 3000), records)
+    checkpoint.mark_failed((3000, 6000), "RuntimeError: decoder crashed")
+
+    resumed = Checkpoint(path, SETTINGS)
+    assert resumed.done((0, 3000))
+    assert not resumed.done((3000, 6000))
+    assert resumed.sessions == {0: records}
+    assert resumed.failed == {3000: "RuntimeError: decoder crashed"}
+
+    resumed.mark_done((3000, 6000))
+    assert Checkpoint(path, SETTINGS).failed == {}
+
+
+def test_checkpoint_rejects_different_settings(tmp_path):
+    path = str(tmp_path / "gate1.ingest.json")
+    Checkpoint(path, SETTINGS).mark_done((0, 3000))
+
+    with pytest.raises(ValueError):
+        Checkpoint(path, dict(SETTINGS, stride=1))
+    with open(path) as f:
+        assert json.load(f)["completed"] == [[0, 3000]]
+
+
+def session(plate, first_seen, last_seen, held=False, open=False, sightings=10, sharpness=1.0, image_path=None,
+            color="red"):
+    return {"plate": plate, "color": color, "first_seen": first_seen, "last_seen": last_seen,
+            "sightings": sightings, "sharpness": sharpness, "image_path": image_path, "held": held, "open": open}
+
+
+CHUNKS = [(0, 3000), (3000, 6000), (6000, None)]
+
+
+def test_stitch_merges_session_across_seam():
+    sessions = {
+        0: [session("AB12CDE", 100.0, 119.9, open=True, image_path="a.jpg")],
+        3000: [session("AB12CDE", 120.0, 130.0, held=True, sharpness=5.0, image_path="b.jpg", color="unknown")],
+    }
+    opened, updated = stitch_sessions(CHUNKS, sessions)
+
+    assert opened == []
+    assert updated == [session("AB12CDE", 100.0, 130.0, sightings=20, sharpness=5.0, image_path="b.jpg")]
+
+
+def test_stitch_chains_session_spanning_whole_chunk():
+    sessions = {
+        0: [session("AB12CDE", 100.0, 119.9, open=True)],
+        3000: [session("AB12CDE", 120.0, 239.9, held=True, open=True)],
+        6000: [session("AB12CDE", 240.0, 250.0, held=True)],
+    }
+    opened, updated = stitch_sessions(CHUNKS, sessions)
+
+    assert opened == []
+    assert [(r["first_seen"], r["last_seen"], r["sightings"], r["open"]) for r in updated] == [
+        (100.0, 250.0, 30, False)]
+
+
+def test_stitch_keeps_unrelated_sessions_apart():
+    sessions = {
+        0: [session("AB12CDE", 100.0, 110.0, open=True)],
+        3000: [session("AB12CDE", 145.0, 150.0, held=True),   # Beyond the idle gap
+               session("XY98ZZZ", 121.0, 125.0, held=True)],
+    }
+    opened, updated = stitch_sessions(CHUNKS, sessions, idle_seconds=30.0)
+
+    assert [(r["plate"], r["first_seen"]) for r in opened] == [("XY98ZZZ", 121.0), ("AB12CDE", 145.0)]
+    assert sorted((r["plate"], r["first_seen"], r["open"]) for r in updated) == [
+        ("AB12CDE", 100.0, False), ("AB12CDE", 145.0, False), ("XY98ZZZ", 121.0, False)]
+
+
+def test_stitch_carries_session_across_short_chunk_without_it():
+    chunks = [(0, 60), (60, 120), (120, 180), (180, None)]   # 2 s chunks at 30 fps
+    sessions = {
+        0: [session("RJ14AB1234", 100.0, 101.5, open=True)],
+        60: [],                                              # Out of view for the whole chunk
+        120: [session("RJ14AB1234", 104.2, 105.0, held=True, open=True)],
+        180: [session("RJ14AB1234", 106.0, 107.0, held=True)],
+    }
+    opened, updated = stitch_sessions(chunks, sessions)
+
+    assert opened == []
+    assert [(r["first_seen"], r["last_seen"], r["sightings"], r["open"]) for r in updated] == [
+        (100.0, 107.0, 30, False)]
@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from ocr import number_plate_reader
+from ocr import plate_cache
+from ocr.plate_cache import PlateTextCache, dhash
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(plate_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_near_hash_hits_and_far_hash_misses():
+    cache = PlateTextCache(max_distance=2)
+    cache.put(0b1111, ("MH12CD5678", 0.9))
+
+    assert cache.get(0b1111) == ("MH12CD5678", 0.9)
+    assert cache.get(0b1100) == ("MH12CD5678", 0.9)   # 2 bits apart
+    assert cache.get(0b1000) is None                   # 3 bits apart
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_closest_hash_wins():
+    cache = PlateTextCache(max_distance=4)
+    cache.put(0b0000, ("RJ14AB1234", 0.9))
+    cache.put(0b0111, ("MH12CD5678", 0.9))
+
+    assert cache.get(0b0011)[0] == "MH12CD5678"
+    assert cache.get(0b0001)[0] == "RJ14AB1234"
+
+
+def test_scopes_are_separate():
+    cache = PlateTextCache()
+    cache.put(0b1111, ("MH12CD5678", 0.9), scope="gate1")
+
+    assert cache.get(0b1111, scope="gate2") is None
+    assert cache.get(0b1111) is None
+    assert cache.get(0b1111, scope="gate1") == ("MH12CD5678", 0.9)
+
+
+def test_entries_expire_from_when_stored_despite_hits(clock):
+    cache = PlateTextCache(ttl_seconds=30.0)
+    cache.put(0b1111, ("MH12CD5678", 0.9))
+
+    clock[0] += 20.0
+    assert cache.get(0b1111) is not None
+    clock[0] += 20.0
+    assert cache.get(0b1111) is None
+    assert cache.expirations == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PlateTextCache(max_entries=2, max_distance=0)
+    for key in (1, 2, 3):
+        cache.put(key, (f"PLATE{key}", 0.9))
+
+    assert len(cache) == 2
+    assert cache.get(1) is None
+    assert cache.evictions == 1
+
+
+def test_hit_entry_survives_eviction():
+    cache = PlateTextCache(max_entries=2, max_distance=0)
+    cache.put(1, ("PLATE1", 0.9))
+    cache.put(2, ("PLATE2", 0.9))
+    assert cache.get(1) is not None
+    cache.put(3, ("PLATE3", 0.9))
+
+    assert cache.get(1) == ("PLATE1", 0.9)
+    assert cache.get(2) is None
+
+
+def test_hit_entry_still_expires(clock):
+    cache = PlateTextCache(ttl_seconds=30.0, max_distance=0)
+    cache.put(1, ("PLATE1", 0.9))
+    clock[0] += 10.0
+    cache.put(2, ("PLATE2", 0.9))
+    clock[0] += 10.0
+    assert cache.get(1) is not None  # Now the most recently used
+
+    clock[0] += 15.0
+    assert cache.get(1) is None
+    assert cache.get(2) is not None
+    assert cache.expirations == 1
+
+
+def test_dhash_is_stable_under_small_noise():
+    rng = np.random.default_rng(0)
+    image = np.tile(np.linspace(0, 255, 300, dtype=np.uint8), (80, 1))
+    image[:, 100:140] = 0
+    noisy = np.clip(image.astype(int) + rng.integers(-3, 4, image.shape), 0, 255).astype(np.uint8)
+
+    assert (dhash(image) ^ dhash(noisy)).bit_count() <= plate_cache.CACHE_MAX_DISTANCE
+
+
+class FakeReader:
+    def __init__(self, text):
+        self.text = text
+        self.crops = 0
+
+    def readtext_batched(self, images, **kwargs):
+        self.crops += len(images)
+        return [[(None, self.text, 0.9)] if self.text else [] for _ in images]
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    monkeypatch.setattr(number_plate_reader, "ocr_cache", PlateTextCache())
+    fake = FakeReader("MH12CD5678")
+    monkeypatch.setattr(number_plate_reader, "get_ocr_reader", lambda: fake)
+    return fake
+
+
+def crop():
+    image = np.full((40, 150, 3), 255, dtype=np.uint8)
+    image[10:30, 20:130] = 0
+    return image
+
+
+def test_reads_are_cached_per_scope(reader):
+    read = number_plate_reader.read_plate_texts
+
+    assert read([crop()], cache_scopes=["gate1"]) == ["MH12CD5678"]
+    assert read([crop()], cache_scopes=["gate1"]) == ["MH12CD5678"]
+    assert reader.crops == 1
+    read([crop()], cache_scopes=["gate2"])
+    assert reader.crops == 2
+
+
+def test_none_scope_bypasses_cache(reader):
+    read = number_plate_reader.read_plate_texts
+    read([crop()], cache_scopes=["gate1"])
+    read([crop()], cache_scopes=[None])
+
+    assert reader.crops == 2
+
+
+def test_failed_reads_are_not_cached(reader):
+    reader.text = ""
+    assert number_plate_reader.read_plate_texts([crop()]) == ["N/A"]
+
+    assert len(number_plate_reader.ocr_cache) == 0
@@ -0,0 +1,60 @@
+import pytest
+
+from storage.database import init_db, connect, search_plates, INSERT_PLATE_KEY_SQL
+from storage.plate_index import (plate_keys, plate_distance, canonical_plate, rank_plates, CONFUSION_COST,
+                                 FUZZY_MAX_DISTANCE)
+
+
+def test_canonical_form_collapses_confusions():
+    assert canonical_plate("rj-14 ab 1234") == canonical_plate("RJ14A81234")
+    assert canonical_plate("MH12CO5678") == canonical_plate("MH12CD5678")
+
+
+def test_keys_are_canonical_form_and_its_single_deletions():
+    assert plate_keys("AB1") == {"481", "81", "41", "48"}
+    assert plate_keys("") == set()
+
+
+@pytest.mark.parametrize("a, b, shared", [
+    ("RJ14AB1234", "RJ14A81234", True),    # Confusion only
+    ("RJ14AB1234", "RJ14AB1284", True),    # One substitution
+    ("RJ14AB1234", "RJ14AB234", True),     # One deletion
+    ("RJ14AB1234", "RJ14AB2134", True),    # Adjacent swap
+    ("RJ14AB1234", "RJ14AB9934", False),   # Two substitutions
+])
+def test_plates_share_a_key_within_one_edit(a, b, shared):
+    assert bool(plate_keys(a) & plate_keys(b)) == shared
+
+
+def test_distance_costs_confusions_less():
+    assert plate_distance("RJ14AB1234", "RJ14AB1234") == 0.0
+    assert plate_distance("RJ14AB1234", "rj14ab-1234") == 0.0
+    assert plate_distance("RJ14AB1234", "RJ14A81234") == CONFUSION_COST
+    assert plate_distance("RJ14AB1234", "RJ14AB1284") == 1.0
+    assert plate_distance("RJ14AB1234", "RJ14AB234") == 1.0
+    assert plate_distance("RJ14AB1234", "RJ14A8I234") == 2 * CONFUSION_COST
+
+
+def test_rank_plates_orders_and_cuts_off():
+    candidates = ["RJ14AB1284", "RJ14A81234", "RJ14AB1234", "XX99ZZ0000"]
+    assert rank_plates("RJ14AB1234", candidates) == [
+        ("RJ14AB1234", 0.0), ("RJ14A81234", CONFUSION_COST), ("RJ14AB1284", 1.0)]
+    assert rank_plates("RJ14AB1234", candidates, k=1) == [("RJ14AB1234", 0.0)]
+
+
+def test_search_caps_confusions_at_max_distance(tmp_path):
+    db_path = str(tmp_path / "plates.db")
+    init_db(db_path)
+    conn = connect(db_path)
+    plates = ["RJ14AB1234", "RJ14A8I234", "RJ1AA8IZ3A", "RJ14AB1299"]
+    conn.executemany(INSERT_PLATE_KEY_SQL, [(key, plate) for plate in plates for key in plate_keys(plate)])
+    conn.commit()
+
+    results = dict(search_plates("RJ14AB1234", conn=conn))
+    conn.close()
+
+    assert results["RJ14AB1234"] == 0.0
+    assert results["RJ14A8I234"] == 2 * CONFUSION_COST
+    assert "RJ1AA8IZ3A" not in results   # Same canonical form, but 5 confusions > FUZZY_MAX_DISTANCE
+    assert 5 * CONFUSION_COST > FUZZY_MAX_DISTANCE
+    assert "RJ14AB1299" not in results   # Two substitutions: shares no key
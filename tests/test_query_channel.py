@@ -0,0 +1,102 @@
+import json
+import os
+import socket
+import tempfile
+
+import numpy as np
+import pytest
+
+from chat import query_channel
+from chat.query_channel import QueryBroker, QueryMatcher, QUERIES, normalize_query
+
+pytestmark = pytest.mark.skipif(not query_channel.channel_supported(), reason="needs Unix domain sockets")
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    monkeypatch.setattr(query_channel, "get_current_query", lambda: None)
+    path = os.path.join(tempfile.mkdtemp(prefix="qc"), "broker.sock")  # Short: socket paths are length-limited
+    broker = QueryBroker(path).start()
+    yield broker
+    broker.close()
+
+
+def send(conn, *messages):
+    conn.sendall(b"".join((m if isinstance(m, bytes) else json.dumps(m).encode()) + b"\n" for m in messages))
+
+
+def receive(conn):
+    buffer = b""
+    while b"\n" not in buffer:
+        chunk = conn.recv(65536)
+        assert chunk, "broker closed the connection"
+        buffer += chunk
+    return json.loads(buffer.split(b"\n", 1)[0])
+
+
+def test_malformed_messages_are_dropped_and_connection_survives(broker):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(5)
+    conn.connect(broker.path)
+    send(conn,
+         b"not json",
+         [1, 2],
+         {"op": "set_query"},
+         {"op": "set_query", "query": "AB12CDE"},
+         {"op": "set_query", "query": {"plate": "AB12CDE"}},
+         {"op": "set_query", "query": {"id": 7, "plate": "AB12CDE"}},
+         {"op": "set_query", "query": {"id": "bad", "plate": 5}},
+         {"op": "subscribe", "topics": 5},
+         {"op": "set_query", "query": {"id": "q1", "plate": " ab12cde ", "color": None}},
+         {"op": "subscribe", "topics": [QUERIES]})
+
+    message = receive(conn)
+    conn.close()
+
+    assert message["op"] == QUERIES
+    assert message[QUERIES] == [{"id": "q1", "plate": "AB12CDE", "color": None}]
+    assert [query["id"] for query in broker.active_queries()] == ["q1"]
+
+
+class FakeWriter:
+    def __init__(self):
+        self.detections = []
+
+    def add(self, **detection):
+        self.detections.append(detection)
+
+    def add_session(self, *args, **kwargs):
+        pass
+
+
+def test_query_set_while_plate_in_view_alerts_on_next_frame(tmp_path):
+    from pipeline.frame_processor import FrameProcessor, process_batch
+    from pipeline.tracker import TRACK_SETTLE_FRAMES
+
+    matcher = QueryMatcher(path=str(tmp_path / "none.sock"))
+    alerts = []
+    matcher._client.send = lambda message: alerts.append(message["alert"]) or True
+    writer = FakeWriter()
+    processor = FrameProcessor("gate1", str(tmp_path), writer=writer, headless=True, query_matcher=matcher)
+
+    def frame(index):
+        image = np.zeros((240, 320, 3), dtype=np.uint8)
+        image[100:140, 100:220] = 255
+        process_batch({"gate1": processor}, [("gate1", index)], [image], [[(0.9, (100, 100, 220, 140))]],
+                      read_texts=lambda crops, **kwargs: [("RJ14AB1234", 0.9)] * len(crops),
+                      timestamps=[1000.0 + index])
+
+    index = 0
+    while not writer.detections:
+        frame(index)
+        index += 1
+        assert index <= 2 * TRACK_SETTLE_FRAMES
+    assert alerts == []
+
+    matcher.queries = (normalize_query({"id": "q1", "plate": "RJ14A81234"}),)
+    frame(index)
+    frame(index + 1)
+    matcher.close()
+
+    assert [alert["query_id"] for alert in alerts] == ["q1"]
+    assert alerts[0]["plate"] == "RJ14AB1234"
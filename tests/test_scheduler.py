@@ -0,0 +1,18 @@
+from pipeline.scheduler import _CameraTask, CameraSpec, FrameRateController
+
+
+def test_missing_file_finishes_camera_instead_of_retrying(tmp_path):
+    task = _CameraTask("yard", CameraSpec(str(tmp_path / "missing.mp4"), 1, 10.0), processor=None)
+
+    assert not task.open(0.0)
+    assert task.finished
+    assert task.backoff.failures == 0
+
+
+def test_pacing_waits_for_interval():
+    rate = FrameRateController()
+    spec = CameraSpec("video.mp4", 1, 10.0)
+
+    assert rate.should_process("yard", spec, 100.0)
+    assert not rate.is_due("yard", spec, 100.05)
+    assert rate.is_due("yard", spec, 100.2)
@@ -0,0 +1,104 @@
+from pipeline.sessions import SightingSessionizer, OPENED, IMPROVED, RECOLORED
+
+
+def persist(session):
+    # What FrameProcessor does whenever it stores a session
+    if session.best_image is not None:
+        session.image_path, session.best_image = session.best_image, None
+
+
+def test_first_reading_opens_session():
+    sessions = SightingSessionizer("cam1")
+    session, event = sessions.observe("AB12CDE", "red", 100.0, 10.0, image="frame0")
+
+    assert event == OPENED
+    assert session.best_image == "frame0"
+    assert (session.first_seen, session.last_seen, session.sightings) == (100.0, 100.0, 1)
+
+
+def test_repeat_readings_only_update_in_memory():
+    sessions = SightingSessionizer("cam1")
+    session, _ = sessions.observe("AB12CDE", "red", 100.0, 10.0)
+    for i in range(1, 5):
+        assert sessions.observe("AB12CDE", "red", 100.0 + i, 10.0) == (session, None)
+
+    assert (session.last_seen, session.sightings) == (104.0, 5)
+    assert len(sessions) == 1
+
+
+def test_settled_track_joins_with_its_earlier_sightings():
+    sessions = SightingSessionizer("cam1")
+    session, event = sessions.observe("AB12CDE", "red", 105.0, first_seen=100.0, sightings=6)
+
+    assert event == OPENED
+    assert (session.first_seen, session.last_seen, session.sightings) == (100.0, 105.0, 6)
+
+
+def test_idle_session_closes_and_reopens():
+    sessions = SightingSessionizer("cam1", idle_seconds=30.0)
+    first, _ = sessions.observe("AB12CDE", "red", 100.0)
+
+    assert sessions.expire(130.0) == []
+    assert sessions.expire(131.0) == [first]
+    assert first.closed
+
+    second, event = sessions.observe("AB12CDE", "red", 200.0)
+    assert event == OPENED
+    assert second is not first
+
+
+def test_reading_after_idle_gap_closes_previous_session():
+    sessions = SightingSessionizer("cam1", idle_seconds=30.0)
+    first, _ = sessions.observe("AB12CDE", "red", 100.0)
+    second, event = sessions.observe("AB12CDE", "red", 140.0)
+
+    assert event == OPENED
+    assert sessions.expire(140.0) == [first]
+    assert not second.closed
+
+
+def test_least_recently_seen_session_is_evicted():
+    sessions = SightingSessionizer("cam1", max_open=2)
+    a, _ = sessions.observe("AAA111", "red", 100.0)
+    b, _ = sessions.observe("BBB222", "red", 101.0)
+    sessions.observe("AAA111", "red", 102.0)
+    sessions.observe("CCC333", "red", 103.0)
+
+    assert sessions.expire(103.0) == [b]
+    assert b.closed and not a.closed
+    assert set(sessions.sessions) == {"AAA111", "CCC333"}
+
+
+def test_sharper_crop_is_held_until_update_interval():
+    sessions = SightingSessionizer("cam1", update_interval=10.0, image_gain=1.5)
+    session, _ = sessions.observe("AB12CDE", "red", 100.0, 10.0, image="frame0")
+    persist(session)
+
+    assert sessions.observe("AB12CDE", "red", 101.0, 12.0, image="frame1") == (session, None)
+    assert session.best_image is None  # Not sharper by image_gain
+    assert sessions.observe("AB12CDE", "red", 102.0, 20.0, image="frame2") == (session, None)
+    assert session.best_image == "frame2"
+
+    assert sessions.observe("AB12CDE", "red", 110.0, 5.0, image="frame3") == (session, IMPROVED)
+    persist(session)
+    assert session.image_path == "frame2"
+
+
+def test_closed_session_keeps_its_sharpest_image():
+    sessions = SightingSessionizer("cam1", update_interval=10.0)
+    session, _ = sessions.observe("AB12CDE", "red", 100.0, 10.0, image="frame0")
+    persist(session)
+    sessions.observe("AB12CDE", "red", 102.0, 40.0, image="frame2")
+
+    assert sessions.close_all() == [session]
+    assert session.best_image == "frame2"
+
+
+def test_color_change_is_reported_after_update_interval():
+    sessions = SightingSessionizer("cam1", update_interval=10.0)
+    session, _ = sessions.observe("AB12CDE", "unknown", 100.0)
+
+    assert sessions.observe("AB12CDE", "red", 105.0) == (session, None)
+    assert sessions.observe("AB12CDE", "red", 110.0) == (session, RECOLORED)
+    assert session.color == "red"
+    assert sessions.observe("AB12CDE", "unknown", 125.0) == (session, None)
@@ -0,0 +1,86 @@
+import sqlite3
+
+import pytest
+
+from storage import database
+from storage.database import (init_db, connect, query_sightings, ReadOnlyPool, insert_detection, insert_session,
+                              prune_sightings, search_plates, INSERT_SIGHTING_SQL)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    db_path = str(tmp_path / "sightings.db")
+    init_db(db_path)
+    conn = connect(db_path)
+    # Several rows per timestamp, so page boundaries fall inside runs of equal ts
+    rows = [(f"PLATE{i:02d}", "red" if i % 2 else "black", "cam1", 1000.0 + i // 4, None) for i in range(30)]
+    conn.executemany(INSERT_SIGHTING_SQL, rows)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def all_pages(conn, **filters):
+    rows, cursor = query_sightings(conn=conn, limit=3, **filters)
+    pages = [rows]
+    while cursor is not None:
+        rows, cursor = query_sightings(conn=conn, limit=3, before=cursor, **filters)
+        pages.append(rows)
+    return [row for page in pages for row in page]
+
+
+@pytest.mark.parametrize("filters", [{}, {"color": "red"}, {"camera": "cam1"}])
+def test_keyset_pages_cover_equal_timestamps_once(conn, filters):
+    expected, _ = query_sightings(conn=conn, limit=1000, **filters)
+    paged = all_pages(conn, **filters)
+
+    assert [row["id"] for row in paged] == [row["id"] for row in expected]
+    assert len({row["id"] for row in paged}) == len(paged)
+
+
+def test_keyset_pages_are_newest_first(conn):
+    keys = [(row["ts"], row["id"]) for row in all_pages(conn)]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_keyset_query_seeks_the_index(conn):
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM sightings WHERE color = ? AND (ts, id) < (?, ?) "
+        "ORDER BY ts DESC, id DESC LIMIT 3", ("red", 1003.0, 20)
+    ).fetchall()
+    assert "ts<?" in plan[0][-1]
+
+
+def test_pool_reuses_connections_but_not_abandoned_ones(tmp_path):
+    db_path = str(tmp_path / "pool.db")
+    init_db(db_path)
+    pool = ReadOnlyPool(db_path)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+
+    with pytest.raises(KeyError):
+        with pool.connection() as conn:
+            raise KeyError("plate")
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")  # Closed rather than left to the garbage collector
+
+
+def test_retention_drops_plates_with_no_history_left_from_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "retention.db"))
+    init_db()
+    insert_detection("AB12CDE", "red", "cam1", timestamp=1000.0)
+    insert_detection("XY98ZZZ", "red", "cam1", timestamp=1000.0)
+    insert_detection("XY98ZZZ", "red", "cam1", timestamp=5000.0)
+    insert_detection("KL34MNO", "red", "cam1", timestamp=1000.0)
+    insert_session("KL34MNO", "red", "cam1", 1000.0, 5000.0, 40)
+
+    assert prune_sightings(before_ts=2000.0, batch_size=1) == 3
+
+    assert search_plates("AB12CDE") == []
+    assert dict(search_plates("XY98ZZZ")) == {"XY98ZZZ": 0.0}   # Still has a sighting
+    assert dict(search_plates("KL34MNO")) == {"KL34MNO": 0.0}   # Still has a session
@@ -0,0 +1,94 @@
+from pipeline.tracker import (Track, PlateTracker, TRACK_INITIAL_READS, TRACK_MAX_READS, TRACK_SETTLE_FRAMES,
+                              TRACK_MAX_MISSED_FRAMES)
+
+
+def test_initial_reads_are_always_granted():
+    track = Track(1, (0, 0, 10, 5), 0)
+    grants = [track.request_ocr(sharpness) for sharpness in (50.0, 10.0)]
+
+    assert grants == [True] * TRACK_INITIAL_READS
+
+
+def test_later_reads_need_a_sharper_crop():
+    track = Track(1, (0, 0, 10, 5), 0)
+    for _ in range(TRACK_INITIAL_READS):
+        track.request_ocr(50.0)
+
+    assert not track.request_ocr(50.0)
+    assert not track.request_ocr(20.0)
+    assert track.request_ocr(60.0)
+
+
+def test_read_budget_is_capped():
+    track = Track(1, (0, 0, 10, 5), 0)
+    grants = [track.request_ocr(float(sharpness)) for sharpness in range(1, 20)]
+
+    assert sum(grants) == TRACK_MAX_READS
+
+
+def test_votes_are_weighted_by_confidence():
+    track = Track(1, (0, 0, 10, 5), 0)
+    assert track.plate == "N/A"
+
+    track.add_read("MH12CD5678", 0.4)
+    track.add_read("MH12CD5678", 0.3)
+    track.add_read("MH12CO5678", 0.6)
+    track.add_read("N/A", 0.9)
+
+    assert track.plate == "MH12CD5678"
+
+
+def test_vote_settles_once_remaining_reads_cannot_overturn_it():
+    track = Track(1, (0, 0, 10, 5), 0)
+    for sharpness in (1.0, 2.0):
+        track.request_ocr(sharpness)
+        track.add_read("MH12CD5678", 0.9)
+    assert track.settle() is None  # 1.8 ahead, but 3 reads left could add 3.0
+
+    track.request_ocr(3.0)
+    track.add_read("MH12CD5678", 0.9)  # 2.7 ahead with 2 reads left
+    assert track.settle() == "MH12CD5678"
+    assert not track.request_ocr(100.0)  # Settled: no more reads
+
+
+def test_vote_settles_after_frames_without_reads():
+    track = Track(1, (0, 0, 10, 5), 0)
+    track.request_ocr(1.0)
+    track.add_read("MH12CD5678", 0.5)
+    track.hits += TRACK_SETTLE_FRAMES - 1
+    assert track.settle() is None
+
+    track.hits += 1
+    assert track.settle() == "MH12CD5678"
+
+
+def test_ended_track_settles_on_its_final_vote():
+    track = Track(1, (0, 0, 10, 5), 0)
+    assert track.settle(ended=True) is None  # Nothing read
+
+    track.request_ocr(1.0)
+    track.add_read("MH12CD5678", 0.5)
+    assert track.settle() is None
+    assert track.settle(ended=True) == "MH12CD5678"
+
+
+def test_tracker_follows_moving_box_and_finishes_lost_tracks():
+    tracker = PlateTracker()
+    (first,), _ = tracker.update(0, [(100, 100, 200, 150)])
+    (same,), _ = tracker.update(1, [(110, 100, 210, 150)])
+    assert same is first
+    assert first.hits == 2
+
+    finished = []
+    for frame_index in range(2, 3 + TRACK_MAX_MISSED_FRAMES):
+        _, ended = tracker.update(frame_index, [])
+        finished.extend(ended)
+    assert finished == [first]
+
+
+def test_flush_ends_live_tracks():
+    tracker = PlateTracker()
+    tracks, _ = tracker.update(0, [(100, 100, 200, 150), (400, 100, 500, 150)])
+
+    assert sorted(track.id for track in tracker.flush()) == sorted(track.id for track in tracks)
+    assert tracker.tracks == {}
@@ -5,13 +5,66 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from chat.chat_command_parser import parse_chat_command
+from chat.query_channel import QueryPublisher, start_query_broker
 from chat.query_state import update_query, get_current_query
-from storage.database import query_latest_match
+from storage.database import ReadOnlyPool, init_db, query_sightings, search_plates
+
+REFRESH_SECONDS = 2    # How often the live panel polls for new sightings
+ALERT_REFRESH_SECONDS = 0.5  # How often pushed camera alerts are drawn
+PAGE_SIZE = 25         # Sightings per history page
+LIVE_ROWS = 10         # Newest sightings kept in the live panel
 
 st.set_page_config(page_title="AI Vehicle Monitoring", layout="centered")
 st.title("🚗 Vehicle Monitoring System")
 
 
+@st.cache_resource
+def get_reader_pool():
+    # One pool for the whole server: operator sessions borrow read-only connections
+    # instead of opening one per query
+    init_db()  # Read-only connections can't create the database
+    return ReadOnlyPool()
+
+
+@st.cache_resource
+def get_query_publisher():
+    # Hosts the query broker if no camera runner does yet, so queries set before the
+    # cameras start are pushed to them once they connect
+    start_query_broker()
+    return QueryPublisher()
+
+
+def reset_results():
+    """
+    Forgets the live cursor and history pages, e.g. when the query changes.
+    """
+    st.session_state.live_rows = []
+    st.session_state.last_seen_id = None
+    st.session_state.page_cursors = [None]  # Cursor of each history page visited so far
+    st.session_state.alert_seq = 0
+    st.session_state.alerts = []
+
+
+def fetch(query, **kwargs):
+    with get_reader_pool().connection() as conn:
+        return query_sightings(color=query["color"], plate=query["plate"], conn=conn, **kwargs)
+
+
+def show_columns(rows):
+    st.dataframe(
+        [{"Time": row["timestamp"], "Plate": row["plate"], "Color": row["color"], "Camera": row["camera"]}
+         for row in rows],
+        hide_index=True, use_container_width=True
+    )
+
+
+if "query" not in st.session_state:
+    st.session_state.query = get_current_query()
+    if st.session_state.query:
+        st.session_state.query.setdefault("id", "saved")  # Same id the broker gives it
+    reset_results()
+
+
 with st.form("chat_form"):
     chat_input = st.text_input(
         "💬 Enter tracking command:",
@@ -27,40 +80,123 @@ with st.form("chat_form"):
             parsed["plate"] = parsed["plate"].upper() if parsed["plate"] else None
             parsed["color"] = parsed["color"].lower() if parsed["color"] else None
 
-            # Save query state for live tracker
-            update_query(parsed)
+            # Push the query to the running cameras and save it for ones started later
+            publisher = get_query_publisher()
+            previous = st.session_state.get("query")
+            if previous and previous.get("id"):
+                publisher.cancel_query(previous["id"])
+            st.session_state.query = publisher.set_query(parsed)
+            update_query(st.session_state.query)
+            reset_results()
 
             st.success("✅ Command processed successfully!")
         else:
             st.warning("⚠️ Please enter a valid command before submitting.")
 
 
-if submitted and chat_input.strip():
+@st.fragment(run_every=REFRESH_SECONDS)
+def live_panel(query):
+    """
+    Re-runs on its own every REFRESH_SECONDS and only asks the database for sightings
+    newer than the last one seen, so an idle query costs one index lookup per poll.
+    """
+    state = st.session_state
+    new_rows, _ = fetch(query, after_id=state.last_seen_id, limit=LIVE_ROWS)
+    if new_rows:
+        state.last_seen_id = max(row["id"] for row in new_rows)
+        state.live_rows = (new_rows + state.live_rows)[:LIVE_ROWS]
+
+    match = state.live_rows[0] if state.live_rows else None
+    if not match:
+        st.warning("🚫 No matching vehicle found yet. Waiting for detection...")
+        show_close_plates(query)
+        return
+
+    st.success("✅ Vehicle MATCH FOUND!")
+    st.markdown(f"**Plate:** `{match['plate']}`")
+    st.markdown(f"**Color:** `{match['color']}`")
+    st.markdown(f"**Camera:** `{match['camera']}`")
+    st.markdown(f"**Time:** `{match['timestamp']}`")
+
+    if match.get("image_path") and os.path.exists(match["image_path"]):
+        st.image(match["image_path"], caption="📸 Detected Vehicle Image", use_container_width=True)
+    else:
+        st.warning("⚠️ No image available for this match.")
+
+    if len(state.live_rows) > 1:
+        st.caption("Latest sightings")
+        show_columns(state.live_rows)
+
+
+@st.fragment(run_every=ALERT_REFRESH_SECONDS)
+def alert_panel(query):
+    """
+    Alerts camera processes pushed for this session's query (no database involved).
+    """
+    state = st.session_state
+    publisher = get_query_publisher()
+    alerts, state.alert_seq = publisher.alerts_since(state.alert_seq, query.get("id"))
+    state.alerts = (list(reversed(alerts)) + state.alerts)[:LIVE_ROWS]
+
+    if not publisher.connected:
+        st.caption("Live alerts unavailable: query channel not connected")
+    for alert in state.alerts:
+        misread = " (close read)" if alert.get("distance") else ""
+        st.error(f"🚨 `{alert['plate']}`{misread} ({alert['color']}) on **{alert['camera']}** "
+                 f"at {alert['timestamp']}")
+
+
+def show_close_plates(query):
+    """
+    Stored plates the requested one may have been misread as (OCR confusions such as
+    O/0 or B/8, or one wrong character), closest first.
+    """
+    if not query.get("plate"):
+        return
+    with get_reader_pool().connection() as conn:
+        close = [(plate, distance) for plate, distance in search_plates(query["plate"], conn=conn) if distance > 0]
+    if close:
+        st.caption("Close matches (possible misreads): " +
+                   ", ".join(f"`{plate}` ({distance:g})" for plate, distance in close))
+
+
+def history_panel(query):
+    """
+    Every match, newest first, one PAGE_SIZE page at a time (keyset pagination, so
+    deep pages cost the same as the first).
+    """
+    cursors = st.session_state.page_cursors
+    rows, next_cursor = fetch(query, before=cursors[-1], limit=PAGE_SIZE)
+    if not rows:
+        st.info("ℹ️ No sightings stored for this query.")
+        return
+
+    st.caption(f"Page {len(cursors)}")
+    show_columns(rows)
+
+    newer_col, older_col = st.columns(2)
+    if newer_col.button("◀ Newer", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if older_col.button("Older ▶", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+
+query = st.session_state.query
+if query:
     st.markdown("---")
     st.header("📡 Latest Matching Vehicle Detection")
 
-    query = get_current_query()
+    st.subheader("🔍 Current Query")
+    st.write(f"**Color:** `{query['color'] or 'Any'}`")
+    st.write(f"**Plate:** `{query['plate'] or 'Any'}`")
 
-    if not query:
-        st.info("ℹ️ No tracking data found.")
-    else:
-        st.subheader("🔍 Current Query")
-        st.write(f"**Color:** `{query['color'] or 'Any'}`")
-        st.write(f"**Plate:** `{query['plate'] or 'Any'}`")
-
-        # Fetch latest match from database
-        match = query_latest_match(color=query["color"], plate=query["plate"])
-
-        if match:
-            st.success("✅ Vehicle MATCH FOUND!")
-            st.markdown(f"**Plate:** `{match['plate']}`")
-            st.markdown(f"**Color:** `{match['color']}`")
-            st.markdown(f"**Camera:** `{match['camera']}`")
-            st.markdown(f"**Time:** `{match['timestamp']}`")
-
-            if match.get("image_path") and os.path.exists(match["image_path"]):
-                st.image(match["image_path"], caption="📸 Detected Vehicle Image", use_column_width=True)
-            else:
-                st.warning("⚠️ No image available for this match.")
-        else:
-            st.warning("🚫 No matching vehicle found yet. Waiting for detection...")
+    alert_panel(query)
+    live_panel(query)
+
+    st.markdown("---")
+    st.header("🗂️ All Matches")
+    history_panel(query)
+else:
+    st.info("ℹ️ No tracking data found.")